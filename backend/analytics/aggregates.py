@@ -0,0 +1,207 @@
+import sys
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+from phe.util import powmod
+from data.data_config import db_session
+from encryption.codec import raw_ciphertext
+from encryption.homomorphic import (
+    load_or_generate_keys, unpack_slots, indicator_slots, PACKED_FEATURES, SLOT_BITS, LEVELS, MAX_AGE, AGE_BIN_WIDTH
+)
+from mappings import GENDER_MAP, BLOOD_PRESSURE_MAP, CHOLESTEROL_LEVEL_MAP
+
+BINARY_FEATURES = ["Fever", "Cough", "Fatigue", "Difficulty_Breathing"]
+
+# n^2 of the public key in the current worker process, set once by _init_worker
+_worker_nsquare = None
+
+
+def _init_worker(nsquare):
+    global _worker_nsquare
+    _worker_nsquare = nsquare
+
+
+# Homomorphic sum of a chunk: multiplying Paillier ciphertexts adds their plaintexts
+def _product_chunk(ciphertexts):
+    product = 1
+    for ciphertext in ciphertexts:
+        product = product * ciphertext % _worker_nsquare
+    return product
+
+
+# Summed indicator slots of a chunk of unpacked rows, from their decrypted (Blood_Pressure, Cholesterol_Level, Age) cells
+def _indicator_chunk(private_key, rows):
+    total = 0
+    for cells in rows:
+        # Slot totals stay far below 2**SLOT_BITS, so plaintexts add slot by slot
+        total += indicator_slots(*(private_key.raw_decrypt(ciphertext) for ciphertext in cells))
+    return total
+
+
+# Combine partial sums pairwise so the reduction depth is log2 of the partial count
+def _tree_reduce(values, nsquare):
+    values = list(values) or [1]
+    while len(values) > 1:
+        paired = [values[i] * values[i + 1] % nsquare for i in range(0, len(values) - 1, 2)]
+        if len(values) % 2:
+            paired.append(values[-1])
+        values = paired
+    return values[0]
+
+
+# Raw ciphertext of a cell; sums are only meaningful when every exponent is 0
+def _integer_ciphertext(cell):
+    ciphertext, exponent = raw_ciphertext(cell)
+    if exponent != 0:
+        raise ValueError("Only integer-encoded ciphertexts can be aggregated.")
+    return ciphertext
+
+
+# Group raw ciphertexts of disease_data by the plaintext Disease column
+def fetch_grouped_ciphertexts(cursor):
+    columns = ", ".join(PACKED_FEATURES)
+    cursor.execute(f"SELECT Disease, {columns}, Packed_Features FROM disease_data;")
+
+    groups = {}
+    for row in cursor.fetchall():
+        group = groups.setdefault(row[0], {
+            "count": 0,
+            "packed_count": 0,
+            "columns": {name: [] for name in PACKED_FEATURES},
+            "packed": [],
+        })
+        group["count"] += 1
+        if row[9] is not None:
+            group["packed_count"] += 1
+            group["packed"].append(_integer_ciphertext(row[9]))
+        else:
+            for name, cell in zip(PACKED_FEATURES, row[1:9]):
+                group["columns"][name].append(_integer_ciphertext(cell))
+    return groups
+
+
+# One packed ciphertext per disease holding the sum of every slot
+def encrypted_group_sums(groups, public_key, workers=None, chunk_size=512, private_key=None):
+    """
+    Sums every column of every group on ciphertexts across a process pool.
+    Unpacked columns are summed first and then shifted into their packed slot
+    (a scalar multiplication by 2**(SLOT_BITS * i)), so each disease ends up
+    with a single ciphertext to decrypt.
+    Unpacked rows carry no indicator slots, and an indicator is not linear in
+    its feature. With private_key, their level and age cells are decrypted in
+    the pool and the summed indicators are added to their disease; without it,
+    those rows are missing from the level and age histograms.
+    Returns:
+        dict: Disease -> ciphertext integer of the packed slot sums.
+    """
+    nsquare = public_key.nsquare
+    workers = workers or os.cpu_count() or 1
+
+    # (disease, series) -> futures of partial products
+    partials = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(nsquare,)) as executor:
+        for disease, group in groups.items():
+            series = dict(group["columns"])
+            series["Packed_Features"] = group["packed"]
+            for name, ciphertexts in series.items():
+                partials[(disease, name)] = [
+                    executor.submit(_product_chunk, ciphertexts[i:i + chunk_size])
+                    for i in range(0, len(ciphertexts), chunk_size)
+                ]
+
+        indicator_partials = {}
+        if private_key is not None:
+            for disease, group in groups.items():
+                columns = group["columns"]
+                rows = list(zip(columns["Blood_Pressure"], columns["Cholesterol_Level"], columns["Age"]))
+                indicator_partials[disease] = [
+                    executor.submit(_indicator_chunk, private_key, rows[i:i + chunk_size])
+                    for i in range(0, len(rows), chunk_size)
+                ]
+
+        sums = {key: _tree_reduce([future.result() for future in futures], nsquare) for key, futures in partials.items()}
+        indicators = {disease: sum(future.result() for future in futures) for disease, futures in indicator_partials.items()}
+
+    packed_sums = {}
+    for disease in groups:
+        total = sums[(disease, "Packed_Features")]
+        for i, name in enumerate(PACKED_FEATURES):
+            total = total * powmod(sums[(disease, name)], 1 << (SLOT_BITS * i), nsquare) % nsquare
+        if indicators.get(disease):
+            # The summed feature cells already randomise the product, hence r = 1
+            total = total * public_key.raw_encrypt(indicators[disease], r_value=1) % nsquare
+        packed_sums[disease] = total
+    return packed_sums
+
+
+# Turn decrypted slot sums into the statistics shown on the Analysis page
+def summarize(count, slots):
+    sums = {name: slots[name] for name in PACKED_FEATURES}
+    means = {name: sums[name] / count if count else 0.0 for name in PACKED_FEATURES}
+
+    # Binary flags are coded 1/0, so the sum is the number of "Yes" rows
+    histograms = {name: {"Yes": sums[name], "No": count - sums[name]} for name in BINARY_FEATURES}
+
+    # Gender is coded 1/2, so the sum minus the count is the number of 2s
+    second = sums["Gender"] - count * GENDER_MAP["Male"]
+    histograms["Gender"] = {"Male": count - second, "Female": second}
+
+    # Level and age histograms come from the indicator slots
+    bp_labels = {value: label for label, value in BLOOD_PRESSURE_MAP.items()}
+    cholesterol_labels = {value: label for label, value in CHOLESTEROL_LEVEL_MAP.items()}
+    histograms["Blood_Pressure"] = {bp_labels[level]: slots[f"Blood_Pressure={level}"] for level in LEVELS}
+    histograms["Cholesterol_Level"] = {cholesterol_labels[level]: slots[f"Cholesterol_Level={level}"] for level in LEVELS}
+    histograms["Age"] = {
+        f"{age_bin * AGE_BIN_WIDTH}-{age_bin * AGE_BIN_WIDTH + AGE_BIN_WIDTH - 1}": slots[f"Age_bin={age_bin}"]
+        for age_bin in range(MAX_AGE // AGE_BIN_WIDTH + 1)
+    }
+    # Rows whose indicators were never summed, e.g. unpacked rows rebuilt without the private key
+    for name in ("Blood_Pressure", "Cholesterol_Level", "Age"):
+        unknown = count - sum(histograms[name].values())
+        if unknown:
+            histograms[name]["Unknown"] = unknown
+
+    return {
+        "count": count,
+        "sum": sums,
+        "mean": means,
+        "prevalence": {name: means[name] for name in BINARY_FEATURES},
+        "histogram": histograms,
+    }
+
+
+# Decrypt only the final per-disease aggregate
+def decrypt_group_sum(private_key, ciphertext):
+    encrypted_sum = paillier.EncryptedNumber(private_key.public_key, ciphertext, 0)
+    return unpack_slots(private_key.decrypt(encrypted_sum))
+
+
+# Per-disease counts, sums, means and histograms computed on ciphertexts
+def compute_disease_aggregates(private_key, workers=None, chunk_size=512):
+    with db_session() as db:
+        cursor = db.cursor()
+        groups = fetch_grouped_ciphertexts(cursor)
+        cursor.close()
+
+    start = time.perf_counter()
+    packed_sums = encrypted_group_sums(groups, private_key.public_key, workers, chunk_size, private_key)
+    aggregates = {
+        disease: summarize(groups[disease]["count"], decrypt_group_sum(private_key, ciphertext))
+        for disease, ciphertext in packed_sums.items()
+    }
+    elapsed = time.perf_counter() - start
+    rows = sum(group["count"] for group in groups.values())
+    # One per disease, plus the level and age cells of every unpacked row
+    decryptions = len(aggregates) + 3 * (rows - sum(group["packed_count"] for group in groups.values()))
+    print(f"Aggregated {rows} rows into {len(aggregates)} diseases with {decryptions} decryptions in {elapsed:.2f}s.")
+    return aggregates
+
+
+if __name__ == "__main__":
+    _, private_key = load_or_generate_keys()
+    for disease, stats in sorted(compute_disease_aggregates(private_key).items()):
+        prevalence = ", ".join(f"{name} {value:.0%}" for name, value in stats["prevalence"].items())
+        print(f"{disease} (n={stats['count']}, mean age {stats['mean']['Age']:.1f}): {prevalence}")
@@ -0,0 +1,166 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+from phe.util import powmod
+from data.data_config import db_session
+from data.schema import ensure_schema
+from encryption.codec import encode_ciphertext, raw_ciphertext
+from encryption.homomorphic import load_or_generate_keys, indicator_slots, PACKED_FEATURES, SLOT_BITS
+from analytics.aggregates import fetch_grouped_ciphertexts, encrypted_group_sums, decrypt_group_sum, summarize
+
+
+# Ciphertext to add to a disease's running slot sums for one new row
+def row_contribution(public_key, feature_cells=None, packed_cell=None, features=None):
+    """
+    Args:
+        public_key: The Paillier public key of the row.
+        feature_cells (list): The eight stored cells of an unpacked row.
+        packed_cell: The stored cell of a packed row.
+        features (list): The mapped features of an unpacked row, for its indicator slots.
+    Returns:
+        int: Raw ciphertext of the row in packed slot layout.
+    """
+    if packed_cell is not None:
+        return raw_ciphertext(packed_cell)[0]
+
+    # Shift each feature into its slot with a scalar multiplication
+    nsquare = public_key.nsquare
+    contribution = 1
+    for i, cell in enumerate(feature_cells):
+        shifted = powmod(raw_ciphertext(cell)[0], 1 << (SLOT_BITS * i), nsquare)
+        contribution = contribution * shifted % nsquare
+
+    # An indicator is not linear in its feature, so the writer, who still has the
+    # plaintext, adds it; the feature cells already randomise the product, hence r = 1
+    if features is not None:
+        row = dict(zip(PACKED_FEATURES, features))
+        indicators = indicator_slots(row["Blood_Pressure"], row["Cholesterol_Level"], row["Age"])
+        contribution = contribution * public_key.raw_encrypt(indicators, r_value=1) % nsquare
+    return contribution
+
+
+# Fold one row into an in-memory batch of pending aggregate updates
+def accumulate(pending, public_key, disease, contribution, packed):
+    count, packed_count, total = pending.get(disease, (0, 0, 1))
+    pending[disease] = (count + 1, packed_count + int(packed), total * contribution % public_key.nsquare)
+
+
+# Merge a partial batch (e.g. returned by a worker) into pending updates
+def merge(pending, public_key, partial):
+    for disease, (count, packed_count, total) in partial.items():
+        old_count, old_packed, old_total = pending.get(disease, (0, 0, 1))
+        pending[disease] = (old_count + count, old_packed + packed_count, old_total * total % public_key.nsquare)
+
+
+# Apply pending updates to disease_aggregates with one homomorphic add per disease
+def flush_aggregates(cursor, public_key, pending):
+    """
+    Adds every pending (count, packed_count, ciphertext) into its disease row.
+    The row is locked with SELECT ... FOR UPDATE, so the caller's commit makes
+    the patient rows and their aggregate update visible together.
+    """
+    nsquare = public_key.nsquare
+    zero = encode_ciphertext(paillier.EncryptedNumber(public_key, 1, 0))
+    # Lock rows in a fixed order so concurrent writers cannot deadlock
+    for disease, (count, packed_count, total) in sorted(pending.items()):
+        cursor.execute(
+            "INSERT IGNORE INTO disease_aggregates (Disease, row_count, packed_count, slot_sums) VALUES (%s, 0, 0, %s);",
+            (disease, zero),
+        )
+        cursor.execute(
+            "SELECT row_count, packed_count, slot_sums FROM disease_aggregates WHERE Disease = %s FOR UPDATE;",
+            (disease,),
+        )
+        row_count, old_packed, slot_sums = cursor.fetchall()[0]
+        new_sums = raw_ciphertext(slot_sums)[0] * total % nsquare
+        cursor.execute(
+            "UPDATE disease_aggregates SET row_count = %s, packed_count = %s, slot_sums = %s WHERE Disease = %s;",
+            (
+                row_count + count,
+                old_packed + packed_count,
+                encode_ciphertext(paillier.EncryptedNumber(public_key, new_sums, 0)),
+                disease,
+            ),
+        )
+    pending.clear()
+
+
+# Add a single new row to the materialized aggregates
+def update_aggregates(cursor, public_key, disease, feature_cells=None, packed_cell=None, features=None):
+    pending = {}
+    contribution = row_contribution(public_key, feature_cells, packed_cell, features)
+    accumulate(pending, public_key, disease, contribution, packed_cell is not None)
+    flush_aggregates(cursor, public_key, pending)
+
+
+# Recompute disease_aggregates from disease_data in parallel
+def rebuild_aggregates(public_key, workers=None, chunk_size=512, private_key=None):
+    """
+    Replaces every disease_aggregates row in one transaction. Every existing
+    row (and, through the next-key lock, any new Disease key) is locked
+    before disease_data is read, so concurrent writers wait in
+    flush_aggregates: rows committed before the lock are in the snapshot
+    the rebuild sums, and rows committed after it are added on top.
+    Unpacked rows only get their level and age indicators back with the
+    private_key; without it their histogram entries count as Unknown.
+    """
+    start = time.perf_counter()
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        # The schema statements commit implicitly; lock before the snapshot read starts
+        db.commit()
+        cursor.execute("SELECT Disease FROM disease_aggregates FOR UPDATE;")
+        cursor.fetchall()
+        groups = fetch_grouped_ciphertexts(cursor)
+        packed_sums = encrypted_group_sums(groups, public_key, workers, chunk_size, private_key)
+
+        cursor.execute("DELETE FROM disease_aggregates;")
+        cursor.executemany(
+            "INSERT INTO disease_aggregates (Disease, row_count, packed_count, slot_sums) VALUES (%s, %s, %s, %s);",
+            [
+                (
+                    disease,
+                    groups[disease]["count"],
+                    groups[disease]["packed_count"],
+                    encode_ciphertext(paillier.EncryptedNumber(public_key, ciphertext, 0)),
+                )
+                for disease, ciphertext in packed_sums.items()
+            ],
+        )
+        db.commit()
+        cursor.close()
+    print(f"Rebuilt aggregates for {len(packed_sums)} diseases in {time.perf_counter() - start:.2f}s.")
+
+
+# Dashboard statistics: one decryption per disease, independent of the row count
+def read_aggregates(private_key):
+    with db_session() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT Disease, row_count, packed_count, slot_sums FROM disease_aggregates;")
+        rows = cursor.fetchall()
+        cursor.close()
+
+    return {
+        disease: summarize(row_count, decrypt_group_sum(private_key, raw_ciphertext(slot_sums)[0]))
+        for disease, row_count, packed_count, slot_sums in rows
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the materialized encrypted aggregates.")
+    parser.add_argument("command", choices=["rebuild", "show"])
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    public_key, private_key = load_or_generate_keys()
+    if args.command == "rebuild":
+        rebuild_aggregates(public_key, args.workers, private_key=private_key)
+    else:
+        for disease, stats in sorted(read_aggregates(private_key).items()):
+            print(f"{disease}: n={stats['count']}, mean age {stats['mean']['Age']:.1f}, prevalence {stats['prevalence']}")
@@ -0,0 +1,138 @@
+import sys
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data import data_config
+from blockchain import poa
+from encryption.homomorphic import PACKED_FEATURES
+from encryption.search_index import TOKEN_COLUMNS
+
+# Validator of the stand-in users table and its signature
+VALIDATOR = "MD001"
+SIGNATURE = "4fa8c1cdf83eb36e391f810620bfe090be6d41177e9d5dafcdde9de957fd3460"
+# The validator's Ed25519 signing key, in a key directory of its own
+KEY_DIR = tempfile.mkdtemp()
+_, PUBLIC_KEY = poa.generate_validator_key(VALIDATOR, KEY_DIR)
+RECORD = {
+    "Disease": "Influenza", "Gender": "Female", "Fever": "Yes", "Cough": "No", "Fatigue": "Yes",
+    "Difficulty_Breathing": "Yes", "Age": 19, "Blood_Pressure": "Low", "Cholesterol_Level": "Normal",
+    "Outcome_Variable": "Positive",
+}
+
+
+# SQLite stand-in for the MySQL tables, with the indexes from data/schema.py
+def make_database(blocks=0):
+    path = os.path.join(tempfile.mkdtemp(), "patient_record.db")
+    db = sqlite3.connect(path)
+    tokens = list(TOKEN_COLUMNS.values())
+    db.executescript(f"""
+        CREATE TABLE blockchain (
+            index_num INTEGER, data TEXT, previous_hash TEXT, hash TEXT,
+            validator_name TEXT, signature TEXT, created_at TEXT, timestamp INTEGER, block_signature TEXT
+        );
+        CREATE INDEX idx_blockchain_index_num ON blockchain (index_num);
+        CREATE INDEX idx_blockchain_hash ON blockchain (hash);
+        CREATE TABLE users (user_id TEXT PRIMARY KEY, email TEXT, password TEXT, role TEXT, signature TEXT, public_key TEXT);
+        INSERT INTO users VALUES ('{VALIDATOR}', 'md001@example.com', '', 'doctor', '{SIGNATURE}', '{PUBLIC_KEY}');
+        CREATE TABLE block_records (
+            block_index INTEGER, leaf_index INTEGER, leaf_hash TEXT, record TEXT, proof TEXT,
+            PRIMARY KEY (block_index, leaf_index)
+        );
+        CREATE TABLE disease_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, Disease TEXT, {', '.join(f'{feature} BLOB' for feature in PACKED_FEATURES)},
+            Outcome_Variable TEXT, Packed_Features BLOB, Prediction_Variable TEXT, {', '.join(f'{column} TEXT' for column in tokens)}
+        );
+        {' '.join(f'CREATE INDEX idx_{column.lower()} ON disease_data ({column});' for column in tokens)}
+        CREATE TABLE disease_aggregates (Disease TEXT PRIMARY KEY, row_count INTEGER, packed_count INTEGER, slot_sums BLOB);
+        CREATE TABLE ingest_log (seq INTEGER PRIMARY KEY, block_index INTEGER, leaf_index INTEGER, applied_at TEXT, error TEXT);
+        CREATE TABLE paillier_keys (key_id TEXT PRIMARY KEY, n TEXT);
+    """)
+    previous_hash = "0"
+    rows = []
+    for index_num in range(1, blocks + 1):
+        block_hash = f"{index_num:064x}"
+        rows.append((index_num, "Encrypted patient data: {symptoms: [fever, cough]}", previous_hash,
+                     block_hash, VALIDATOR, "signature", "2024-01-01 00:00:00", 1704067200, None))
+        previous_hash = block_hash
+    db.executemany("INSERT INTO blockchain VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);", rows)
+    db.commit()
+    db.close()
+    return path
+
+
+# SQLite integers are signed 64-bit; BIGINT UNSIGNED values past that, like key ids, are bound as text
+def _bind(params):
+    return tuple(str(value) if isinstance(value, int) and value >= 2**63 else value for value in params)
+
+
+class FakeCursor:
+    # Accepts the MySQL placeholders and returns dict rows when a dictionary cursor is asked for
+    def __init__(self, cursor, as_dict):
+        self.cursor = cursor
+        self.as_dict = as_dict
+
+    def execute(self, sql, params=()):
+        sql = sql.replace("%s", "?").replace("NOW()", "CURRENT_TIMESTAMP")
+        self.cursor.execute(sql.replace("INSERT IGNORE", "INSERT OR IGNORE").replace(" FOR UPDATE", ""), _bind(params))
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(sql.replace("%s", "?").replace("INSERT IGNORE", "INSERT OR IGNORE"), [_bind(row) for row in rows])
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        if not self.as_dict:
+            return rows
+        columns = [column[0] for column in self.cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def close(self):
+        self.cursor.close()
+
+
+class FakeDatabase:
+    """
+    One SQLite connection standing in for both a MySQL connection and the pool handing it out.
+    db is the raw SQLite connection, for setting up and checking state behind the code's back;
+    commits counts the commits made through the stand-in.
+    """
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.commits = 0
+
+    def cursor(self, cursor_class=None, dictionary=False):
+        return FakeCursor(self.db.cursor(), cursor_class is not None or dictionary)
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    # Like the pool, a failed block leaves nothing of its transaction behind
+    @contextmanager
+    def connection(self):
+        try:
+            yield self
+        except Exception:
+            self.rollback()
+            raise
+
+    def close(self):
+        self.db.close()
+
+
+# Point every db_session() in the backend at the database at path; without one, no connection can be opened.
+# Blocks are signed with the stand-in validator's key.
+def use_database(path=None):
+    database = FakeDatabase(path) if path is not None else data_config.ConnectionPool(factory=lambda: None)
+    data_config._pool = database
+    poa.KEY_DIR = KEY_DIR
+    return database
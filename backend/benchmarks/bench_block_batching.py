@@ -0,0 +1,84 @@
+import sys
+import os
+import io
+import json
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blockchain import chain, batcher, validators
+from _fakes import make_database, use_database, VALIDATOR, SIGNATURE, RECORD
+
+
+def _block_count(connection):
+    return connection.db.execute("SELECT COUNT(*) FROM blockchain;").fetchone()[0]
+
+
+def run(records, batch_size):
+    print(f"{'mode':>12}  {'records/sec':>11}  {'blocks':>7}  {'commits':>7}")
+
+    # Before: one block, one validator lookup and one commit per record
+    connection = use_database(make_database(0))
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    commits, blocks = connection.commits, _block_count(connection)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for i in range(records):
+            blockchain.add_block(json.dumps(dict(RECORD, Age=i % 100)), VALIDATOR, SIGNATURE)
+    elapsed = time.perf_counter() - start
+    print(f"{'per-record':>12}  {records / elapsed:>11,.0f}  {_block_count(connection) - blocks:>7}  {connection.commits - commits:>7}")
+
+    # After: records sealed into Merkle-root blocks
+    connection = use_database(make_database(0))
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    commits, blocks = connection.commits, _block_count(connection)
+    block_batcher = batcher.BlockBatcher(blockchain, VALIDATOR, SIGNATURE, max_records=batch_size, max_wait_seconds=1.0)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        futures = [block_batcher.add(dict(RECORD, Age=i % 100)) for i in range(records)]
+        block_batcher.stop()
+    locations = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    print(f"{'batched':>12}  {records / elapsed:>11,.0f}  {_block_count(connection) - blocks:>7}  {connection.commits - commits:>7}")
+
+    # Every record must verify against its block on its own
+    for block_index, leaf_index in locations[::max(1, records // 100)]:
+        ok, reason = batcher.verify_record(blockchain, block_index, leaf_index)
+        assert ok, reason
+    connection.db.execute("UPDATE block_records SET record = REPLACE(record, 'Influenza', 'Asthma') WHERE leaf_index = 0;")
+    assert not batcher.verify_record(blockchain, *locations[0])[0]
+    print("Inclusion proofs verified; a tampered record is rejected.")
+
+
+# A partial batch is sealed by time, and a batch whose proofs cannot be stored adds no block
+def check_partial_and_failed_batches(max_wait=0.2):
+    connection = use_database(make_database(0))
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    block_batcher = batcher.BlockBatcher(blockchain, VALIDATOR, SIGNATURE, max_records=100, max_wait_seconds=max_wait)
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        # Without stop(): only the max_wait timer can seal these
+        locations = [future.result(timeout=5) for future in [block_batcher.add(dict(RECORD, Age=i)) for i in range(7)]]
+        waited = time.perf_counter() - start
+        assert {block_index for block_index, _ in locations} == {2} and waited < max_wait + 1
+
+        connection.db.execute("ALTER TABLE block_records RENAME TO block_records_off;")
+        failed = block_batcher.add(RECORD)
+        assert failed.exception(timeout=5) is not None
+        assert _block_count(connection) == 2
+        connection.db.execute("ALTER TABLE block_records_off RENAME TO block_records;")
+        assert block_batcher.add(RECORD).result(timeout=5) == (3, 0)
+        block_batcher.stop()
+    print(f"Partial batch of 7 sealed after {waited:.2f}s; a batch with unstored proofs added no block.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare per-record blocks with Merkle-batched blocks.")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    run(args.records, args.batch_size)
+    check_partial_and_failed_batches()
@@ -0,0 +1,100 @@
+import sys
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blockchain.block_log import BlockLog, LENGTH
+from blockchain.chain import canonical_hash
+
+
+def make_blocks(count):
+    blocks, previous_hash = [], "0"
+    for index_num in range(1, count + 1):
+        block = {
+            "index_num": index_num, "data": f'{{"merkle_root": "{index_num:064x}", "records": 1000}}',
+            "previous_hash": previous_hash, "timestamp": 1704067200 + index_num,
+            "validator_name": "MD001", "signature": "signature", "block_signature": None,
+        }
+        block["hash"] = previous_hash = canonical_hash(block)
+        blocks.append(block)
+    return blocks
+
+
+def _timed(label, count, unit, function):
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {count / elapsed:>12,.0f} {unit}")
+    return result
+
+
+def run(count, lookups):
+    blocks = make_blocks(count)
+    targets = [random.randint(1, count) for _ in range(lookups)]
+    columns = ["index_num", "data", "previous_hash", "hash", "validator_name", "signature", "timestamp", "block_signature"]
+
+    # Before: one INSERT + commit per block in a table (SQLite stand-in for MySQL)
+    db = sqlite3.connect(os.path.join(tempfile.mkdtemp(), "chain.db"))
+    db.executescript("""
+        CREATE TABLE blockchain (index_num INTEGER PRIMARY KEY, data TEXT, previous_hash TEXT, hash TEXT,
+                                 validator_name TEXT, signature TEXT, timestamp INTEGER, block_signature TEXT);
+        CREATE INDEX idx_blockchain_hash ON blockchain (hash);
+    """)
+    print("Table, commit per block:")
+
+    def insert_all():
+        for block in blocks:
+            db.execute("INSERT INTO blockchain VALUES (?, ?, ?, ?, ?, ?, ?, ?);", [block[column] for column in columns])
+            db.commit()
+    _timed("append", count, "blocks/sec", insert_all)
+    _timed("get by index_num", lookups, "lookups/sec",
+           lambda: [db.execute("SELECT * FROM blockchain WHERE index_num = ?;", (i,)).fetchone() for i in targets])
+    _timed("get by hash", lookups, "lookups/sec",
+           lambda: [db.execute("SELECT * FROM blockchain WHERE hash = ?;", (blocks[i - 1]["hash"],)).fetchone() for i in targets])
+    _timed("full scan", count, "blocks/sec", lambda: db.execute("SELECT * FROM blockchain ORDER BY index_num;").fetchall())
+    db.close()
+
+    # After: append-only log with group commit and mmap reads
+    directory = tempfile.mkdtemp()
+    log = BlockLog(directory)
+    print("Block log, group commit:")
+
+    def append_all():
+        for block in blocks:
+            log.append(block)
+        log.sync()
+    _timed("append", count, "blocks/sec", append_all)
+    print(f"  {'fsyncs':<34} {log.fsyncs:>12,}")
+    assert all(log.get(i)["hash"] == blocks[i - 1]["hash"] for i in targets)
+    _timed("get by index_num", lookups, "lookups/sec", lambda: [log.get(i) for i in targets])
+    hash_targets = targets[:max(1, lookups // 10)]
+    assert all(log.find_hash(blocks[i - 1]["hash"])["index_num"] == i for i in hash_targets)
+    _timed("get by hash (segment search)", len(hash_targets), "lookups/sec", lambda: [log.find_hash(blocks[i - 1]["hash"]) for i in hash_targets])
+    _timed("full scan, zero-copy payloads", count, "blocks/sec", lambda: sum(len(payload) for payload in log.scan_raw()))
+    _timed("full scan, decoded", count, "blocks/sec", lambda: sum(1 for _ in log.scan()))
+    log.close()
+
+    # A torn write at the end is dropped when the log is reopened
+    segment = sorted(name for name in os.listdir(directory) if name.endswith(".log"))[-1]
+    with open(os.path.join(directory, segment), "r+b") as file:
+        file.truncate(os.path.getsize(os.path.join(directory, segment)) - LENGTH.size)
+    reopened = BlockLog(directory)
+    assert reopened.height == count - 1 and reopened.last()["hash"] == blocks[-2]["hash"]
+    reopened.append(blocks[-1])
+    assert reopened.get(count)["hash"] == blocks[-1]["hash"]
+    reopened.close()
+    print("Recovered from a torn final record.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare the append-only block log with per-block table inserts.")
+    parser.add_argument("--blocks", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    run(args.blocks, args.lookups)
@@ -0,0 +1,73 @@
+import sys
+import os
+import random
+import sqlite3
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blockchain import chain
+from _fakes import make_database, use_database
+
+
+def measure(tip_only, lookups):
+    tracemalloc.start()
+    start = time.perf_counter()
+    blockchain = chain.Blockchain(tip_only=tip_only)
+    startup = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    height = blockchain.last_block()["index_num"]
+    targets = [random.randint(1, height) for _ in range(lookups)]
+    start = time.perf_counter()
+    for index_num in targets:
+        assert blockchain.get_block(index_num)["index_num"] == index_num
+    by_index = (time.perf_counter() - start) / lookups * 1e6
+    start = time.perf_counter()
+    for index_num in targets:
+        assert blockchain.get_block_by_hash(f"{index_num:064x}")["index_num"] == index_num
+    by_hash = (time.perf_counter() - start) / lookups * 1e6
+    return startup, memory, by_index, by_hash
+
+
+# A chain that cannot be read must not be mistaken for an empty one
+def check_load_errors():
+    path = make_database(3)
+    db = sqlite3.connect(path)
+    db.execute("ALTER TABLE blockchain DROP COLUMN block_signature;")  # as before ensure_schema
+    db.commit()
+
+    # Missing column for the tip query; no database at all for the full load
+    for database, tip_only in ((path, True), (None, False)):
+        use_database(database)
+        try:
+            chain.Blockchain(tip_only=tip_only)
+            raise AssertionError("An unreadable chain loaded as empty.")
+        except RuntimeError:
+            pass
+    assert db.execute("SELECT COUNT(*) FROM blockchain;").fetchone()[0] == 3
+    db.close()
+    print("Load errors: Blockchain raises instead of adding a second genesis block.")
+
+
+def run(sizes, lookups=200):
+    print(f"{'blocks':>10}  {'mode':>9}  {'startup ms':>10}  {'peak MiB':>9}  {'get_block us':>12}  {'by_hash us':>10}")
+    for blocks in sizes:
+        use_database(make_database(blocks))
+        for tip_only in (False, True):
+            startup, memory, by_index, by_hash = measure(tip_only, lookups)
+            print(f"{blocks:>10}  {'tip-only' if tip_only else 'full':>9}  {startup * 1e3:>10.1f}  "
+                  f"{memory / 2**20:>9.2f}  {by_index:>12.1f}  {by_hash:>10.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare Blockchain startup, memory and block lookups with and without tip-only loading.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    run(args.sizes, args.lookups)
+    check_load_errors()
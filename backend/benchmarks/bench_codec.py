@@ -0,0 +1,42 @@
+import sys
+import os
+import time
+import pickle
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from encryption.homomorphic import generate_keys, encrypt_value
+from encryption.codec import encode_ciphertext, decode_ciphertext, register_key
+
+FEATURES_PER_ROW = 8
+
+
+# Compare storage size and decode throughput of pickled and compact ciphertexts
+def run(rows=200):
+    public_key, _ = generate_keys()
+    register_key(public_key)
+
+    values = [encrypt_value(public_key, i % 100) for i in range(rows * FEATURES_PER_ROW)]
+    pickled = [pickle.dumps(value) for value in values]
+    compact = [encode_ciphertext(value) for value in values]
+
+    pickled_bytes = sum(len(cell) for cell in pickled) / rows
+    compact_bytes = sum(len(cell) for cell in compact) / rows
+    print(f"Bytes per row: pickle {pickled_bytes:.0f}, compact {compact_bytes:.0f} "
+          f"({pickled_bytes / compact_bytes:.2f}x smaller)")
+
+    for name, cells, decode in (("pickle", pickled, pickle.loads), ("compact", compact, decode_ciphertext)):
+        start = time.perf_counter()
+        for cell in cells:
+            decode(cell)
+        elapsed = time.perf_counter() - start
+        print(f"Decode {name}: {len(cells) / elapsed:,.0f} cells/sec")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the compact ciphertext codec against pickle.")
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+
+    run(args.rows)
@@ -0,0 +1,81 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feature_codec import CATEGORICAL_MAPS, encode_frame, decode_frame
+from encryption.homomorphic import MAX_AGE
+
+FEATURES = list(CATEGORICAL_MAPS) + ["Age"]
+
+
+# Random label rows, with a small share of values that have no mapping
+def make_rows(rows, unknown_rate=0.001, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for name, mapping in CATEGORICAL_MAPS.items():
+        labels = np.array(list(mapping) + ["Unknown"], dtype=object)
+        weights = np.full(len(labels), (1 - unknown_rate) / (len(labels) - 1))
+        weights[-1] = unknown_rate
+        data[name] = rng.choice(labels, size=rows, p=weights)
+    # A few ages fall outside 0..MAX_AGE and must be reported like unknown labels
+    data["Age"] = rng.integers(-2, MAX_AGE + 3, size=rows).astype(str)
+    return pd.DataFrame(data)
+
+
+# The per-row dict lookups this replaces (data/ingest.map_row, main.reverse_mapping)
+def encode_per_row(df):
+    encoded, skipped = [], 0
+    for row in df[FEATURES].itertuples(index=False):
+        age = int(row[-1])
+        mapped = [CATEGORICAL_MAPS[name].get(value, None) for name, value in zip(FEATURES[:-1], row[:-1])] + [age if 0 <= age <= MAX_AGE else None]
+        if None in mapped:
+            skipped += 1
+            continue
+        encoded.append(mapped)
+    return encoded, skipped
+
+
+def decode_per_row(df):
+    reverse_maps = {name: {code: label for label, code in mapping.items()} for name, mapping in CATEGORICAL_MAPS.items()}
+    return [
+        [reverse_maps[name].get(value, value) for name, value in zip(FEATURES[:-1], row[:-1])] + [row[-1]]
+        for row in df[FEATURES].itertuples(index=False)
+    ]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(rows=1_000_000):
+    df = make_rows(rows)
+
+    (per_row, per_row_skipped), per_row_encode = timed(encode_per_row, df)
+    (encoded, unknown), columnar_encode = timed(encode_frame, df)
+    skipped = unknown.any(axis=1).to_numpy()
+    assert int(skipped.sum()) == per_row_skipped
+    assert encoded[~skipped][FEATURES].astype(np.int64).values.tolist() == per_row
+
+    codes = encoded[~skipped].reset_index(drop=True)
+    per_row_decoded, per_row_decode = timed(decode_per_row, codes)
+    (decoded, _), columnar_decode = timed(decode_frame, codes)
+    assert decoded[FEATURES].values.tolist() == per_row_decoded
+
+    print(f"{rows:,} rows, {per_row_skipped:,} with unknown values")
+    print(f"Encode: per-row {per_row_encode:.2f}s, columnar {columnar_encode:.3f}s ({per_row_encode / columnar_encode:.0f}x)")
+    print(f"Decode: per-row {per_row_decode:.2f}s, columnar {columnar_decode:.3f}s ({per_row_decode / columnar_decode:.0f}x)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare per-row and columnar feature encoding.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    run(args.rows)
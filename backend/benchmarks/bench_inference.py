@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import statistics
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_model.ml_pipeline import get_artifacts, get_predictor
+from ml_model.compiled import CompiledForest, parity_mismatches
+from ml_model.serving import MODEL_INPUT_COLUMNS
+from ml_model.train import load_csv_data
+from feature_codec import CATEGORICAL_MAPS
+
+
+# Random coded rows, including diseases the model has never seen
+def make_rows(rows, diseases, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {"Disease": rng.choice(list(diseases) + ["Unknown Disease"], size=rows)}
+    for col in MODEL_INPUT_COLUMNS[1:]:
+        if col in CATEGORICAL_MAPS:
+            data[col] = rng.choice(list(CATEGORICAL_MAPS[col].values()), size=rows)
+        else:
+            data[col] = rng.integers(0, 100, size=rows)
+    return pd.DataFrame(data, columns=MODEL_INPUT_COLUMNS)
+
+
+def median_ms(fn, X, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def run(batch_sizes=(1, 10, 100, 1000, 10000), repeats=7):
+    version, preprocessor, model = get_artifacts()
+    compiled = CompiledForest(preprocessor, model)
+    X_csv, _ = load_csv_data()
+    X_random = make_rows(max(batch_sizes), X_csv["Disease"].unique())
+
+    # Parity: the compiled forest must predict exactly what scikit-learn predicts
+    for label, X in [("dataset", X_csv), ("random", X_random)]:
+        mismatches = parity_mismatches(preprocessor, model, compiled, X)
+        if len(mismatches):
+            raise AssertionError(f"{len(mismatches)} of {len(X)} {label} rows differ from model.predict, e.g. row {mismatches[0]}")
+        print(f"Parity on {len(X)} {label} rows: OK")
+
+    # Uncached, so "auto" shows the compiled/sklearn crossover rather than the prediction cache
+    _, auto = get_predictor("compiled", cache=False)
+    backends = [
+        ("sklearn", lambda X: model.predict(preprocessor.transform(X))),
+        ("compiled", compiled.predict),
+        ("auto", auto),
+    ]
+    print(f"\nModel version {version}, median latency (ms):")
+    print(f"{'batch':>7}" + "".join(f"{name:>12}" for name, _ in backends))
+    for size in batch_sizes:
+        X = X_random.iloc[:size]
+        print(f"{size:>7}" + "".join(f"{median_ms(fn, X, repeats):>12.2f}" for _, fn in backends))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check compiled-forest parity and compare inference latency by batch size.")
+    parser.add_argument("--repeats", type=int, default=7)
+    args = parser.parse_args()
+
+    run(repeats=args.repeats)
@@ -0,0 +1,63 @@
+import sys
+import os
+import io
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+from data import db as serial, ingest
+from _fakes import make_database, use_database
+
+CSV_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'Disease_symptom_and_patient_profile_dataset.csv')
+
+
+def _use_database(keys):
+    # The MySQL-only schema setup has no stand-in equivalent
+    serial.ensure_schema = ingest.ensure_schema = lambda cursor: None
+    serial.load_or_generate_keys = ingest.load_or_generate_keys = lambda: keys
+    return use_database(make_database())
+
+
+def _table(database):
+    rows = database.db.execute("SELECT COUNT(*) FROM disease_data;").fetchone()[0]
+    aggregates = database.db.execute("SELECT Disease, row_count FROM disease_aggregates ORDER BY Disease;").fetchall()
+    return rows, aggregates
+
+
+def run(file_path, workers, chunk_size, packed, key_bits):
+    keys = paillier.generate_paillier_keypair(n_length=key_bits)
+    print(f"{'loader':>24}  {'rows':>6}  {'rows/sec':>9}")
+
+    # Before: data/db.py encrypts and inserts one row at a time in the calling process
+    database = _use_database(keys)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        serial.insert_csv_to_db(file_path, packed, indexed=False)
+    elapsed = time.perf_counter() - start
+    expected = _table(database)
+    print(f"{'serial (data/db.py)':>24}  {expected[0]:>6}  {expected[0] / elapsed:>9,.1f}")
+
+    # After: data/ingest.py encrypts chunks in worker processes and writes them with executemany
+    database = _use_database(keys)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        ingest.insert_csv_batched(file_path, chunk_size, workers=workers, packed=packed, indexed=False)
+    elapsed = time.perf_counter() - start
+    # Both loaders must write the same rows and per-disease counts
+    assert _table(database) == expected
+    print(f"{'pooled (data/ingest.py)':>24}  {expected[0]:>6}  {expected[0] / elapsed:>9,.1f}  ({workers} workers)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare the serial CSV loader with the process-pool loader.")
+    parser.add_argument("file_path", nargs="?", default=CSV_FILE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--columns", action="store_true", help="Store one ciphertext per feature instead of packed rows.")
+    parser.add_argument("--key-bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    run(args.file_path, args.workers, args.chunk_size, not args.columns, args.key_bits)
@@ -0,0 +1,183 @@
+import sys
+import os
+import io
+import json
+import time
+import tempfile
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blockchain import chain, batcher, validators
+from blockchain.block_log import BlockLog
+from data import ingest_service
+from analytics import materialized
+from phe import paillier
+from encryption.homomorphic import encrypt_value
+from encryption.codec import encode_ciphertext
+from feature_codec import CSV_COLUMNS
+from _fakes import make_database, use_database, VALIDATOR, SIGNATURE, RECORD
+
+
+def _use_database(keys):
+    # The MySQL-only schema setup of start() has no stand-in equivalent
+    ingest_service.ensure_schema = lambda cursor: None
+    ingest_service.load_or_generate_keys = lambda: keys
+    return use_database(make_database(0))
+
+
+def _patient(i):
+    return dict(RECORD, Age=i % 100)
+
+
+def _count(connection, sql):
+    return connection.db.execute(sql).fetchone()[0]
+
+
+# Before: what add_patient does per patient, with the caller waiting for all of it
+def run_synchronous(records, keys):
+    public_key = keys[0]
+    connection = _use_database(keys)
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    block_batcher = batcher.BlockBatcher(blockchain, VALIDATOR, SIGNATURE)
+    encoded_rows, _ = ingest_service.map_rows([[_patient(i)[col] for col in CSV_COLUMNS] for i in range(records)])
+    latencies = []
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for i, row in enumerate(encoded_rows):
+            began = time.perf_counter()
+            cells = [encode_ciphertext(encrypt_value(public_key, value)) for value in row[1:9]]
+            with chain.db_session() as db:
+                cursor = db.cursor()
+                cursor.execute(ingest_service.insert_sql(), (row[0],) + tuple(cells) + (row[9],))
+                materialized.update_aggregates(cursor, public_key, row[0], feature_cells=cells, features=row[1:9])
+                db.commit()
+            block_batcher.add(_patient(i))
+            latencies.append(time.perf_counter() - began)
+        block_batcher.stop()
+    return records / (time.perf_counter() - start), latencies
+
+
+# After: patients acknowledged once journaled; everything else in the background
+def run_async(records, keys, clients, workers):
+    connection = _use_database(keys)
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    wal_dir = tempfile.mkdtemp()
+    latencies = []
+
+    def submit(i):
+        began = time.perf_counter()
+        seq = service.submit(_patient(i))
+        latencies.append(time.perf_counter() - began)
+        return seq
+
+    with redirect_stdout(io.StringIO()):
+        service = ingest_service.IngestService(blockchain, VALIDATOR, SIGNATURE, workers=workers, wal_dir=wal_dir).start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            seqs = list(pool.map(submit, range(records)))
+        acknowledged = time.perf_counter() - start
+        service.stop()
+    completed = time.perf_counter() - start
+
+    assert sorted(seqs) == list(range(1, records + 1))
+    assert _count(connection, "SELECT COUNT(*) FROM disease_data;") == records
+    assert _count(connection, "SELECT COUNT(*) FROM ingest_log WHERE block_index IS NULL;") == 0
+    _check_chain_order(connection, records)
+    return records / acknowledged, records / completed, latencies, service.stats()
+
+
+# Records must sit on the chain in queue order: (block, leaf) ascending with seq
+def _check_chain_order(connection, records, dead=()):
+    rows = connection.db.execute("SELECT record FROM block_records ORDER BY block_index, leaf_index;").fetchall()
+    assert [json.loads(record)["seq"] for record, in rows] == [seq for seq in range(1, records + 1) if seq not in dead]
+
+
+# A crash after journaling: some records applied but not chained, the rest not applied at all
+def check_recovery(keys, journaled=300, applied=120):
+    connection = _use_database(keys)
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    wal_dir = tempfile.mkdtemp()
+    wal = BlockLog(wal_dir)
+    for seq in range(1, journaled + 1):
+        wal.append({"index_num": seq, "row": [_patient(seq)[col] for col in CSV_COLUMNS]})
+    wal.close()
+    connection.db.executemany("INSERT INTO ingest_log (seq) VALUES (?);", [(seq,) for seq in range(1, applied + 1)])
+    connection.db.commit()
+
+    with redirect_stdout(io.StringIO()):
+        service = ingest_service.IngestService(blockchain, VALIDATOR, SIGNATURE, workers=2, wal_dir=wal_dir).start()
+        seq = service.submit(_patient(0))
+        service.stop()
+    assert seq == journaled + 1
+    assert service.replayed == journaled - applied
+    assert _count(connection, "SELECT COUNT(*) FROM disease_data;") == journaled + 1 - applied
+    assert _count(connection, "SELECT COUNT(*) FROM ingest_log WHERE block_index IS NULL;") == 0
+    _check_chain_order(connection, journaled + 1)
+    print(f"Recovery: {applied} applied records re-chained, {journaled - applied} replayed, chain order kept.")
+
+
+# Records that can never be written are dead-lettered instead of blocking the ones behind them
+def check_dead_letters(keys, records=20, poison=8):
+    connection = _use_database(keys)
+    # Stands in for a deterministic insert failure, e.g. a Disease wider than its column
+    connection.db.execute("""
+        CREATE TRIGGER poison BEFORE INSERT ON disease_data WHEN NEW.Disease = 'Poison'
+        BEGIN SELECT RAISE(ABORT, 'Data too long for column Disease'); END;
+    """)
+    connection.db.commit()
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    wal_dir = tempfile.mkdtemp()
+    # Queued before validation covered it: an age the packed layout cannot hold
+    wal = BlockLog(wal_dir)
+    wal.append({"index_num": 1, "row": [dict(_patient(1), Age=200)[col] for col in CSV_COLUMNS]})
+    wal.close()
+    ingest_service.COMMIT_RETRY_SECONDS = 0.01
+
+    with redirect_stdout(io.StringIO()):
+        service = ingest_service.IngestService(blockchain, VALIDATOR, SIGNATURE, workers=1, wal_dir=wal_dir).start()
+        for age in (200, -3):
+            try:
+                service.submit(dict(RECORD, Age=age))
+                raise AssertionError(f"Age {age} was accepted.")
+            except ValueError:
+                pass
+        seqs = [service.submit(dict(_patient(i), Disease="Poison") if i == poison else _patient(i)) for i in range(2, records + 1)]
+        service.stop()
+    assert seqs == list(range(2, records + 1))
+    dead = {1, poison}
+    assert service.stats()["dead_lettered"] == len(dead)
+    assert _count(connection, "SELECT COUNT(*) FROM disease_data;") == records - len(dead)
+    assert {seq for seq, in connection.db.execute("SELECT seq FROM ingest_log WHERE error IS NOT NULL;")} == dead
+    _check_chain_order(connection, records, dead)
+    print(f"Dead letters: records {sorted(dead)} set aside; the {records - len(dead)} others written and chained in order.")
+
+
+def _percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1e3
+
+
+def run(records, clients, workers, key_bits):
+    keys = paillier.generate_paillier_keypair(n_length=key_bits)
+    print(f"{'mode':>12}  {'ack/sec':>9}  {'done/sec':>9}  {'p50 ms':>7}  {'p99 ms':>7}")
+    throughput, latencies = run_synchronous(records, keys)
+    print(f"{'synchronous':>12}  {throughput:>9,.0f}  {throughput:>9,.0f}  {_percentile(latencies, 0.5):>7.1f}  {_percentile(latencies, 0.99):>7.1f}")
+    acknowledged, completed, latencies, stats = run_async(records, keys, clients, workers)
+    print(f"{'async':>12}  {acknowledged:>9,.0f}  {completed:>9,.0f}  {_percentile(latencies, 0.5):>7.1f}  {_percentile(latencies, 0.99):>7.1f}")
+    print(f"Service: {stats}")
+    check_recovery(keys)
+    check_dead_letters(keys)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare synchronous add_patient writes with the async ingestion service.")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--key-bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    run(args.records, args.clients, args.workers, args.key_bits)
@@ -0,0 +1,62 @@
+import sys
+import os
+import time
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+from encryption.homomorphic import ObfuscatorPool, encrypt_value, decrypt_value
+
+FEATURES_PER_ROW = 8
+
+
+# Latency of encrypting one patient's features, with a pause between patients like add_patient's prompts
+def measure(public_key, patients, pause, pool=None):
+    latencies = []
+    for i in range(patients):
+        start = time.perf_counter()
+        for value in range(FEATURES_PER_ROW):
+            encrypt_value(public_key, (i + value) % 100, pool)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(pause)
+    return latencies
+
+
+def run(patients, pause, key_bits):
+    public_key, private_key = paillier.generate_paillier_keypair(n_length=key_bits)
+    print(f"{'mode':>8}  {'p50 ms':>7}  {'p99 ms':>7}  {'hit rate':>8}")
+
+    latencies = measure(public_key, patients, pause)
+    print(f"{'plain':>8}  {statistics.median(latencies) * 1e3:>7.2f}  {_p99(latencies):>7.2f}  {'-':>8}")
+
+    pool = ObfuscatorPool(public_key)
+    # Let the background thread fill the pool, as it does while the user logs in
+    while pool.stats()["ready"] < pool.size:
+        time.sleep(0.01)
+    latencies = measure(public_key, patients, pause, pool)
+    stats = pool.stats()
+    print(f"{'pooled':>8}  {statistics.median(latencies) * 1e3:>7.2f}  {_p99(latencies):>7.2f}  {stats['hit_rate']:>8.2f}")
+
+    # A pooled ciphertext decrypts correctly and is not obfuscated a second time on a secure read
+    encrypted_value = encrypt_value(public_key, 42, pool)
+    assert decrypt_value(private_key, encrypted_value) == 42
+    assert encrypted_value.ciphertext(be_secure=True) == encrypted_value.ciphertext(be_secure=False)
+    pool.stop()
+    print("Pooled ciphertexts decrypt correctly and are not obfuscated again.")
+
+
+def _p99(latencies):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e3
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare encrypt_value latency with and without the obfuscator pool.")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--pause", type=float, default=1.0, help="Seconds between patients, the time the pool has to refill.")
+    parser.add_argument("--key-bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    run(args.patients, args.pause, args.key_bits)
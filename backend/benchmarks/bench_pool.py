@@ -0,0 +1,124 @@
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import ConnectionPool
+
+# One add_patient touches these call sites, each of which used to open its own connection
+OPERATION = [
+    ("get_validator", "SELECT * FROM users WHERE user_id = ?;", ("MD001",)),
+    ("save_block_to_db", "INSERT INTO blockchain (data) VALUES (?);", ("block",)),
+    ("fetch_encrypted_data", "SELECT * FROM disease_data;", ()),
+    ("store_predictions_in_db", "UPDATE disease_data SET Prediction_Variable = ? WHERE id = ?;", ("Positive", 1)),
+]
+
+
+# SQLite stand-in for the MySQL schema the call sites use
+def make_database():
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE users (user_id TEXT PRIMARY KEY, signature TEXT);
+        CREATE TABLE blockchain (index_num INTEGER PRIMARY KEY, data TEXT);
+        CREATE TABLE disease_data (id INTEGER PRIMARY KEY, Prediction_Variable TEXT);
+        INSERT INTO users VALUES ('MD001', 'signature');
+        INSERT INTO disease_data (id) VALUES (1);
+    """)
+    db.commit()
+    db.close()
+    return path
+
+
+def _sqlite_alive(connection):
+    try:
+        connection.execute("SELECT 1;")
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def run(operations=500):
+    path = make_database()
+    setups = {"per-call": 0}
+
+    def connect():
+        setups["per-call"] += 1
+        return sqlite3.connect(path, check_same_thread=False)
+
+    # Before: every call site opens and closes its own connection
+    start = time.perf_counter()
+    for _ in range(operations):
+        for _, sql, params in OPERATION:
+            db = connect()
+            db.execute(sql, params).fetchall()
+            db.commit()
+            db.close()
+    per_call_elapsed = time.perf_counter() - start
+
+    # After: call sites check connections out of the shared pool
+    pool = ConnectionPool(factory=lambda: sqlite3.connect(path, check_same_thread=False), size=5, health_check=_sqlite_alive)
+    start = time.perf_counter()
+    for _ in range(operations):
+        for _, sql, params in OPERATION:
+            with pool.connection() as db:
+                db.execute(sql, params).fetchall()
+                db.commit()
+    pooled_elapsed = time.perf_counter() - start
+    pool.close()
+
+    print(f"Per-call connections: {setups['per-call'] / operations:.2f} setups/operation, "
+          f"{operations / per_call_elapsed:,.0f} operations/sec")
+    print(f"Pooled connections:   {pool.connections_created / operations:.4f} setups/operation, "
+          f"{operations / pooled_elapsed:,.0f} operations/sec")
+
+
+# Stand-in connection recording how the pool ends its transactions
+class _Tracked:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.rollbacks = 0
+        self.closed = False
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def check_release():
+    created = []
+
+    def factory():
+        created.append(_Tracked())
+        return created[-1]
+
+    # A read-only user's transaction is ended before the connection is reused
+    pool = ConnectionPool(factory=factory, size=3, health_check=lambda connection: connection.alive, check_after=0)
+    with pool.connection() as reader:
+        pass
+    assert reader.rollbacks == 1
+
+    # Every stale idle connection that fails its check is dropped, not only the first
+    with pool.connection() as first, pool.connection() as second:
+        pass
+    first.alive = second.alive = False
+    time.sleep(0.01)
+    with pool.connection() as connection:
+        assert connection.alive and first.closed and second.closed and len(created) == 3
+    skipped = sum(connection.closed for connection in created)
+    print(f"Release: transactions rolled back on return; {skipped} dead idle connections skipped in one checkout.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare connection setups per operation with and without the pool.")
+    parser.add_argument("--operations", type=int, default=500)
+    args = parser.parse_args()
+
+    run(args.operations)
+    check_release()
@@ -0,0 +1,47 @@
+import sys
+import os
+import time
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_model.ml_pipeline import get_artifacts, get_predictor
+from ml_model.prediction_cache import PredictionCache, known_diseases
+from ml_model.train import load_csv_data
+
+
+# Replay the dataset as single-row requests, the interactive prediction pattern
+def replay(predict, X, passes):
+    start = time.perf_counter()
+    for _ in range(passes):
+        for i in range(len(X)):
+            predict(X.iloc[i:i + 1])
+    return (time.perf_counter() - start) / (passes * len(X)) * 1e6
+
+
+def run(passes=3, precompute=False):
+    version, preprocessor, _ = get_artifacts()
+    _, predict = get_predictor(cache=False)
+    X, _ = load_csv_data()
+
+    print(f"Uncached:     {replay(predict, X, passes):8.1f} us/request")
+
+    cache = PredictionCache()
+    print(f"LRU cache:    {replay(lambda rows: cache.predict(rows, version, predict), X, passes):8.1f} us/request  {cache.stats()}")
+
+    if precompute:
+        table = PredictionCache()
+        start = time.perf_counter()
+        size = table.precompute(version, predict, known_diseases(preprocessor))
+        print(f"Precomputed {size} inputs in {time.perf_counter() - start:.1f}s")
+        print(f"Dense table:  {replay(lambda rows: table.predict(rows, version, predict), X, passes):8.1f} us/request  {table.stats()}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare single-row prediction latency with and without the prediction cache.")
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--precompute", action="store_true", help="Also precompute the whole input domain")
+    args = parser.parse_args()
+
+    run(args.passes, args.precompute)
@@ -0,0 +1,94 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+from encryption import row_cache
+from encryption.bulk import decrypt_cell
+from encryption.homomorphic import unpack_features
+from encryption.codec import encode_ciphertext
+from _fakes import FakeDatabase
+from bench_search_index import make_patient_database
+
+# The columns main.decrypt_data_from_db reads
+SELECT_SQL = """
+SELECT id, Disease, Gender, Fever, Cough, Fatigue, Difficulty_Breathing, Age, Blood_Pressure, Cholesterol_Level, Prediction_Variable, Packed_Features
+FROM disease_data ORDER BY id LIMIT %s;
+"""
+
+
+# Before: every view decrypts every row again
+def view_uncached(cursor, private_key, page):
+    cursor.execute(SELECT_SQL, (page,))
+    decrypted_rows = []
+    for row in cursor.fetchall():
+        if row[11] is not None:
+            decrypted_rows.append(unpack_features(decrypt_cell(private_key, row[11])))
+        else:
+            decrypted_rows.append([int(decrypt_cell(private_key, cell)) for cell in row[2:10]])
+    return decrypted_rows
+
+
+def view_cached(cursor, private_key, page, cache):
+    cursor.execute(SELECT_SQL, (page,))
+    return [cache.features(private_key, row[0], row[2:10], row[11]) for row in cursor.fetchall()]
+
+
+def run(rows, page, views, packed, key_bits):
+    public_key, private_key = paillier.generate_paillier_keypair(n_length=key_bits)
+    connection = FakeDatabase(make_patient_database(rows, public_key, os.urandom(32), packed))
+    cursor = connection.cursor()
+
+    print(f"{'mode':>16}  {'ms/view':>9}  {'decryptions':>11}  {'cache KiB':>9}")
+    start = time.perf_counter()
+    for _ in range(views):
+        expected = view_uncached(cursor, private_key, page)
+    elapsed = time.perf_counter() - start
+    per_row = 1 if packed else 8
+    print(f"{'uncached':>16}  {elapsed / views * 1e3:>9.2f}  {views * page * per_row:>11}  {0:>9}")
+
+    for encrypt_at_rest in (False, True):
+        cache = row_cache.DecryptedRowCache(encrypt_at_rest=encrypt_at_rest)
+        assert view_cached(cursor, private_key, page, cache) == expected
+        first = cache.stats()["decryptions"]
+        start = time.perf_counter()
+        for _ in range(views):
+            assert view_cached(cursor, private_key, page, cache) == expected
+        elapsed = time.perf_counter() - start
+        stats = cache.stats()
+        # Repeated views must not decrypt anything
+        assert stats["decryptions"] == first
+        mode = "cached, sealed" if encrypt_at_rest else "cached"
+        print(f"{mode:>16}  {elapsed / views * 1e3:>9.2f}  {stats['decryptions'] - first:>11}  {stats['bytes'] / 1024:>9.1f}")
+
+    # A rewritten cell changes the row digest, so the new value is decrypted and served
+    cell_column = "Packed_Features" if packed else "Fever"
+    new_cell = encode_ciphertext(public_key.encrypt(0))
+    connection.db.execute(f"UPDATE disease_data SET {cell_column} = ? WHERE id = 1;", (new_cell,))
+    connection.db.commit()
+    features = view_cached(cursor, private_key, page, cache)[0]
+    assert (features == [0] * 8) if packed else (features[1] == 0)
+    assert cache.stats()["invalidations"] == 1
+
+    # A budget smaller than the page keeps evicting, and still returns correct rows
+    small = row_cache.DecryptedRowCache(budget_bytes=(page // 2) * 300)
+    for _ in range(2):
+        assert view_cached(cursor, private_key, page, small)[1:] == expected[1:]
+    stats = small.stats()
+    assert stats["bytes"] <= stats["budget"] and stats["evictions"] > 0
+    print(f"Small budget: {stats['entries']} rows kept, {stats['evictions']} evictions; a rewritten row is decrypted again.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare repeated record views with and without the decrypted-row cache.")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--views", type=int, default=20)
+    parser.add_argument("--columns", action="store_true", help="Store one ciphertext per feature instead of packed rows.")
+    parser.add_argument("--key-bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    run(args.rows, args.page, args.views, not args.columns, args.key_bits)
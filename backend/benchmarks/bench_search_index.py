@@ -0,0 +1,110 @@
+import sys
+import os
+import io
+import random
+import sqlite3
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+from data import ingest
+from encryption import search_index
+from encryption.homomorphic import PACKED_FEATURES, unpack_features
+from encryption.bulk import decrypt_cell
+from feature_codec import CATEGORICAL_MAPS, decode_frame
+from _fakes import make_database, FakeDatabase
+
+QUERIES = [
+    {"Fever": "Yes", "Blood_Pressure": "High"},
+    {"Gender": "Female"},
+    {"Age": [30, 35, 40]},
+    {"Cholesterol_Level": "Low", "Cough": "Yes", "Fatigue": "No"},
+    {"Disease": "Asthma", "Difficulty_Breathing": "Yes"},
+]
+DISEASES = ["Influenza", "Asthma", "Common Cold", "Diabetes", "Migraine"]
+
+
+# The stand-in database with rows of random patients, tokens included
+def make_patient_database(rows, public_key, index_key, packed):
+    path = make_database()
+    db = sqlite3.connect(path)
+    labels = {feature: list(mapping) for feature, mapping in CATEGORICAL_MAPS.items()}
+    csv_rows = [
+        [random.choice(DISEASES)] + [
+            random.randint(18, 80) if feature == "Age" else random.choice(labels[feature]) for feature in PACKED_FEATURES
+        ] + [random.choice(["Positive", "Negative"])]
+        for _ in range(rows)
+    ]
+    ingest.init_encrypt_worker(public_key, packed, index_key)
+    encrypted_rows = [encrypted_row for encrypted_row, _ in ingest.encrypt_rows(csv_rows)]
+    db.executemany(ingest.insert_sql(packed, indexed=True).replace("%s", "?"), encrypted_rows)
+    db.commit()
+    db.close()
+    return path
+
+
+# Before: fetch and decrypt the whole table, then filter in Python
+def full_scan(cursor, private_key, conditions):
+    cursor.execute(f"SELECT {', '.join(search_index.RESULT_COLUMNS)} FROM disease_data ORDER BY id;")
+    decrypted_rows = []
+    for row in cursor.fetchall():
+        if row[-1] is not None:
+            features = unpack_features(decrypt_cell(private_key, row[-1]))
+        else:
+            features = [int(decrypt_cell(private_key, cell)) for cell in row[2:10]]
+        decrypted_rows.append([row[0], row[1]] + list(features) + [row[10]])
+    decoded, _ = decode_frame(pd.DataFrame(decrypted_rows, columns=search_index.RESULT_COLUMNS[:-1]))
+    for column, values in conditions.items():
+        decoded = decoded[decoded[column].isin(values if isinstance(values, list) else [values])]
+    return decoded
+
+
+def run(rows, packed, key_bits):
+    public_key, private_key = paillier.generate_paillier_keypair(n_length=key_bits)
+    index_key = os.urandom(32)
+    connection = FakeDatabase(make_patient_database(rows, public_key, index_key, packed))
+    cursor = connection.cursor()
+
+    print(f"{'query':>52}  {'rows':>6}  {'scan ms':>9}  {'indexed ms':>10}")
+    for conditions in QUERIES:
+        start = time.perf_counter()
+        expected = full_scan(cursor, private_key, conditions)
+        scan = time.perf_counter() - start
+        start = time.perf_counter()
+        matches = search_index.find_patients(cursor, private_key, index_key, conditions)
+        indexed = time.perf_counter() - start
+        assert matches["id"].tolist() == expected["id"].tolist()
+        label = " AND ".join(f"{column}={values}" for column, values in conditions.items())
+        print(f"{label:>52}  {len(matches):>6}  {scan * 1e3:>9.1f}  {indexed * 1e3:>10.1f}")
+
+    # Rows written before the index existed: the search refuses them until the rebuild fills them in
+    connection.db.execute(f"UPDATE disease_data SET {search_index.TOKEN_COLUMNS['Fever']} = NULL WHERE id % 3 = 0;")
+    connection.db.commit()
+    try:
+        search_index.find_patients(cursor, private_key, index_key, QUERIES[0])
+        raise AssertionError("An incomplete index was used.")
+    except RuntimeError:
+        pass
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        rebuilt = search_index.rebuild_index(cursor, connection, private_key, index_key, workers=2)
+    elapsed = time.perf_counter() - start
+    assert rebuilt == len(range(3, rows + 1, 3))
+    matches = search_index.find_patients(cursor, private_key, index_key, QUERIES[0])
+    assert matches["id"].tolist() == full_scan(cursor, private_key, QUERIES[0])["id"].tolist()
+    print(f"Rebuilt the tokens of {rebuilt} rows in {elapsed:.2f}s; indexed results match the full scan.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare full-table decryption with token-indexed equality searches.")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--columns", action="store_true", help="Store one ciphertext per feature instead of packed rows.")
+    parser.add_argument("--key-bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    run(args.rows, not args.columns, args.key_bits)
@@ -0,0 +1,98 @@
+import sys
+import os
+import csv
+import json
+import time
+import statistics
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_model.serving import MicroBatcher, encode_patient, MODEL_INPUT_COLUMNS
+
+DATASET = os.path.join(os.path.dirname(__file__), '..', 'data', 'Disease_symptom_and_patient_profile_dataset.csv')
+
+
+# Request payloads taken from the dataset, with labels as the endpoint receives them
+def load_payloads(limit=1000):
+    with open(DATASET, 'r') as file:
+        reader = csv.DictReader(file)
+        return [{col: row[col] for col in MODEL_INPUT_COLUMNS} for _, row in zip(range(limit), reader)]
+
+
+def _percentile(latencies, p):
+    latencies = sorted(latencies)
+    rank = max(0, min(len(latencies) - 1, int(round(p / 100 * len(latencies))) - 1))
+    return latencies[rank] * 1000
+
+
+# Fire requests from concurrent clients and measure latency on the client side
+def load_test(send, payloads, clients, requests):
+    def timed(payload):
+        start = time.perf_counter()
+        send(payload)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = list(executor.map(timed, (payloads[i % len(payloads)] for i in range(requests))))
+    elapsed = time.perf_counter() - start
+    return {
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput_rps": requests / elapsed,
+    }
+
+
+def _report(label, result, extra=""):
+    print(f"{label:<24} p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+          f"{result['throughput_rps']:8.1f} req/s{extra}")
+
+
+# Load-test a running server's /predict endpoint
+def run_http(url, clients, requests, cookie):
+    # The endpoints require a logged-in session
+    headers = {"Cookie": f"session={cookie}"}
+
+    def send(payload):
+        req = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json", **headers})
+        with urllib.request.urlopen(req) as response:
+            return json.loads(response.read())
+
+    _report(url, load_test(send, load_payloads(), clients, requests))
+    with urllib.request.urlopen(urllib.request.Request(url.rstrip('/') + '/stats', headers=headers)) as response:
+        print(f"Server stats: {json.loads(response.read())}")
+
+
+# Compare unbatched and micro-batched inference in-process
+def run_local(clients, requests, max_batch_size, max_wait_ms):
+    payloads = load_payloads()
+    for label, batch_size, wait_ms in [
+        ("unbatched", 1, 0),
+        (f"batched ({max_batch_size}, {max_wait_ms} ms)", max_batch_size, max_wait_ms),
+    ]:
+        batcher = MicroBatcher(max_batch_size=batch_size, max_wait_ms=wait_ms)
+        batcher.predict(encode_patient(payloads[0]))  # Load the model outside the timing
+        result = load_test(lambda payload: batcher.predict(encode_patient(payload)), payloads, clients, requests)
+        stats = batcher.stats.snapshot()
+        batcher.stop()
+        _report(label, result, f"  mean batch {stats['mean_batch_size']:.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test prediction serving with and without micro-batching.")
+    parser.add_argument("--url", default=None, help="POST to a running server, e.g. http://localhost:5000/predict")
+    parser.add_argument("--cookie", default="", help="Session cookie of a logged-in validator, for --url")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    if args.url:
+        run_http(args.url, args.clients, args.requests, args.cookie)
+    else:
+        run_local(args.clients, args.requests, args.max_batch_size, args.max_wait_ms)
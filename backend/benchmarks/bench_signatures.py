@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives import serialization
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blockchain.poa import ProofOfAuthority
+
+
+def run(signatures, validators, workers):
+    keys = {f"MD{i:03d}": Ed25519PrivateKey.generate() for i in range(1, validators + 1)}
+    public_keys = {
+        name: key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+        for name, key in keys.items()
+    }
+    poa = ProofOfAuthority(public_keys, public_keys.get)
+    names = list(keys)
+
+    start = time.perf_counter()
+    items = []
+    for i in range(signatures):
+        name = names[i % len(names)]
+        block_hash = f"{i:064x}"
+        items.append((name, block_hash, poa.sign_block(name, keys[name], block_hash)))
+    print(f"sign_block:                     {signatures / (time.perf_counter() - start):>10,.0f} signatures/sec")
+
+    # One full verify at a time, parsing the public key for every block
+    start = time.perf_counter()
+    for name, block_hash, signature in items:
+        key = Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_keys[name]))
+        key.verify(bytes.fromhex(signature), f"{name}:{block_hash}".encode())
+    print(f"one at a time, key parsed:      {signatures / (time.perf_counter() - start):>10,.0f} signatures/sec")
+
+    start = time.perf_counter()
+    assert all(poa.verify_batch(items))
+    print(f"verify_batch, cached keys:      {signatures / (time.perf_counter() - start):>10,.0f} signatures/sec")
+
+    start = time.perf_counter()
+    assert all(poa.verify_batch(items, workers=workers))
+    print(f"verify_batch, {workers} workers:      {signatures / (time.perf_counter() - start):>10,.0f} signatures/sec")
+
+    tampered = list(items)
+    name, block_hash, signature = tampered[7]
+    tampered[7] = (name, block_hash[:-1] + "f", signature)
+    results = poa.verify_batch(tampered, workers=workers)
+    assert not results[7] and sum(results) == signatures - 1
+    print("A tampered block is rejected.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure Ed25519 block signing and verification throughput.")
+    parser.add_argument("--signatures", type=int, default=50000)
+    parser.add_argument("--validators", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    run(args.signatures, args.validators, args.workers)
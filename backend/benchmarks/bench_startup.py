@@ -0,0 +1,51 @@
+import sys
+import os
+import statistics
+import subprocess
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Importing main and checking the model artifacts is everything `python main.py`
+# does before main() opens the database connection and shows the login prompt
+STARTUP_SNIPPET = "import main; main.has_artifacts()"
+
+
+def time_startup():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", STARTUP_SNIPPET], cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+# Slowest imports of a single startup, from python -X importtime
+def slowest_imports(count=10):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SNIPPET],
+        cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def run(repeats=5):
+    timings = [time_startup() for _ in range(repeats)]
+    print(f"Startup to login prompt: median {statistics.median(timings):.3f}s, "
+          f"min {min(timings):.3f}s, max {max(timings):.3f}s over {repeats} runs")
+    print("Slowest imports (cumulative):")
+    for cumulative, name in slowest_imports():
+        print(f"  {cumulative / 1e6:.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure how long `python main.py` takes to reach the login prompt.")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    run(args.repeats)
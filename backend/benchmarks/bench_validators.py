@@ -0,0 +1,45 @@
+import sys
+import os
+import io
+import time
+from contextlib import redirect_stdout
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blockchain import chain, validators
+from blockchain.poa import ProofOfAuthority
+from _fakes import make_database, use_database, VALIDATOR, SIGNATURE
+
+
+def create_blocks(registry, blocks):
+    blockchain = chain.Blockchain(tip_only=True, validators=registry)
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for i in range(blocks):
+            assert blockchain.create_block(f"record {i}", VALIDATOR, SIGNATURE) is not None
+    return blocks / (time.perf_counter() - start)
+
+
+def run(blocks):
+    use_database(make_database(1))
+
+    # ttl=0: every lookup goes to the users table, as get_validator used to
+    print(f"Uncached validator lookups: {create_blocks(validators.ValidatorRegistry(ttl=0), blocks):>10,.0f} blocks/sec")
+    registry = validators.ValidatorRegistry()
+    registry.preload()
+    print(f"Registry lookups:           {create_blocks(registry, blocks):>10,.0f} blocks/sec  {registry.stats()}")
+
+    poa = ProofOfAuthority(registry)
+    assert poa.is_validator_authorized(VALIDATOR) and not poa.is_validator_authorized("MD999")
+    registry.invalidate(VALIDATOR)
+    assert poa.is_validator_authorized(VALIDATOR)
+    print(f"ProofOfAuthority on the registry: {registry.stats()}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare block creation with and without the validator registry.")
+    parser.add_argument("--blocks", type=int, default=20000)
+    args = parser.parse_args()
+
+    run(args.blocks)
@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import Future
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import db_session
+from blockchain.chain import Blockchain, BLOCK_COLUMNS, canonical_hash
+from blockchain.merkle import canonical_record, leaf_hash, merkle_levels, merkle_proof, verify_proof
+from config import BLOCK_BATCH_SIZE, BLOCK_BATCH_SECONDS
+
+
+class BlockBatcher:
+    def __init__(self, blockchain, validator_name, signature, max_records=BLOCK_BATCH_SIZE, max_wait_seconds=BLOCK_BATCH_SECONDS):
+        """
+        Seals many records into one block whose data is the Merkle root over them.
+        A batch is sealed when it holds max_records records or when its oldest
+        record has waited max_wait_seconds, whichever comes first. Each record,
+        its leaf hash and its inclusion proof are stored in block_records, so
+        one record can be verified against its block without the others.
+        Args:
+            blockchain (Blockchain): Chain the sealed blocks are added to.
+            validator_name (str): Validator signing the sealed blocks.
+            signature (str): Signature of the validator.
+            max_records (int): Largest number of records per block.
+            max_wait_seconds (float): Longest time a record waits for its block.
+        """
+        self.blockchain = blockchain
+        self.validator_name = validator_name
+        self.signature = signature
+        self.max_records = max_records
+        self.max_wait = max_wait_seconds
+        self.blocks_sealed = 0
+        self.records_sealed = 0
+        self._pending = []  # (canonical record, Future, time it was added)
+        self._condition = threading.Condition()
+        self._seal_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, record):
+        """Queue one record; the returned Future resolves to (block index, leaf index)."""
+        future = Future()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("The batcher has been stopped.")
+            self._pending.append((canonical_record(record), future, time.monotonic()))
+            # The first record starts the max_wait timer; a full batch is sealed at once
+            if len(self._pending) == 1 or len(self._pending) >= self.max_records:
+                self._condition.notify()
+        return future
+
+    def _take_batch(self):
+        with self._condition:
+            batch, self._pending = self._pending[:self.max_records], self._pending[self.max_records:]
+            return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if len(self._pending) >= self.max_records:
+                        break
+                    if self._pending:
+                        remaining = self._pending[0][2] + self.max_wait - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._stopped and not self._pending:
+                    return
+            self.flush(full_only=not self._stopped)
+
+    def flush(self, full_only=False):
+        """Seal the pending records now; with full_only, leave a trailing partial batch pending."""
+        with self._seal_lock:
+            while True:
+                with self._condition:
+                    if not self._pending or (full_only and len(self._pending) < self.max_records and
+                                             self._pending[0][2] + self.max_wait > time.monotonic()):
+                        return
+                self._seal(self._take_batch())
+
+    def _seal(self, batch):
+        records = [record for record, _, _ in batch]
+        try:
+            leaves = [leaf_hash(record) for record in records]
+            levels = merkle_levels(leaves)
+            data = json.dumps({"merkle_root": levels[-1][0], "records": len(records)}, sort_keys=True)
+            # Sealing is serialized by _seal_lock, so the block gets the index after the tip
+            last = self.blockchain.last_block()
+            index_num = Blockchain._field(last, "index_num", 0) + 1 if last is not None else 1
+
+            # Proofs first: a block whose proof rows failed would hold a root with no records.
+            # Rows left at this index by a block that was never added are replaced.
+            rows = [
+                (index_num, i, leaf, record, json.dumps(merkle_proof(levels, i)))
+                for i, (leaf, record) in enumerate(zip(leaves, records))
+            ]
+            with db_session() as db:
+                cursor = db.cursor()
+                cursor.execute("DELETE FROM block_records WHERE block_index = %s;", (index_num,))
+                cursor.executemany(
+                    "INSERT INTO block_records (block_index, leaf_index, leaf_hash, record, proof) VALUES (%s, %s, %s, %s, %s);",
+                    rows,
+                )
+                db.commit()
+                cursor.close()
+
+            block = self.blockchain.add_block(data, self.validator_name, self.signature)
+            if block is None or block["index_num"] != index_num:
+                self._discard_proofs(index_num)
+                raise RuntimeError("The batch block was rejected.")
+        except Exception as e:
+            print(f"Error sealing a batch of {len(batch)} records: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.blocks_sealed += 1
+        self.records_sealed += len(batch)
+        for i, (_, future, _) in enumerate(batch):
+            future.set_result((index_num, i))
+
+    # Remove the proof rows of a block that was not added; the next seal replaces them otherwise
+    def _discard_proofs(self, index_num):
+        try:
+            with db_session() as db:
+                cursor = db.cursor()
+                cursor.execute("DELETE FROM block_records WHERE block_index = %s;", (index_num,))
+                db.commit()
+                cursor.close()
+        except Exception as e:
+            print(f"Error removing the proofs of block {index_num}: {e}")
+
+    def stop(self):
+        """Seal the pending records and stop the sealing thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {"blocks_sealed": self.blocks_sealed, "records_sealed": self.records_sealed, "pending": pending}
+
+
+def verify_record(blockchain, block_index, leaf_index):
+    """
+    Checks one batched record: its leaf hash, its proof up to the block's
+    Merkle root, and the hash of the block holding that root.
+    Returns:
+        tuple: (bool, reason) where reason explains a failed check.
+    """
+    with db_session() as db:
+        cursor = db.cursor()
+        cursor.execute(
+            "SELECT leaf_hash, record, proof FROM block_records WHERE block_index = %s AND leaf_index = %s;",
+            (block_index, leaf_index),
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+    if not rows:
+        return False, "record not found"
+    stored_leaf, record, proof = rows[0]
+    if leaf_hash(record) != stored_leaf:
+        return False, "record does not match its leaf hash"
+
+    block = blockchain.get_block(block_index)
+    if block is None:
+        return False, "block not found"
+    if isinstance(block, tuple):
+        block = dict(zip(BLOCK_COLUMNS, block))
+    try:
+        root = json.loads(block["data"])["merkle_root"]
+    except (TypeError, ValueError, KeyError):
+        return False, "block is not a batch block"
+    if not verify_proof(stored_leaf, json.loads(proof), root):
+        return False, "proof does not lead to the block's Merkle root"
+    if block.get("timestamp") is not None and canonical_hash(block) != block["hash"]:
+        return False, "block hash does not match"
+    return True, "ok"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verify one record of a batched block.")
+    parser.add_argument("block_index", type=int)
+    parser.add_argument("leaf_index", type=int)
+    args = parser.parse_args()
+
+    ok, reason = verify_record(Blockchain(), args.block_index, args.leaf_index)
+    print(f"Record {args.leaf_index} of block {args.block_index}: {'verified' if ok else 'FAILED'} ({reason})")
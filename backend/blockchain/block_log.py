@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import threading
+from functools import lru_cache
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config import BLOCK_LOG_SEGMENT_BYTES, BLOCK_LOG_GROUP_COMMIT_MS, BLOCK_LOG_GROUP_COMMIT_BLOCKS
+
+# Segments and index of the local block log; never committed
+BLOCK_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "block_log")
+INDEX_FILE = "blocks.idx"
+SEGMENT_FILE = "segment-{:06d}.log"
+# Record: big-endian payload length, then the block as canonical JSON
+LENGTH = struct.Struct(">I")
+# Index entry of block index_num at position index_num - 1: segment number, record offset
+INDEX_ENTRY = struct.Struct(">IQ")
+
+
+class BlockLog:
+    def __init__(self, directory=BLOCK_LOG_DIR, readonly=False, segment_bytes=BLOCK_LOG_SEGMENT_BYTES,
+                 group_commit_ms=BLOCK_LOG_GROUP_COMMIT_MS, group_commit_blocks=BLOCK_LOG_GROUP_COMMIT_BLOCKS):
+        """
+        Append-only block storage: length-prefixed records in segment files
+        plus a fixed-width offset index, so block index_num is found at byte
+        (index_num - 1) * INDEX_ENTRY.size of the index without any search.
+        Reads go through mmap. Appends are written straight to the files and
+        fsynced in groups: by a background thread once group_commit_blocks
+        blocks are pending or the oldest has waited group_commit_ms.
+        Args:
+            directory (str): Directory holding the index and segments.
+            readonly (bool): Open for reading only, e.g. from an audit process
+                while another process appends.
+            segment_bytes (int): Size at which a new segment is started.
+            group_commit_ms (float): Longest time an append waits to be fsynced.
+            group_commit_blocks (int): Pending appends that trigger an fsync at once.
+        """
+        self.directory = directory
+        self.readonly = readonly
+        self.segment_bytes = segment_bytes
+        self.group_commit = group_commit_ms / 1000
+        self.group_commit_blocks = group_commit_blocks
+        self.fsyncs = 0
+        self._maps = {}  # file path -> mmap of (at least) the bytes read so far
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        if readonly:
+            self.height = self._indexed_blocks()
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        self._segment, self._segment_size = self._recover()
+        self.height = self.durable_height = self._indexed_blocks()
+        self._index_fd = os.open(self._index_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._pending = 0
+        self._first_pending = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, SEGMENT_FILE.format(segment))
+
+    def _indexed_blocks(self):
+        try:
+            return os.path.getsize(self._index_path) // INDEX_ENTRY.size
+        except FileNotFoundError:
+            return 0
+
+    def _recover(self):
+        """
+        Drop whatever a crash left half written: a partial index entry, index
+        entries whose record is incomplete, and segment bytes past the last
+        indexed record. Returns the (segment, size) appends continue in.
+        """
+        entries = self._indexed_blocks()
+        segment, end = 0, 0
+        with open(self._index_path, "a+b") as index:
+            while entries:
+                index.seek((entries - 1) * INDEX_ENTRY.size)
+                segment, offset = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+                path = self._segment_path(segment)
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+                if offset + LENGTH.size <= size:
+                    with open(path, "rb") as file:
+                        file.seek(offset)
+                        end = offset + LENGTH.size + LENGTH.unpack(file.read(LENGTH.size))[0]
+                    if end <= size:
+                        break
+                entries -= 1
+            else:
+                segment, end = 0, 0
+            index.truncate(entries * INDEX_ENTRY.size)
+
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                number = int(name[len("segment-"):-len(".log")])
+                if number > segment:
+                    os.remove(os.path.join(self.directory, name))
+        with open(self._segment_path(segment), "a+b") as file:
+            file.truncate(end)
+        return segment, end
+
+    def append(self, block, wait=False):
+        """
+        Append the next block of the chain.
+        Args:
+            block (dict): Block whose index_num is height + 1.
+            wait (bool): Return only once the block has been fsynced.
+        Raises:
+            ValueError: If the block does not extend the log.
+        """
+        payload = json.dumps(
+            dict(block, created_at=block.get("created_at") or time.strftime("%Y-%m-%d %H:%M:%S")),
+            sort_keys=True, default=str,
+        ).encode()
+        with self._lock:
+            if self.readonly or self._closed:
+                raise RuntimeError("The block log is not open for writing.")
+            if block["index_num"] != self.height + 1:
+                raise ValueError(f"Expected block {self.height + 1}, got {block['index_num']}.")
+            if self._segment_size and self._segment_size + LENGTH.size + len(payload) > self.segment_bytes:
+                self._roll()
+            # The record is written before its index entry, so an indexed record is always complete
+            os.write(self._segment_fd, LENGTH.pack(len(payload)) + payload)
+            os.write(self._index_fd, INDEX_ENTRY.pack(self._segment, self._segment_size))
+            self._segment_size += LENGTH.size + len(payload)
+            self.height += 1
+            self._pending += 1
+            if self._pending == 1:
+                self._first_pending = time.monotonic()
+            if self._pending == 1 or self._pending >= self.group_commit_blocks:
+                self._condition.notify_all()
+            target = self.height
+        if wait:
+            self.wait_durable(target)
+
+    # Start a new segment; called with the lock held
+    def _roll(self):
+        os.fsync(self._segment_fd)
+        os.close(self._segment_fd)
+        self._segment += 1
+        self._segment_size = 0
+        self._segment_fd = os.open(self._segment_path(self._segment), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._pending:
+                    self._condition.wait()
+                if self._closed and not self._pending:
+                    return
+                # Let more appends join this group until it is full or its oldest append is due
+                while not self._closed and self._pending < self.group_commit_blocks:
+                    remaining = self._first_pending + self.group_commit - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            self.sync()
+
+    def sync(self):
+        """fsync every block appended so far."""
+        with self._lock:
+            target = self.height
+            self._pending = 0
+            # Duplicates, so a concurrent segment roll cannot close them under the fsync
+            fds = [os.dup(self._segment_fd), os.dup(self._index_fd)]
+        try:
+            for fd in fds:
+                os.fsync(fd)
+        finally:
+            for fd in fds:
+                os.close(fd)
+        with self._condition:
+            self.durable_height = max(self.durable_height, target)
+            self.fsyncs += 1
+            self._condition.notify_all()
+
+    def wait_durable(self, index_num):
+        with self._condition:
+            while self.durable_height < index_num:
+                self._condition.wait()
+
+    def close(self):
+        """fsync pending appends and stop the group commit thread."""
+        if self.readonly:
+            return
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        os.close(self._segment_fd)
+        os.close(self._index_fd)
+
+    # A map of the file covering at least `needed` bytes, or None if the file is shorter
+    def _map(self, path, needed):
+        current = self._maps.get(path)
+        if current is not None and len(current) >= needed:
+            return current
+        try:
+            with open(path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if size < needed or size == 0:
+                    return None
+                # Older maps are dropped, not closed: views handed out by scan_raw may still use them
+                current = self._maps[path] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        return current
+
+    def _refresh(self):
+        if self.readonly:
+            self.height = self._indexed_blocks()
+        return self.height
+
+    def _entry(self, position):
+        index = self._map(self._index_path, (position + 1) * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack_from(index, position * INDEX_ENTRY.size)
+
+    def _record(self, segment, offset):
+        path = self._segment_path(segment)
+        data = self._map(path, offset + LENGTH.size)
+        length = LENGTH.unpack_from(data, offset)[0]
+        data = self._map(path, offset + LENGTH.size + length)
+        return memoryview(data)[offset + LENGTH.size:offset + LENGTH.size + length]
+
+    def get(self, index_num):
+        """Return block index_num as a dictionary, or None if the log does not hold it."""
+        if not 1 <= index_num <= self._refresh():
+            return None
+        return json.loads(bytes(self._record(*self._entry(index_num - 1))))
+
+    def last(self):
+        height = self._refresh()
+        return self.get(height) if height else None
+
+    def scan_raw(self, start=1, end=None):
+        """Yield the JSON payloads of blocks start..end as memoryviews into the segment maps."""
+        height = self._refresh()
+        end = height if end is None else min(end, height)
+        start = max(start, 1)
+        if start > end:
+            return
+        index = self._map(self._index_path, end * INDEX_ENTRY.size)
+        current, view = None, None
+        for segment, offset in INDEX_ENTRY.iter_unpack(index[(start - 1) * INDEX_ENTRY.size:end * INDEX_ENTRY.size]):
+            if segment != current:
+                # Every record indexed so far lies within the segment's current size
+                path = self._segment_path(segment)
+                view = memoryview(self._map(path, os.path.getsize(path)))
+                current = segment
+            length = LENGTH.unpack_from(view, offset)[0]
+            yield view[offset + LENGTH.size:offset + LENGTH.size + length]
+
+    def scan(self, start=1, end=None):
+        """Yield blocks start..end as dictionaries, in index order."""
+        for payload in self.scan_raw(start, end):
+            yield json.loads(bytes(payload))
+
+    def find_hash(self, block_hash):
+        """
+        Return the block with the given hash, or None.
+        The segments are searched newest first with mmap.rfind, and the
+        record holding a match is located by binary search on the index.
+        """
+        height = self._refresh()
+        if not height:
+            return None
+        pattern = json.dumps({"hash": block_hash})[1:-1].encode()
+        last_segment = self._entry(height - 1)[0]
+        for segment in range(last_segment, -1, -1):
+            data = self._map(self._segment_path(segment), 1)
+            position = data.rfind(pattern) if data is not None else -1
+            if position < 0:
+                continue
+            low, high = 0, height - 1
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self._entry(middle) <= (segment, position):
+                    low = middle
+                else:
+                    high = middle - 1
+            block = json.loads(bytes(self._record(*self._entry(low))))
+            if block.get("hash") == block_hash:
+                return block
+        return None
+
+
+# The process-wide block log used by Blockchain when BLOCK_STORAGE is "log"
+@lru_cache(maxsize=None)
+def get_block_log():
+    return BlockLog()
@@ -1,21 +1,88 @@
 import hashlib
 import json
 import time
-import pymysql
 import os
 import sys
+from collections import OrderedDict
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from data.data_config import db_cred
+from data.data_config import db_session
+from data.schema import ensure_schema
+from blockchain.validators import get_validator_registry
+from blockchain.poa import ProofOfAuthority, load_signing_key
+from blockchain.block_log import get_block_log
+from config import BLOCKCHAIN_TIP_ONLY, BLOCK_CACHE_SIZE, BLOCK_STORAGE, BLOCK_LOG_MIRROR_MYSQL, ALLOW_UNSIGNED_BLOCKS
+
+# Columns of the blockchain table, in SELECT order
+BLOCK_COLUMNS = ["index_num", "data", "previous_hash", "hash", "validator_name", "signature", "created_at", "timestamp", "block_signature"]
+# Fields covered by a block's hash; all of them are persisted
+HASHED_FIELDS = ["index_num", "data", "previous_hash", "timestamp", "validator_name", "signature"]
+
+
+# SHA-256 over the canonical JSON form of a block's hashed fields
+def canonical_hash(block):
+    block_string = json.dumps({field: block[field] for field in HASHED_FIELDS}, sort_keys=True)
+    return hashlib.sha256(block_string.encode()).hexdigest()
+
 
 class Blockchain:
-    def __init__(self):
-        self.chain = self.load_chain_from_db()
+    def __init__(self, tip_only=BLOCKCHAIN_TIP_ONLY, cache_size=BLOCK_CACHE_SIZE, validators=None, storage=BLOCK_STORAGE):
+        """
+        Args:
+            tip_only (bool): Load only the last block instead of the whole chain.
+                Older blocks are fetched on demand with get_block/get_block_by_hash.
+            cache_size (int): Number of recent blocks kept in memory in tip-only mode.
+            validators (ValidatorRegistry): Validator lookups; defaults to the shared registry.
+            storage (str): "mysql", or "log" to read and append blocks through the
+                local BlockLog (MySQL then only mirrors it, if BLOCK_LOG_MIRROR_MYSQL).
+        """
+        self.block_log = get_block_log() if storage == "log" else None
+        self.validators = validators if validators is not None else get_validator_registry()
+        self.poa = ProofOfAuthority(self.validators, self.validators.public_key)
+        self._signing_keys = {}  # validator_name -> Ed25519 private key, or None if not held here
+        self.tip_only = tip_only
+        self.cache_size = cache_size
+        self._recent = OrderedDict()  # index_num -> block, least recently used first
+        self._hash_index = {}  # hash -> index_num of the cached blocks
+
+        try:
+            if tip_only:
+                self.chain = None
+                self._tip = self.block_log.last() if self.block_log is not None else self.load_tip_from_db()
+                if self._tip is not None:
+                    self._remember(self._tip)
+            else:
+                self.chain = list(self.block_log.scan()) if self.block_log is not None else self.load_chain_from_db()
+        except Exception as e:
+            # An unreadable chain is not an empty one; a genesis block here would fork it
+            raise RuntimeError(f"Could not load the blockchain: {e}") from e
 
-        # If no blocks are loaded, create the genesis block
-        if len(self.chain) == 0:
+        # Only a chain that was read and holds no blocks gets a genesis block
+        if self.last_block() is None:
             self.create_and_add_genesis_block()
 
+    def last_block(self):
+        """Return the tip of the chain, or None if the chain is empty."""
+        if self.tip_only:
+            return self._tip
+        return self.chain[-1] if self.chain else None
+
+    def _remember(self, block):
+        """Keep a block in the bounded cache of recent blocks."""
+        index_num = block["index_num"]
+        self._recent[index_num] = block
+        self._recent.move_to_end(index_num)
+        self._hash_index[block["hash"]] = index_num
+        while len(self._recent) > self.cache_size:
+            _, evicted = self._recent.popitem(last=False)
+            self._hash_index.pop(evicted["hash"], None)
+
+    def recent_blocks(self):
+        """Return the blocks held in memory, oldest first."""
+        if not self.tip_only:
+            return list(self.chain)
+        return [self._recent[index_num] for index_num in sorted(self._recent)]
+
     def create_and_add_genesis_block(self):
         """Create and add the genesis block."""
         sample_data = "Genesis Block"  # You can modify this data as needed
@@ -25,26 +92,10 @@ class Blockchain:
         # Add the genesis block to the blockchain without validation
         self.add_block(sample_data, validator_name, signature, is_genesis=True)
 
-    def create_hash(self, data):
-        """Generate a SHA-256 hash of the provided data."""
-        return hashlib.sha256(data.encode()).hexdigest()
-
     def get_validator(self, validator_name):
-        """Fetch the validator details from the database."""
+        """Fetch the validator details from the validator registry."""
         try:
-            db = db_cred()
-            cursor = db.cursor(pymysql.cursors.DictCursor)  # Ensuring DictCursor is used
-            sql = "SELECT * FROM users WHERE user_id = %s;"
-            cursor.execute(sql, (validator_name,))
-            validator = cursor.fetchone()  # This should be a dictionary
-            print(f"Validator raw result: {validator}")  # Debugging line
-            cursor.close()
-            db.close()
-
-            # Check if validator is a dictionary or tuple
-            print(f"Validator type: {type(validator)}")  # Debugging line
-
-            return validator
+            return self.validators.get(validator_name)
         except Exception as e:
             print(f"Error fetching validator: {e}")
             return None
@@ -55,8 +106,7 @@ class Blockchain:
             print("Validator not found.")
             return False
 
-        # Access the signature directly using the tuple index (4th element in the result)
-        if validator[4] != provided_signature:  # Index 4 is the 'signature' field in your query result tuple
+        if validator["signature"] != provided_signature:
             print("Invalid signature for the validator.")
             return False
         return True
@@ -68,12 +118,12 @@ class Blockchain:
             print("Block creation failed: invalid validator or signature.")
             return None
 
-        if len(self.chain) == 0 or is_genesis:
+        previous_block = self.last_block()
+        if previous_block is None or is_genesis:
             # Genesis block creation
             previous_hash = "0"  # Genesis block doesn't have a previous block, so set it to "0"
             index_num = 1  # Genesis block is the first block, so its index is 1
         else:
-            previous_block = self.chain[-1]
             # Handle tuple-based result: access by index if it's a tuple
             if isinstance(previous_block, tuple):
                 previous_hash = previous_block[3]  # Assuming 'hash' is at index 3 in the tuple
@@ -93,18 +143,20 @@ class Blockchain:
         }
 
         # Create hash for this block
-        block_string = json.dumps(block_data, sort_keys=True)
-        current_hash = self.create_hash(block_string)
+        block_data["hash"] = canonical_hash(block_data)
 
-        block_data["hash"] = current_hash
+        # Sign the hash with the validator's Ed25519 key when this machine holds it
+        signing_key = self._signing_key(validator_name)
+        if signing_key is not None:
+            block_data["block_signature"] = self.poa.sign_block(validator_name, signing_key, block_data["hash"])
 
         return block_data
 
 
     def validate_block(self, block):
         """Validate a block by checking its hash and previous hash."""
-        if len(self.chain) > 0:
-            last_block = self.chain[-1]
+        last_block = self.last_block()
+        if last_block is not None:
             # Check if last_block is a tuple or a dictionary
             if isinstance(last_block, tuple):
                 previous_hash = last_block[3]  # Index 3 corresponds to 'hash'
@@ -115,14 +167,29 @@ class Blockchain:
                 print("Block validation failed: previous hash does not match.")
                 return False
 
-        block_string = json.dumps(
-            {k: block[k] for k in block if k != "hash"}, sort_keys=True
-        )
-        recalculated_hash = self.create_hash(block_string)
-        if recalculated_hash != block["hash"]:
+        if canonical_hash(block) != block["hash"]:
             print("Block validation failed: hash does not match.")
             return False
 
+        return self.validate_block_signature(block)
+
+    def _signing_key(self, validator_name):
+        if validator_name not in self._signing_keys:
+            self._signing_keys[validator_name] = load_signing_key(validator_name)
+        return self._signing_keys[validator_name]
+
+    def validate_block_signature(self, block):
+        """Check the Ed25519 signature over the block hash."""
+        signature = block.get("block_signature")
+        if signature is None:
+            # Only the legacy fallback takes unsigned blocks, and never from a validator with a key
+            if ALLOW_UNSIGNED_BLOCKS and self.poa.public_key(block["validator_name"]) is None:
+                return True
+            print("Block validation failed: block is not signed.")
+            return False
+        if not self.poa.validate_signature(block["validator_name"], block["hash"], signature):
+            print("Block validation failed: invalid block signature.")
+            return False
         return True
 
 
@@ -130,8 +197,12 @@ class Blockchain:
         """Add a validated block to the blockchain."""
         new_block = self.create_block(data, validator_name, signature, is_genesis)
         if new_block and (is_genesis or self.validate_block(new_block)):
-            self.chain.append(new_block)
-            self.save_block_to_db(new_block)
+            if self.tip_only:
+                self._tip = new_block
+                self._remember(new_block)
+            else:
+                self.chain.append(new_block)
+            self.save_block(new_block)
             print("Block added successfully!")
             return new_block
         else:
@@ -139,44 +210,105 @@ class Blockchain:
             return None
 
     def load_chain_from_db(self):
-        """Load the blockchain from the MySQL database."""
-        try:
-            db = db_cred()
-            cursor = db.cursor(pymysql.cursors.DictCursor)  # Ensures we get a dictionary instead of a tuple
-            cursor.execute("SELECT * FROM blockchain ORDER BY index_num ASC;")
+        """Load the blockchain from the MySQL database; database errors propagate."""
+        columns = ", ".join(BLOCK_COLUMNS)
+        with db_session() as db:
+            cursor = db.cursor()
+            cursor.execute(f"SELECT {columns} FROM blockchain ORDER BY index_num ASC;")
             rows = cursor.fetchall()
             cursor.close()
-            db.close()
-            return rows if rows else []
-        except Exception as e:
-            print(f"Error loading blockchain from database: {e}")
-            return []
+        return [dict(zip(BLOCK_COLUMNS, row)) for row in rows]
+
+
+    def _fetch_block(self, sql, params):
+        """
+        Run a single-block query and return the block as a dictionary, or None
+        if no block matches. Database errors propagate, so a failed lookup is
+        never mistaken for a missing block.
+        """
+        with db_session() as db:
+            cursor = db.cursor()
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            cursor.close()
+        return dict(zip(BLOCK_COLUMNS, rows[0])) if rows else None
+
+    def load_tip_from_db(self):
+        """Load only the block with the highest index_num."""
+        columns = ", ".join(BLOCK_COLUMNS)
+        return self._fetch_block(f"SELECT {columns} FROM blockchain ORDER BY index_num DESC LIMIT 1;", ())
 
+    def get_block(self, index_num):
+        """Return the block with the given index, from memory or by an indexed lookup."""
+        if not self.tip_only:
+            return next((block for block in self.chain if self._field(block, "index_num", 0) == index_num), None)
+        if index_num in self._recent:
+            self._recent.move_to_end(index_num)
+            return self._recent[index_num]
+
+        if self.block_log is not None:
+            block = self.block_log.get(index_num)
+        else:
+            columns = ", ".join(BLOCK_COLUMNS)
+            block = self._fetch_block(f"SELECT {columns} FROM blockchain WHERE index_num = %s;", (index_num,))
+        if block is not None:
+            self._remember(block)
+        return block
+
+    def get_block_by_hash(self, block_hash):
+        """Return the block with the given hash, from memory or by an indexed lookup."""
+        if not self.tip_only:
+            return next((block for block in self.chain if self._field(block, "hash", 3) == block_hash), None)
+        if block_hash in self._hash_index:
+            return self.get_block(self._hash_index[block_hash])
+
+        if self.block_log is not None:
+            block = self.block_log.find_hash(block_hash)
+        else:
+            columns = ", ".join(BLOCK_COLUMNS)
+            block = self._fetch_block(f"SELECT {columns} FROM blockchain WHERE hash = %s;", (block_hash,))
+        if block is not None:
+            self._remember(block)
+        return block
+
+    @staticmethod
+    def _field(block, name, position):
+        """Read a field of a block loaded as a tuple or created as a dictionary."""
+        return block[position] if isinstance(block, tuple) else block[name]
+
+    def save_block(self, block):
+        """Append a block to the block log and/or the blockchain table."""
+        if self.block_log is not None:
+            self.block_log.append(block)
+            if not BLOCK_LOG_MIRROR_MYSQL:
+                return
+        self.save_block_to_db(block)
 
     def save_block_to_db(self, block):
         """Save a block to the blockchain table in the database."""
         try:
-            db = db_cred()
-            cursor = db.cursor()
-            sql = """
-                INSERT INTO blockchain 
-                (index_num, data, previous_hash, hash, validator_name, signature, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, NOW());
-            """
-            cursor.execute(
-                sql,
-                (
-                    block["index_num"],
-                    block["data"],
-                    block["previous_hash"],
-                    block["hash"],
-                    block["validator_name"],
-                    block["signature"],
-                ),
-            )
-            db.commit()
-            cursor.close()
-            db.close()
+            with db_session() as db:
+                cursor = db.cursor()
+                sql = """
+                    INSERT INTO blockchain 
+                    (index_num, data, previous_hash, hash, validator_name, signature, timestamp, block_signature, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW());
+                """
+                cursor.execute(
+                    sql,
+                    (
+                        block["index_num"],
+                        block["data"],
+                        block["previous_hash"],
+                        block["hash"],
+                        block["validator_name"],
+                        block["signature"],
+                        block["timestamp"],
+                        block.get("block_signature"),
+                    ),
+                )
+                db.commit()
+                cursor.close()
             print("Block saved to database successfully.")
         except Exception as e:
             print(f"Error saving block to database: {e}")
@@ -185,6 +317,12 @@ class Blockchain:
 # for testing pusposes
 # Example usage:
 if __name__ == "__main__":
+    # The tip query names the timestamp and block_signature columns
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        db.commit()
+        cursor.close()
     blockchain = Blockchain()
 
     # Example data
@@ -209,5 +347,5 @@ if __name__ == "__main__":
     blockchain.add_block(sample_data, validator_name, signature)
 
     # Print the blockchain
-    for block in blockchain.chain:
+    for block in blockchain.recent_blocks():
         print(block)
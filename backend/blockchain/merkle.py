@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+# Domain separation between leaves and inner nodes, so a node can never pass for a leaf
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+# Canonical JSON form of a record, the exact bytes its leaf hash covers
+def canonical_record(record):
+    return json.dumps(record, sort_keys=True, default=str)
+
+
+def leaf_hash(record_string):
+    return hashlib.sha256(LEAF_PREFIX + record_string.encode()).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def merkle_levels(leaves):
+    """
+    Builds every level of the tree, leaves first and root last.
+    An odd node at the end of a level is carried up unchanged rather than
+    paired with a copy of itself.
+    """
+    if not leaves:
+        raise ValueError("A Merkle tree needs at least one leaf.")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def merkle_root(leaves):
+    return merkle_levels(leaves)[-1][0]
+
+
+def merkle_proof(levels, index):
+    """
+    Returns:
+        list: [side, sibling hash] pairs from the leaf up, where side is "L"
+            when the sibling is on the left.
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(["L" if sibling < index else "R", level[sibling]])
+        index //= 2
+    return proof
+
+
+# True when the leaf and its proof hash up to the root
+def verify_proof(leaf, proof, root):
+    current = leaf
+    for side, sibling in proof:
+        current = node_hash(sibling, current) if side == "L" else node_hash(current, sibling)
+    return current == root
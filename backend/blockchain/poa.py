@@ -1,11 +1,64 @@
-import hashlib
+import os
+import sys
+from multiprocessing import Pool
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blockchain.validators import get_validator_registry
+
+# Validator signing keys, one PEM file per validator; never committed
+KEY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "keys")
+# Signatures per worker task in verify_batch
+VERIFY_CHUNK = 2000
+
+# Parsed public keys by hex encoding, shared by every ProofOfAuthority in the process
+_parsed_keys = {}
+
+
+# Parse a hex public key once per process
+def _public_key_object(public_hex):
+    key = _parsed_keys.get(public_hex)
+    if key is None:
+        key = _parsed_keys[public_hex] = Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_hex))
+    return key
+
+
+# The bytes a validator signs for a block: its name bound to the block data
+def _message(validator_name, block_data):
+    return f"{validator_name}:{block_data}".encode()
+
+
+def _verify_one(public_hex, message, signature):
+    try:
+        _public_key_object(public_hex).verify(bytes.fromhex(signature), message)
+        return True
+    except (InvalidSignature, ValueError, TypeError):
+        return False
+
+
+# Worker task of verify_batch: (public key hex, message, signature) triples
+def _verify_chunk(items):
+    return [_verify_one(public_hex, message, signature) for public_hex, message, signature in items]
+
 
 class ProofOfAuthority:
-    def __init__(self, authorized_validators):
+    def __init__(self, authorized_validators=None, key_source=None):
         """
         Initialize PoA with a list of authorized validators.
+        Any container supporting `in` works; by default the shared
+        ValidatorRegistry is used, so authorization is an in-memory check.
+        Blocks are signed with Ed25519; key_source maps a validator name to
+        its hex public key (default: the registry's users.public_key).
         """
+        if authorized_validators is None:
+            authorized_validators = get_validator_registry()
+        if key_source is None:
+            key_source = get_validator_registry().public_key
         self.authorized_validators = authorized_validators
+        self.key_source = key_source
 
     def is_validator_authorized(self, validator_name):
         """
@@ -13,18 +66,20 @@ class ProofOfAuthority:
         """
         return validator_name in self.authorized_validators
 
+    def public_key(self, validator_name):
+        """
+        Hex public key of a validator, or None if it has not registered one.
+        """
+        return self.key_source(validator_name)
+
     def sign_block(self, validator_name, private_key, block_data):
         """
-        Simulate signing a block using the validator's private key.
-        This can be expanded with real cryptographic signing.
+        Sign block data with the validator's Ed25519 private key.
+        Returns the signature as hex.
         """
         if not self.is_validator_authorized(validator_name):
             raise Exception(f"Validator {validator_name} is not authorized.")
-
-        # Simplified example of a signature (use proper signing in production)
-        data_to_sign = f"{validator_name}:{block_data}"
-        signature = hashlib.sha256(data_to_sign.encode()).hexdigest()
-        return signature
+        return private_key.sign(_message(validator_name, block_data)).hex()
 
     def validate_signature(self, validator_name, block_data, signature):
         """
@@ -34,7 +89,96 @@ class ProofOfAuthority:
             print(f"Validator {validator_name} is not authorized.")
             return False
 
-        # Recreate the signature and compare
-        data_to_sign = f"{validator_name}:{block_data}"
-        expected_signature = hashlib.sha256(data_to_sign.encode()).hexdigest()
-        return expected_signature == signature
+        public_hex = self.public_key(validator_name)
+        if public_hex is None:
+            print(f"Validator {validator_name} has no public key.")
+            return False
+        return _verify_one(public_hex, _message(validator_name, block_data), signature)
+
+    def verify_batch(self, items, workers=1):
+        """
+        Verify many (validator_name, block_data, signature) triples at once.
+        Authorization and public keys are resolved once per validator, and
+        each key is parsed once per process. With workers > 1 the signatures
+        are split across a pool of processes.
+        Returns:
+            list: One bool per item.
+        """
+        public_keys = {}
+        for validator_name in {validator_name for validator_name, _, _ in items}:
+            if self.is_validator_authorized(validator_name):
+                public_keys[validator_name] = self.public_key(validator_name)
+
+        results = [False] * len(items)
+        tasks, positions = [], []
+        for i, (validator_name, block_data, signature) in enumerate(items):
+            public_hex = public_keys.get(validator_name)
+            if public_hex is not None and signature:
+                tasks.append((public_hex, _message(validator_name, block_data), signature))
+                positions.append(i)
+
+        if workers > 1 and len(tasks) > VERIFY_CHUNK:
+            chunks = [tasks[start:start + VERIFY_CHUNK] for start in range(0, len(tasks), VERIFY_CHUNK)]
+            with Pool(workers) as pool:
+                verified = [ok for chunk in pool.map(_verify_chunk, chunks) for ok in chunk]
+        else:
+            verified = _verify_chunk(tasks)
+        for i, ok in zip(positions, verified):
+            results[i] = ok
+        return results
+
+
+# key_dir defaults to KEY_DIR as it is at call time
+def key_path(validator_name, key_dir=None):
+    return os.path.join(key_dir or KEY_DIR, f"{validator_name}.pem")
+
+
+def generate_validator_key(validator_name, key_dir=None):
+    """
+    Create an Ed25519 key pair for a validator and write the private key
+    to key_dir, readable only by its owner.
+    Returns:
+        tuple: (private key, hex public key).
+    """
+    private_key = Ed25519PrivateKey.generate()
+    os.makedirs(key_dir or KEY_DIR, exist_ok=True)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    fd = os.open(key_path(validator_name, key_dir), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(pem)
+    public_hex = private_key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+    return private_key, public_hex
+
+
+# The validator's private key, or None if this machine does not hold it
+def load_signing_key(validator_name, key_dir=None):
+    try:
+        with open(key_path(validator_name, key_dir), "rb") as file:
+            return serialization.load_pem_private_key(file.read(), password=None)
+    except FileNotFoundError:
+        return None
+
+
+def register_public_key(cursor, validator_name, public_hex):
+    cursor.execute("UPDATE users SET public_key = %s WHERE user_id = %s;", (public_hex, validator_name))
+
+
+if __name__ == "__main__":
+    import argparse
+    from data.data_config import db_session
+    from data.schema import ensure_schema
+
+    parser = argparse.ArgumentParser(description="Create a validator's Ed25519 signing key and register its public key.")
+    parser.add_argument("validator_name")
+    args = parser.parse_args()
+
+    _, public_hex = generate_validator_key(args.validator_name)
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        register_public_key(cursor, args.validator_name, public_hex)
+        db.commit()
+        cursor.close()
+    print(f"Wrote {key_path(args.validator_name)}; public key {public_hex} registered for {args.validator_name}.")
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import threading
+from functools import lru_cache
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import db_session
+from config import VALIDATOR_CACHE_TTL
+
+
+class ValidatorRegistry:
+    def __init__(self, ttl=VALIDATOR_CACHE_TTL):
+        """
+        In-memory cache of validator rows (as dictionaries) from the users table.
+        Rows are kept for ttl seconds and then re-read on their next lookup.
+        Unknown ids are cached as well, so a bad validator name does not cost
+        a query per block. `name in registry` is supported, so a registry can
+        stand in for ProofOfAuthority's authorized_validators list.
+        Args:
+            ttl (float): Seconds a cached row (or miss) stays valid.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # user_id -> (row or None, time it was loaded)
+        self._lock = threading.Lock()
+
+    def preload(self):
+        """Load every row of the users table; returns the number of rows."""
+        with db_session() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM users;")
+            rows = cursor.fetchall()
+            cursor.close()
+        loaded_at = time.monotonic()
+        with self._lock:
+            self._entries = {row["user_id"]: (row, loaded_at) for row in rows}
+        return len(rows)
+
+    def _fetch(self, user_id):
+        with db_session() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM users WHERE user_id = %s;", (user_id,))
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows[0] if rows else None
+
+    def get(self, user_id):
+        """Return the users row of a validator, or None if there is no such user."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        row = self._fetch(user_id)
+        with self._lock:
+            self._entries[user_id] = (row, time.monotonic())
+        return row
+
+    # Hex Ed25519 public key registered for a validator, or None
+    def public_key(self, user_id):
+        row = self.get(user_id)
+        return row.get("public_key") if row else None
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def invalidate(self, user_id=None):
+        """Forget one validator, or every validator when user_id is None."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# The process-wide registry, preloaded from the users table on first use
+@lru_cache(maxsize=None)
+def get_validator_registry():
+    registry = ValidatorRegistry()
+    try:
+        registry.preload()
+    except Exception as e:
+        # Lookups still work; they fall back to one query per validator
+        print(f"Error preloading validators: {e}")
+    return registry
@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import time
+import tempfile
+from multiprocessing import Pool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import db_cred, db_session
+from blockchain.chain import BLOCK_COLUMNS, canonical_hash
+from blockchain.poa import ProofOfAuthority
+from blockchain.block_log import BlockLog, BLOCK_LOG_DIR
+
+# Progress of the last audit, so an interrupted one can resume
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "verify_checkpoint.json")
+# Progress of the last audit of the local block log
+LOG_CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "verify_log_checkpoint.json")
+# Blocks verified by one worker task
+CHUNK_BLOCKS = 50000
+# Blocks fetched per query while streaming a chunk
+PAGE_SIZE = 5000
+# Failures kept in the checkpoint; further ones are only counted
+MAX_REPORTED_FAILURES = 1000
+
+# Signature checker of a worker process, built from the keys the audit started with
+_poa = None
+# Block log read by a worker process, or None to read the blockchain table
+_log = None
+
+
+def _init_worker(public_keys, log_dir=None):
+    global _poa, _log
+    _poa = ProofOfAuthority(public_keys, public_keys.get)
+    _log = BlockLog(log_dir, readonly=True) if log_dir else None
+
+
+# Hex public key of every validator that registered one
+def load_public_keys():
+    with db_session() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT user_id, public_key FROM users WHERE public_key IS NOT NULL;")
+        public_keys = dict(cursor.fetchall())
+        cursor.close()
+    return public_keys
+
+
+def stream_blocks(cursor, start, end, page_size=PAGE_SIZE):
+    """
+    Yields the blocks with start <= index_num <= end in index order, as dictionaries.
+    Pages are read with keyset pagination on index_num.
+    """
+    columns = ", ".join(BLOCK_COLUMNS)
+    sql = f"SELECT {columns} FROM blockchain WHERE index_num >= %s AND index_num <= %s ORDER BY index_num LIMIT %s;"
+    last = start - 1
+    while True:
+        cursor.execute(sql, (last + 1, end, page_size))
+        rows = cursor.fetchall()
+        for row in rows:
+            yield dict(zip(BLOCK_COLUMNS, row))
+        if len(rows) < page_size:
+            return
+        last = rows[-1][0]
+
+
+def verify_range(bounds):
+    """
+    Verifies the blocks of one index range, read from the worker's block log
+    or on its own database connection.
+    Links inside the range are checked here; the link into the range is
+    returned (first_index, first_previous_hash) for the caller to stitch.
+    Block signatures of the range are checked together with verify_batch.
+    Returns:
+        dict: Range summary with counts and (index_num, reason) failures.
+    """
+    start, end = bounds
+    if _log is not None:
+        return _check_blocks(start, end, _log.scan(start, end))
+
+    # Runs in a worker process: the pool and its connections belong to the parent, which forked them
+    db = db_cred()
+    if db is None:
+        raise ConnectionError("Could not open a database connection.")
+    try:
+        cursor = db.cursor()
+        result = _check_blocks(start, end, stream_blocks(cursor, start, end))
+        cursor.close()
+    finally:
+        db.close()
+    return result
+
+
+def _check_blocks(start, end, blocks):
+    result = {
+        "start": start, "end": end, "count": 0, "unverifiable": 0, "unsigned": 0, "failures": [],
+        "first_index": None, "first_previous_hash": None, "last_index": None, "last_hash": None,
+    }
+    signed = []
+    for block in blocks:
+        index_num = block["index_num"]
+        if result["count"] == 0:
+            result["first_index"] = index_num
+            result["first_previous_hash"] = block["previous_hash"]
+        else:
+            if index_num == result["last_index"]:
+                result["failures"].append((index_num, "duplicate index"))
+            elif index_num != result["last_index"] + 1:
+                result["failures"].append((index_num, f"missing blocks {result['last_index'] + 1}-{index_num - 1}"))
+            if block["previous_hash"] != result["last_hash"]:
+                result["failures"].append((index_num, "previous hash does not match"))
+
+        if block.get("timestamp") is None:
+            # Saved before the timestamp was persisted: only the links can be checked
+            result["unverifiable"] += 1
+        elif canonical_hash(block) != block["hash"]:
+            result["failures"].append((index_num, "hash does not match"))
+
+        if block.get("block_signature") is None:
+            # A validator with a key signs every block; only keyless (legacy) validators' blocks may lack one
+            if _poa.public_key(block["validator_name"]) is not None:
+                result["failures"].append((index_num, "block is not signed"))
+            else:
+                result["unsigned"] += 1
+        else:
+            signed.append((index_num, block["validator_name"], block["hash"], block["block_signature"]))
+
+        result["count"] += 1
+        result["last_index"] = index_num
+        result["last_hash"] = block["hash"]
+
+    verified = _poa.verify_batch([(validator_name, block_hash, signature) for _, validator_name, block_hash, signature in signed])
+    result["failures"].extend((index_num, "invalid block signature") for (index_num, _, _, _), ok in zip(signed, verified) if not ok)
+    result["failures"].sort(key=lambda failure: failure[0])
+    return result
+
+
+def chain_height(log_dir=None):
+    if log_dir:
+        return BlockLog(log_dir, readonly=True).height
+    with db_session() as db:
+        cursor = db.cursor()
+        cursor.execute("SELECT MAX(index_num) FROM blockchain;")
+        height = cursor.fetchall()[0][0]
+        cursor.close()
+    return height or 0
+
+
+def _new_state():
+    return {"next_index": 1, "previous_hash": "0", "verified": 0, "unverifiable": 0, "unsigned": 0, "failure_count": 0, "failures": []}
+
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    try:
+        with open(path) as file:
+            # Fields added since the checkpoint was written start from zero
+            return dict(_new_state(), **json.load(file))
+    except FileNotFoundError:
+        return _new_state()
+
+
+# Write the checkpoint next to itself and rename it into place
+def save_checkpoint(state, path=CHECKPOINT_FILE):
+    fd, staging = tempfile.mkstemp(prefix=".verify-", dir=os.path.dirname(path))
+    with os.fdopen(fd, "w") as file:
+        json.dump(state, file, indent=2)
+    os.replace(staging, path)
+
+
+def _record_failures(state, failures):
+    state["failure_count"] += len(failures)
+    room = MAX_REPORTED_FAILURES - len(state["failures"])
+    state["failures"].extend([list(failure) for failure in failures[:max(room, 0)]])
+
+
+def verify_chain(workers=None, chunk_blocks=CHUNK_BLOCKS, checkpoint_path=CHECKPOINT_FILE, resume=True, log_dir=None):
+    """
+    Verifies every block hash, previous_hash link and block signature from
+    index 1 to the tip.
+    The index range is split into chunks verified by a pool of worker
+    processes. Results are stitched in index order: each chunk's first block
+    must follow the last block verified before it. The state after every
+    stitched chunk is checkpointed, so a restarted audit continues from the
+    first unverified block.
+    Args:
+        workers (int): Worker processes; defaults to the number of CPUs.
+        chunk_blocks (int): Blocks per worker task.
+        checkpoint_path (str): Checkpoint file, or None to disable checkpointing.
+        resume (bool): Continue from the checkpoint instead of starting over.
+        log_dir (str): Audit this block log instead of the blockchain table.
+    Returns:
+        dict: Final state with verified, unverifiable and failure counts.
+    """
+    state = load_checkpoint(checkpoint_path) if resume and checkpoint_path else _new_state()
+    height = chain_height(log_dir)
+    chunks = [(start, min(start + chunk_blocks - 1, height)) for start in range(state["next_index"], height + 1, chunk_blocks)]
+    if not chunks:
+        print(f"Nothing to verify: checkpoint is at block {state['next_index'] - 1} of {height}.")
+        return state
+
+    print(f"Verifying blocks {state['next_index']}-{height} in {len(chunks)} chunks...")
+    started = time.perf_counter()
+    done = 0
+    public_keys = load_public_keys()
+    with Pool(workers, initializer=_init_worker, initargs=(public_keys, log_dir)) as pool:
+        for result in pool.imap(verify_range, chunks):
+            if result["count"] == 0:
+                _record_failures(state, [(result["start"], f"missing blocks {result['start']}-{result['end']}")])
+            else:
+                # Stitch the chunk to the last block verified before it
+                stitch = []
+                if result["first_index"] != state["next_index"]:
+                    stitch.append((result["first_index"], f"missing blocks {state['next_index']}-{result['first_index'] - 1}"))
+                if result["first_previous_hash"] != state["previous_hash"]:
+                    stitch.append((result["first_index"], "previous hash does not match"))
+                _record_failures(state, stitch + result["failures"])
+                state["previous_hash"] = result["last_hash"]
+            state["next_index"] = result["end"] + 1
+            state["verified"] += result["count"]
+            state["unverifiable"] += result["unverifiable"]
+            state["unsigned"] += result["unsigned"]
+            done += result["count"]
+            if checkpoint_path:
+                save_checkpoint(state, checkpoint_path)
+
+            elapsed = time.perf_counter() - started
+            print(f"  block {result['end']}/{height}: {done / elapsed:,.0f} blocks/sec, {state['failure_count']} failures")
+
+    elapsed = time.perf_counter() - started
+    print(f"Verified {done} blocks in {elapsed:.1f}s ({done / elapsed:,.0f} blocks/sec).")
+    return state
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verify the hashes and links of the whole blockchain.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-blocks", type=int, default=CHUNK_BLOCKS)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and verify from the genesis block")
+    parser.add_argument("--log", action="store_true", help="Audit the local block log instead of the blockchain table")
+    args = parser.parse_args()
+
+    if args.log:
+        state = verify_chain(args.workers, args.chunk_blocks, LOG_CHECKPOINT_FILE, not args.restart, BLOCK_LOG_DIR)
+    else:
+        state = verify_chain(args.workers, args.chunk_blocks, resume=not args.restart)
+    print(f"{state['verified']} blocks verified up to block {state['next_index'] - 1}; "
+          f"{state['unverifiable']} without a persisted timestamp (links only), "
+          f"{state['unsigned']} unsigned by validators without a key (legacy).")
+    if state["failure_count"]:
+        print(f"{state['failure_count']} failures:")
+        for index_num, reason in state["failures"]:
+            print(f"  block {index_num}: {reason}")
+    else:
+        print("Chain is intact.")
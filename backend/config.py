@@ -0,0 +1,39 @@
+# Write new patient rows as a single packed ciphertext (see encryption.homomorphic.pack_features)
+PACKED_ROWS = False
+# Model inference backend: "sklearn", or "compiled" for the flattened forest in ml_model.compiled
+INFERENCE_BACKEND = "sklearn"
+# Batches larger than this go to scikit-learn even with the compiled backend (measured crossover)
+COMPILED_MAX_BATCH = 128
+# Keys kept in the LRU prediction cache (ml_model.prediction_cache); 0 disables the cache
+PREDICTION_CACHE_SIZE = 100000
+# Load only the chain tip at startup and fetch older blocks on demand (blockchain.chain.Blockchain)
+BLOCKCHAIN_TIP_ONLY = True
+# Recent blocks kept in memory in tip-only mode
+BLOCK_CACHE_SIZE = 1024
+# Seal patient records into one Merkle-root block per batch (blockchain.batcher.BlockBatcher)
+BLOCKCHAIN_BATCHED = False
+# Records per batch block, and the longest a record waits before its block is sealed
+BLOCK_BATCH_SIZE = 1000
+BLOCK_BATCH_SECONDS = 2.0
+# Accept unsigned blocks from validators that never registered an Ed25519 key (legacy chains);
+# a validator with a registered key must always sign
+ALLOW_UNSIGNED_BLOCKS = False
+# Seconds a validator row stays in the in-memory registry (blockchain.validators)
+VALIDATOR_CACHE_TTL = 300
+# Where Blockchain stores blocks: "mysql", or "log" for the local append-only log (blockchain.block_log)
+BLOCK_STORAGE = "mysql"
+# With BLOCK_STORAGE = "log", also insert every block into the MySQL blockchain table
+BLOCK_LOG_MIRROR_MYSQL = False
+# Size at which the block log starts a new segment file
+BLOCK_LOG_SEGMENT_BYTES = 256 * 1024 * 1024
+# Group commit: fsync once this many appends are pending, or after this many ms
+BLOCK_LOG_GROUP_COMMIT_BLOCKS = 256
+BLOCK_LOG_GROUP_COMMIT_MS = 10
+# Acknowledge add_patient once it is in the write-ahead queue, and encrypt, insert and chain in the background (data.ingest_service)
+INGEST_ASYNC = False
+# Write keyed equality tokens of the encrypted features on insert, for indexed searches (encryption.search_index)
+SEARCH_INDEX = False
+# Memory budget of the decrypted-row cache behind the records views (encryption.row_cache)
+ROW_CACHE_BYTES = 64 * 1024 * 1024
+# Keep cached decrypted rows AES-GCM encrypted in memory under a per-process key
+ROW_CACHE_ENCRYPT = False
@@ -1 +1 @@
-from .data_config import db_cred
\ No newline at end of file
+from .data_config import db_cred, db_session, get_pool, ConnectionPool
\ No newline at end of file
@@ -1,6 +1,15 @@
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
 
+# Number of connections kept by the shared pool
+POOL_SIZE = 5
+# Idle connections older than this (seconds) are pinged before reuse
+HEALTH_CHECK_AFTER = 30
+
 def db_cred():
     try:
         return mysql.connector.connect(
@@ -13,3 +22,120 @@ def db_cred():
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
+
+
+# Default health check: a live round trip to the server
+def _is_alive(connection):
+    try:
+        return connection.is_connected()
+    except Exception:
+        return False
+
+
+class ConnectionPool:
+    def __init__(self, factory=db_cred, size=POOL_SIZE, health_check=_is_alive, check_after=HEALTH_CHECK_AFTER):
+        """
+        A fixed-size pool of reusable database connections.
+        Args:
+            factory: Callable opening a new connection.
+            size (int): Maximum number of connections open at once.
+            health_check: Callable returning False for a dead connection.
+            check_after (float): Seconds a connection may sit idle before it is checked again.
+        """
+        self.factory = factory
+        self.size = size
+        self.health_check = health_check
+        self.check_after = check_after
+        self.connections_created = 0
+        self.checkouts = 0
+        self._idle = []  # (connection, time it was returned)
+        self._open = 0
+        self._condition = threading.Condition()
+
+    def _acquire(self):
+        with self._condition:
+            while not self._idle and self._open >= self.size:
+                self._condition.wait()
+            self.checkouts += 1
+            if self._idle:
+                return self._idle.pop()
+            self._open += 1
+
+        try:
+            connection = self.factory()
+        except Exception:
+            connection = None
+        if connection is None:
+            self._discard()
+            raise ConnectionError("Could not open a database connection.")
+        with self._condition:
+            self.connections_created += 1
+        return connection, time.monotonic()
+
+    def _discard(self):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    def _release(self, connection):
+        # End the transaction the user left open, reads included: with autocommit off,
+        # a REPEATABLE READ snapshot would otherwise hide later commits from the next user
+        try:
+            connection.rollback()
+        except Exception:
+            # The connection is unusable; do not hand it out again
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self._discard()
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    # An idle connection, health-checked if it sat past check_after, or a new one
+    def _checkout(self):
+        while True:
+            connection, returned_at = self._acquire()
+            if time.monotonic() - returned_at <= self.check_after or self.health_check(connection):
+                return connection
+            try:
+                connection.close()
+            except Exception:
+                pass
+            self._discard()
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out for the duration of a with block; uncommitted work is rolled back on return."""
+        connection = self._checkout()
+        try:
+            yield connection
+        finally:
+            self._release(connection)
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for connection, _ in idle:
+            connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# The process-wide pool used by the backend modules
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+# Shorthand for get_pool().connection()
+def db_session():
+    return get_pool().connection()
@@ -1,15 +1,16 @@
 import sys
 import os
-import pickle  # Add pickle import to serialize the encrypted values
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import csv
-from data.data_config import db_cred
-from encryption.homomorphic import generate_keys, encrypt_value, save_keys, load_keys
-from mappings import (
-    GENDER_MAP, FEVER_MAP, COUGH_MAP, FATIGUE_MAP, 
-    DIFFICULTY_BREATHING_MAP, BLOOD_PRESSURE_MAP, CHOLESTEROL_LEVEL_MAP
-)
+from data.data_config import db_session
+from data.schema import ensure_schema
+from encryption.homomorphic import generate_keys, encrypt_value, encrypt_packed, save_keys, load_keys
+from encryption.codec import encode_ciphertext, store_public_key
+from analytics.materialized import row_contribution, accumulate, flush_aggregates
+from encryption.search_index import load_or_generate_index_key, row_tokens
+from data.ingest import map_rows, insert_sql
+from config import SEARCH_INDEX
 
 # Check if keys exist, load or generate
 def load_or_generate_keys():
@@ -21,98 +22,104 @@ def load_or_generate_keys():
         save_keys(public_key, private_key)  # Save the generated keys
     return public_key, private_key
 
-# Database connection
-db = db_cred()
-cursor = db.cursor()
-
-# Transform and encrypt data
-def transform_and_encrypt(row, transform_count, encrypt_count, public_key):
+# Encrypt a mapped row
+def transform_and_encrypt(transformed_row, transform_count, encrypt_count, public_key, packed=False):
     """
-    Transforms the row based on the mapping rules and encrypts certain values.
+    Encrypts certain values of a row already mapped by feature_codec.
     Args:
-        row (list): A row of data read from the CSV file.
+        transformed_row (list): A row of the CSV file with its features mapped to codes.
         transform_count (int): Counter for how many rows have been transformed.
         encrypt_count (int): Counter for how many rows have been encrypted.
         public_key: The Paillier public key used for encryption.
+        packed (bool): Encrypt the features as one packed ciphertext.
     Returns:
         tuple: Transformed and encrypted row, updated counters.
     """
-    print(f"Processing row: {transform_count + 1}...")
-
-    # Map the values using the mappings
-    transformed_row = [
-        row[0],  # Disease (no transformation or encryption)
-        GENDER_MAP.get(row[1], None),
-        FEVER_MAP.get(row[2], None),
-        COUGH_MAP.get(row[3], None),
-        FATIGUE_MAP.get(row[4], None),
-        DIFFICULTY_BREATHING_MAP.get(row[5], None),
-        int(row[6]),  # Age
-        BLOOD_PRESSURE_MAP.get(row[7], None),
-        CHOLESTEROL_LEVEL_MAP.get(row[8], None),
-        row[9]  # Outcome Variable
-    ]
-
-    # Check for missing mappings
-    if None in transformed_row:
-        return None  # Indicates an issue in the mapping
+    if packed:
+        # Disease, Outcome Variable and one ciphertext for all eight features
+        encrypted_row = [
+            transformed_row[0],
+            transformed_row[9],
+            encode_ciphertext(encrypt_packed(public_key, transformed_row[1:9])),
+        ]
+        transform_count += 1
+        encrypt_count += 1
+        return encrypted_row, transform_count, encrypt_count
 
     # Encrypt specific values and serialize them
     encrypted_row = [
         transformed_row[0],  # Disease (no encryption)
-        pickle.dumps(encrypt_value(public_key, transformed_row[1])),  # Serialize Encrypted Gender
-        pickle.dumps(encrypt_value(public_key, transformed_row[2])),  # Serialize Encrypted Fever
-        pickle.dumps(encrypt_value(public_key, transformed_row[3])),  # Serialize Encrypted Cough
-        pickle.dumps(encrypt_value(public_key, transformed_row[4])),  # Serialize Encrypted Fatigue
-        pickle.dumps(encrypt_value(public_key, transformed_row[5])),  # Serialize Encrypted Difficulty Breathing
-        pickle.dumps(encrypt_value(public_key, transformed_row[6])),  # Serialize Encrypted Age
-        pickle.dumps(encrypt_value(public_key, transformed_row[7])),  # Serialize Encrypted Blood Pressure
-        pickle.dumps(encrypt_value(public_key, transformed_row[8])),  # Serialize Encrypted Cholesterol Level
+        encode_ciphertext(encrypt_value(public_key, transformed_row[1])),  # Encode Encrypted Gender
+        encode_ciphertext(encrypt_value(public_key, transformed_row[2])),  # Encode Encrypted Fever
+        encode_ciphertext(encrypt_value(public_key, transformed_row[3])),  # Encode Encrypted Cough
+        encode_ciphertext(encrypt_value(public_key, transformed_row[4])),  # Encode Encrypted Fatigue
+        encode_ciphertext(encrypt_value(public_key, transformed_row[5])),  # Encode Encrypted Difficulty Breathing
+        encode_ciphertext(encrypt_value(public_key, transformed_row[6])),  # Encode Encrypted Age
+        encode_ciphertext(encrypt_value(public_key, transformed_row[7])),  # Encode Encrypted Blood Pressure
+        encode_ciphertext(encrypt_value(public_key, transformed_row[8])),  # Encode Encrypted Cholesterol Level
         transformed_row[9]  # Outcome Variable (no encryption)
     ]
 
     transform_count += 1
     encrypt_count += 1
-    print(f"Row {encrypt_count} encrypted.")
-    
     return encrypted_row, transform_count, encrypt_count
 
 # Insert CSV into MySQL
-def insert_csv_to_db(file_path):
+def insert_csv_to_db(file_path, packed=False, indexed=SEARCH_INDEX):
     print(f"Starting to insert data from {file_path}...")
     
     # Load or generate keys
     public_key, private_key = load_or_generate_keys()
+    # Key of the search tokens written next to the ciphertexts
+    index_key = load_or_generate_index_key() if indexed else None
+    sql = insert_sql(packed, indexed)
 
-    transform_count = 0  # Counter for rows transformed
-    encrypt_count = 0  # Counter for rows encrypted
-    rows_inserted = 0  # Counter for rows inserted into the database
-
-    with open(file_path, 'r') as file:
-        csv_data = csv.reader(file)
-        next(csv_data)  # Skip the header row
-
-        for row in csv_data:
-            transformed_row, transform_count, encrypt_count = transform_and_encrypt(row, transform_count, encrypt_count, public_key)
-            if not transformed_row:  # Skip rows with missing mappings
-                continue
-            
-            sql = """
-            INSERT INTO disease_data (
-                Disease, Gender, Fever, Cough, Fatigue, Difficulty_Breathing, Age, Blood_Pressure, Cholesterol_Level, Outcome_Variable
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-            """
-            cursor.execute(sql, tuple(transformed_row))
-            rows_inserted += 1
-        
-        db.commit()
-        print(f"Inserted {rows_inserted} rows.")
-        print(f"Total transformed rows: {transform_count}")
-        print(f"Total encrypted rows: {encrypt_count}")
+    # One pooled connection for the whole load, checked out by the load rather than at import
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        store_public_key(cursor, public_key)
 
-# Call the function
-file_path = '/home/tsoien/github/newML/backend/data/Disease_symptom_and_patient_profile_dataset.csv' 
-insert_csv_to_db(file_path)
+        transform_count = 0  # Counter for rows transformed
+        encrypt_count = 0  # Counter for rows encrypted
+        rows_inserted = 0  # Counter for rows inserted into the database
+        pending_aggregates = {}  # Per-disease aggregate updates applied before commit
+
+        with open(file_path, 'r') as file:
+            csv_data = csv.reader(file)
+            next(csv_data)  # Skip the header row
+
+            # Map the whole file column by column; rows with missing mappings are skipped
+            mapped_rows, skipped = map_rows(list(csv_data))
+            if skipped:
+                print(f"Skipped {skipped} rows with values missing from the mappings.")
 
-cursor.close()
-db.close()
+            for row in mapped_rows:
+                transformed_row, transform_count, encrypt_count = transform_and_encrypt(row, transform_count, encrypt_count, public_key, packed)
+                # Search tokens of the mapped (not yet encrypted) features
+                tokens = row_tokens(index_key, row[1:9]) if indexed else ()
+
+                if packed:
+                    cursor.execute(sql, tuple(transformed_row) + tokens)
+                    rows_inserted += 1
+                    accumulate(pending_aggregates, public_key, transformed_row[0],
+                               row_contribution(public_key, packed_cell=transformed_row[2]), True)
+                    continue
+
+                cursor.execute(sql, tuple(transformed_row) + tokens)
+                rows_inserted += 1
+                accumulate(pending_aggregates, public_key, transformed_row[0],
+                           row_contribution(public_key, feature_cells=transformed_row[1:9], features=row[1:9]), False)
+
+            flush_aggregates(cursor, public_key, pending_aggregates)
+            db.commit()
+            print(f"Inserted {rows_inserted} rows.")
+            print(f"Total transformed rows: {transform_count}")
+            print(f"Total encrypted rows: {encrypt_count}")
+
+        cursor.close()
+
+# Call the function
+if __name__ == "__main__":
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Disease_symptom_and_patient_profile_dataset.csv')
+    insert_csv_to_db(file_path)
@@ -0,0 +1,234 @@
+import sys
+import os
+import csv
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import db_session
+from data.schema import ensure_schema
+from encryption.homomorphic import encrypt_value, encrypt_packed, load_or_generate_keys
+from encryption.codec import encode_ciphertext, store_public_key
+from encryption.search_index import TOKEN_COLUMNS, load_or_generate_index_key, row_tokens
+from analytics.materialized import row_contribution, accumulate, merge, flush_aggregates
+from feature_codec import encode_frame, CSV_COLUMNS
+from config import SEARCH_INDEX
+
+# Public key, row format and token key of the current worker process, set once by init_encrypt_worker
+_worker_public_key = None
+_worker_packed = False
+_worker_index_key = None
+
+
+# The disease_data INSERT for rows from encrypt_rows; with indexed, the eight search tokens follow the row
+def insert_sql(packed=False, indexed=False):
+    columns = ["Disease", "Outcome_Variable", "Packed_Features"] if packed else list(CSV_COLUMNS)
+    if indexed:
+        columns += TOKEN_COLUMNS.values()
+    return f"INSERT INTO disease_data ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))});"
+
+
+# Numeric encoding of each CSV row, or None for a row with a value that has no mapping
+def _map_each(rows):
+    encoded, unknown = encode_frame(pd.DataFrame(rows, columns=CSV_COLUMNS))
+    skipped = unknown.any(axis=1).to_numpy()
+    return [None if skip else row for row, skip in zip(encoded.astype(object).values.tolist(), skipped)]
+
+
+# Map a chunk of raw CSV rows to their numeric encoding, one column at a time
+def map_rows(rows):
+    """
+    Applies the mappings to CSV rows without encrypting them.
+    Args:
+        rows (list): Rows of data read from the CSV file.
+    Returns:
+        tuple: (mapped rows as lists, number of rows skipped because a value has no mapping).
+    """
+    if not rows:
+        return [], 0
+    mapped_rows = [row for row in _map_each(rows) if row is not None]
+    return mapped_rows, len(rows) - len(mapped_rows)
+
+
+# Runs once in every worker so the public key is not shipped with each chunk
+def init_encrypt_worker(public_key, packed=False, index_key=None):
+    """
+    Sets the key and row format used by encrypt_rows in this process.
+    Pass it as the initializer of a process pool, or call it before encrypt_rows in-process.
+    """
+    global _worker_public_key, _worker_packed, _worker_index_key
+    _worker_public_key = public_key
+    _worker_packed = packed
+    _worker_index_key = index_key
+
+
+# Encrypt one mapped row in the worker's row format
+def _encrypt_mapped(mapped_row):
+    if _worker_packed:
+        packed_cell = encode_ciphertext(encrypt_packed(_worker_public_key, mapped_row[1:9]))
+        encrypted_row = (mapped_row[0], mapped_row[9], packed_cell)
+        contribution = row_contribution(_worker_public_key, packed_cell=packed_cell)
+    else:
+        feature_cells = [encode_ciphertext(encrypt_value(_worker_public_key, value)) for value in mapped_row[1:9]]
+        encrypted_row = (mapped_row[0],) + tuple(feature_cells) + (mapped_row[9],)
+        contribution = row_contribution(_worker_public_key, feature_cells=feature_cells, features=mapped_row[1:9])
+    if _worker_index_key is not None:
+        encrypted_row += row_tokens(_worker_index_key, mapped_row[1:9])
+    return encrypted_row, contribution
+
+
+# Map and encrypt CSV rows, one result per row, inside a process set up by init_encrypt_worker
+def encrypt_rows(rows):
+    """
+    Maps and encrypts CSV rows; a row that fails does not affect the others.
+    Args:
+        rows (list): Rows of data in CSV_COLUMNS order.
+    Returns:
+        list: One entry per row, in order: (encrypted row for insert_sql, aggregate
+            contribution of the row), or the exception that kept the row from being
+            mapped or encrypted.
+    """
+    results = []
+    for mapped_row in _map_each(rows) if rows else []:
+        if mapped_row is None:
+            results.append(ValueError("A value has no mapping or is out of range."))
+            continue
+        try:
+            results.append(_encrypt_mapped(mapped_row))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+# encrypt_rows folded for the bulk loader: (encrypted rows, rows skipped, per-disease aggregate updates)
+def _encrypt_chunk(rows):
+    encrypted_rows = []
+    skipped = 0
+    # Per-disease aggregate updates for this chunk, merged by the writer
+    aggregates = {}
+    for result in encrypt_rows(rows):
+        if isinstance(result, Exception):
+            skipped += 1
+            continue
+        encrypted_row, contribution = result
+        encrypted_rows.append(encrypted_row)
+        accumulate(aggregates, _worker_public_key, encrypted_row[0], contribution, _worker_packed)
+    return encrypted_rows, skipped, aggregates
+
+
+# Read the CSV lazily, yielding lists of at most chunk_size rows
+def stream_csv(file_path, chunk_size):
+    with open(file_path, 'r') as file:
+        csv_data = csv.reader(file)
+        next(csv_data)  # Skip the header row
+        chunk = []
+        for row in csv_data:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+# Insert CSV into MySQL using a process pool for encryption
+def insert_csv_batched(file_path, chunk_size=200, commit_every=2000, workers=None, packed=False, indexed=SEARCH_INDEX):
+    """
+    Streams the CSV in chunks, encrypts the chunks in parallel and writes them
+    with executemany, committing every commit_every rows.
+    Args:
+        file_path (str): Path of the CSV file to ingest.
+        chunk_size (int): Number of rows handed to a worker at a time.
+        commit_every (int): Number of inserted rows per transaction.
+        workers (int): Number of worker processes (defaults to the CPU count).
+        packed (bool): Write each row as a single packed ciphertext.
+        indexed (bool): Also write the search tokens of every row.
+    Returns:
+        int: Number of rows inserted.
+    """
+    workers = workers or os.cpu_count() or 1
+    print(f"Starting batched insert from {file_path} with {workers} workers...")
+
+    public_key, _ = load_or_generate_keys()
+
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        store_public_key(cursor, public_key)
+        db.commit()
+
+        index_key = load_or_generate_index_key() if indexed else None
+        sql = insert_sql(packed, indexed)
+        rows_inserted = 0
+        rows_skipped = 0
+        uncommitted = 0
+        pending_aggregates = {}
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_encrypt_worker, initargs=(public_key, packed, index_key)) as executor:
+            chunks = stream_csv(file_path, chunk_size)
+            # Keep a bounded number of chunks in flight so memory does not grow with the file
+            max_in_flight = workers * 2
+            pending = {}
+            next_submit = 0
+            next_write = 0
+            results = {}
+            exhausted = False
+
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    pending[executor.submit(_encrypt_chunk, chunk)] = next_submit
+                    next_submit += 1
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+
+                # Write chunks in file order
+                while next_write in results:
+                    encrypted_rows, skipped, aggregates = results.pop(next_write)
+                    next_write += 1
+                    rows_skipped += skipped
+                    merge(pending_aggregates, public_key, aggregates)
+                    if encrypted_rows:
+                        cursor.executemany(sql, encrypted_rows)
+                        rows_inserted += len(encrypted_rows)
+                        uncommitted += len(encrypted_rows)
+                    if uncommitted >= commit_every:
+                        flush_aggregates(cursor, public_key, pending_aggregates)
+                        db.commit()
+                        uncommitted = 0
+                        elapsed = time.perf_counter() - start
+                        print(f"Inserted {rows_inserted} rows ({rows_inserted / elapsed:.1f} rows/sec).")
+
+        flush_aggregates(cursor, public_key, pending_aggregates)
+        db.commit()
+        elapsed = time.perf_counter() - start
+        cursor.close()
+
+    print(f"Inserted {rows_inserted} rows, skipped {rows_skipped} rows that could not be mapped or encrypted.")
+    print(f"Elapsed {elapsed:.2f}s ({rows_inserted / elapsed if elapsed else 0:.1f} rows/sec).")
+    return rows_inserted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batch encrypt and insert a CSV into disease_data.")
+    parser.add_argument("file_path", nargs="?", default=os.path.join(os.path.dirname(__file__), "Disease_symptom_and_patient_profile_dataset.csv"))
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--commit-every", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--packed", action="store_true", help="Store each row as one packed ciphertext.")
+    parser.add_argument("--indexed", action="store_true", default=SEARCH_INDEX, help="Also write the search tokens of every row.")
+    args = parser.parse_args()
+
+    insert_csv_batched(args.file_path, args.chunk_size, args.commit_every, args.workers, args.packed, args.indexed)
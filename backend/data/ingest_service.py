@@ -0,0 +1,386 @@
+import sys
+import os
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import db_session
+from data.schema import ensure_schema
+from data.ingest import insert_sql, map_rows, init_encrypt_worker, encrypt_rows
+from encryption.homomorphic import load_or_generate_keys, pack_features
+from encryption.codec import store_public_key
+from encryption.search_index import load_or_generate_index_key
+from analytics.materialized import accumulate, flush_aggregates
+from blockchain.block_log import BlockLog
+from blockchain.batcher import BlockBatcher
+from blockchain.merkle import canonical_record, leaf_hash
+from feature_codec import CSV_COLUMNS
+from config import PACKED_ROWS, SEARCH_INDEX
+
+# Write-ahead queue of accepted records; never committed
+WAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_wal")
+# Records handed to an encryption worker at a time
+ENCRYPT_BATCH = 32
+# Encrypted batches waiting for the writer; bounds memory when the database falls behind
+MAX_IN_FLIGHT = 64
+# Rows per disease_data transaction
+COMMIT_ROWS = 500
+# Pause before a failed transaction is tried again; the rows stay queued meanwhile
+COMMIT_RETRY_SECONDS = 1.0
+# Tries of a transaction before its records are committed one at a time, and
+# before a single failing record is dead-lettered
+COMMIT_ATTEMPTS = 5
+
+
+# The record a patient contributes to the chain: its labels and its queue position
+def chain_record(seq, row):
+    return dict(zip(CSV_COLUMNS, row), seq=seq)
+
+
+class IngestService:
+    def __init__(self, blockchain, validator_name, signature, packed=PACKED_ROWS, indexed=SEARCH_INDEX, workers=None,
+                 wal_dir=WAL_DIR, encrypt_batch=ENCRYPT_BATCH, commit_rows=COMMIT_ROWS):
+        """
+        Asynchronous patient ingestion.
+        A record is acknowledged as soon as it is fsynced to a write-ahead
+        queue (a BlockLog keyed by sequence number). Behind that, an asyncio
+        pipeline encrypts records in a process pool, inserts them into
+        disease_data in batched transactions together with their ingest_log
+        rows, and seals them into Merkle batch blocks in sequence order.
+        On start, records the database has not applied are replayed from the
+        queue and applied records without a block are chained again, so a
+        restart loses nothing and keeps the chain order.
+        A record that cannot be encrypted, or whose insert keeps failing on
+        its own, is dead-lettered: its ingest_log row holds the error instead
+        of data, so it is neither replayed nor chained, and later records
+        are not held up behind it.
+        Args:
+            blockchain (Blockchain): Chain the batch blocks are added to.
+            validator_name (str): Validator signing the batch blocks.
+            signature (str): Signature of the validator.
+            packed (bool): Store each row as one packed ciphertext.
+            indexed (bool): Also write the search tokens of every row.
+            workers (int): Encryption processes (defaults to the CPU count).
+            wal_dir (str): Directory of the write-ahead queue.
+            encrypt_batch (int): Records per encryption task.
+            commit_rows (int): Largest number of rows per transaction.
+        """
+        self.blockchain = blockchain
+        self.validator_name = validator_name
+        self.signature = signature
+        self.packed = packed
+        self.indexed = indexed
+        self.workers = workers or os.cpu_count() or 1
+        self.wal_dir = wal_dir
+        self.encrypt_batch = encrypt_batch
+        self.commit_rows = commit_rows
+        self.accepted = 0
+        self.written = 0
+        self.sealed = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+        self._journal_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    # ---- lifecycle -------------------------------------------------------
+
+    def start(self):
+        """Recover from the write-ahead queue and start the pipeline on its own event loop thread."""
+        self.public_key, _ = load_or_generate_keys()
+        index_key = load_or_generate_index_key() if self.indexed else None
+        with db_session() as db:
+            cursor = db.cursor()
+            ensure_schema(cursor)
+            store_public_key(cursor, self.public_key)
+            db.commit()
+            cursor.close()
+
+        self.wal = BlockLog(self.wal_dir)
+        self.batcher = BlockBatcher(self.blockchain, self.validator_name, self.signature)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_encrypt_worker, initargs=(self.public_key, self.packed, index_key))
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(started,), daemon=True)
+        self._thread.start()
+        started.wait()
+        asyncio.run_coroutine_threadsafe(self._recover(), self._loop).result()
+        return self
+
+    def _run(self, started):
+        asyncio.set_event_loop(self._loop)
+        self._incoming = asyncio.Queue()
+        self._encrypted = asyncio.Queue(maxsize=MAX_IN_FLIGHT)
+        self._seal_tasks = set()
+        self._stages = [self._loop.create_task(self._encrypt_stage()), self._loop.create_task(self._write_stage())]
+        self._loop.call_soon(started.set)
+        self._loop.run_forever()
+
+    def stop(self):
+        """Finish every queued record, seal the last blocks and stop."""
+        asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self.batcher.stop()
+        self._executor.shutdown()
+        self.wal.close()
+
+    async def _drain(self):
+        self._incoming.put_nowait(None)
+        await asyncio.gather(*self._stages)
+        # Seal the trailing partial batch now rather than after max_wait
+        await self._loop.run_in_executor(None, self.batcher.flush)
+        if self._seal_tasks:
+            await asyncio.gather(*self._seal_tasks)
+
+    # ---- accepting records -----------------------------------------------
+
+    def submit(self, payload, timeout=None):
+        """Queue one patient from another thread; returns its sequence number once durable."""
+        return asyncio.run_coroutine_threadsafe(self.submit_async(payload), self._loop).result(timeout)
+
+    async def submit_async(self, payload):
+        """
+        Queue one patient.
+        Args:
+            payload (dict): Labels of every CSV_COLUMNS field.
+        Returns:
+            int: Sequence number of the record, after it is fsynced to the queue.
+        Raises:
+            ValueError: If a field is missing, has no mapping or cannot be stored in the row format.
+            RuntimeError: If the writer has stopped, so the record would never be written.
+        """
+        if self._stages[1].done():
+            raise RuntimeError("The ingest writer has stopped; the record would not be written.")
+        missing = [col for col in CSV_COLUMNS if payload.get(col) in (None, "")]
+        if missing:
+            raise ValueError(f"Missing value for: {', '.join(missing)}")
+        row = [payload[col] for col in CSV_COLUMNS]
+        mapped_rows, skipped = map_rows([row])
+        if skipped:
+            raise ValueError("A value has no mapping or is out of range.")
+        if self.packed:
+            # Raises ValueError for anything the packed layout cannot hold
+            pack_features(mapped_rows[0][1:9])
+        return await self._loop.run_in_executor(None, self._journal, row)
+
+    # Runs in a thread: append to the queue, hand the record to the pipeline, wait for the group fsync
+    def _journal(self, row):
+        with self._journal_lock:
+            seq = self.wal.height + 1
+            self.wal.append({"index_num": seq, "row": row})
+            # Enqueued under the lock, so the pipeline sees records in sequence order
+            self._loop.call_soon_threadsafe(self._incoming.put_nowait, (seq, row))
+            self.accepted += 1
+        self.wal.wait_durable(seq)
+        return seq
+
+    # ---- pipeline --------------------------------------------------------
+
+    async def _encrypt_stage(self):
+        stopping = False
+        while not stopping:
+            batch = [await self._incoming.get()]
+            while len(batch) < self.encrypt_batch and not self._incoming.empty():
+                batch.append(self._incoming.get_nowait())
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            if batch:
+                future = self._loop.run_in_executor(self._executor, encrypt_rows, [row for _, row in batch])
+                # Futures are queued in sequence order; the writer awaits them in that order
+                await self._encrypted.put((batch, future))
+        await self._encrypted.put(None)
+
+    async def _write_stage(self):
+        stopping = False
+        while not stopping:
+            chunks, rows = [], 0
+            item = await self._encrypted.get()
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                batch, future = item
+                chunks.extend(await self._encrypted_chunks(batch, future))
+                rows += len(batch)
+                if rows >= self.commit_rows or self._encrypted.empty():
+                    break
+                item = self._encrypted.get_nowait()
+            if not chunks:
+                continue
+
+            if not await self._try_commit(chunks, COMMIT_ATTEMPTS):
+                # Find the failing records: commit one record at a time, in sequence order
+                chunks = [chunk for record in self._records(chunks) for chunk in await self._encrypt_one(record)]
+                for i, chunk in enumerate(chunks):
+                    chunks[i] = await self._commit_or_dead_letter(chunk)
+            self._chain([record for batch, result in chunks if not isinstance(result, Exception) for record in batch])
+
+    # (batch, encryption result) pairs of one encrypted batch; records that cannot be encrypted carry their error
+    async def _encrypted_chunks(self, batch, future):
+        try:
+            results = await future
+        except Exception:
+            # The worker itself failed; retry the records one at a time
+            chunks = []
+            for record in batch:
+                chunks.extend(await self._encrypt_one(record))
+            return chunks
+        if not any(isinstance(result, Exception) for result in results):
+            return [(batch, results)]
+        return [([record], result if isinstance(result, Exception) else [result]) for record, result in zip(batch, results)]
+
+    async def _encrypt_one(self, record):
+        try:
+            [result] = await self._loop.run_in_executor(self._executor, encrypt_rows, [record[1]])
+        except Exception as e:
+            result = e
+        return [([record], result if isinstance(result, Exception) else [result])]
+
+    @staticmethod
+    def _records(chunks):
+        return [record for batch, _ in chunks for record in batch]
+
+    async def _try_commit(self, chunks, attempts):
+        for attempt in range(attempts):
+            try:
+                await self._loop.run_in_executor(None, self._commit, chunks)
+                return True
+            except Exception as e:
+                # The transaction was rolled back; nothing later is written before these rows
+                records = self._records(chunks)
+                print(f"Error writing records {records[0][0]}-{records[-1][0]} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(COMMIT_RETRY_SECONDS)
+        return False
+
+    # Commit one record; if it keeps failing while its dead-letter row can be written, dead-letter it
+    async def _commit_or_dead_letter(self, chunk):
+        batch, result = chunk
+        while True:
+            if not isinstance(result, Exception):
+                if await self._try_commit([chunk], COMMIT_ATTEMPTS):
+                    return chunk
+                error = RuntimeError("The insert failed on every attempt.")
+            else:
+                error = result
+            # Succeeds only while the database is reachable, so an outage does not dead-letter good records
+            if await self._try_commit([(batch, error)], 1):
+                return (batch, error)
+
+    # Runs in a thread: one transaction for the rows, their ingest_log entries and the aggregates
+    def _commit(self, chunks):
+        seqs = [seq for batch, _ in chunks for seq, _ in batch]
+        # A row must never reach the database before it is durable in the queue
+        self.wal.wait_durable(seqs[-1])
+        aggregates = {}
+        dead = []
+        with db_session() as db:
+            cursor = db.cursor()
+            for batch, result in chunks:
+                if isinstance(result, Exception):
+                    dead.extend((seq, f"{type(result).__name__}: {result}") for seq, _ in batch)
+                    continue
+                cursor.executemany(insert_sql(self.packed, self.indexed), [encrypted_row for encrypted_row, _ in result])
+                for encrypted_row, contribution in result:
+                    accumulate(aggregates, self.public_key, encrypted_row[0], contribution, self.packed)
+            written = [(seq,) for batch, result in chunks if not isinstance(result, Exception) for seq, _ in batch]
+            cursor.executemany("INSERT INTO ingest_log (seq) VALUES (%s);", written)
+            # The error keeps the record out of replay and re-chaining; the row itself stays in the queue
+            cursor.executemany("INSERT INTO ingest_log (seq, error) VALUES (%s, %s);", dead)
+            flush_aggregates(cursor, self.public_key, aggregates)
+            db.commit()
+            cursor.close()
+        self.written += len(written)
+        self.dead_lettered += len(dead)
+        for seq, error in dead:
+            print(f"Record {seq} dead-lettered: {error}")
+
+    def _chain(self, records):
+        futures = [self.batcher.add(chain_record(seq, row)) for seq, row in records]
+        task = self._loop.create_task(self._record_seals([seq for seq, _ in records], futures))
+        self._seal_tasks.add(task)
+        task.add_done_callback(self._seal_tasks.discard)
+
+    async def _record_seals(self, seqs, futures):
+        try:
+            locations = [await asyncio.wrap_future(future) for future in futures]
+        except Exception as e:
+            # ingest_log keeps block_index NULL, so the next start chains these records again
+            print(f"Error chaining records {seqs[0]}-{seqs[-1]}: {e}")
+            return
+        await self._loop.run_in_executor(None, self._store_locations, seqs, locations)
+
+    def _store_locations(self, seqs, locations):
+        with db_session() as db:
+            cursor = db.cursor()
+            cursor.executemany(
+                "UPDATE ingest_log SET block_index = %s, leaf_index = %s WHERE seq = %s;",
+                [(block_index, leaf_index, seq) for seq, (block_index, leaf_index) in zip(seqs, locations)],
+            )
+            db.commit()
+            cursor.close()
+        self.sealed += len(seqs)
+
+    # ---- recovery ----------------------------------------------------------
+
+    async def _recover(self):
+        applied, unsealed = await self._loop.run_in_executor(None, self._applied_state)
+        if applied > self.wal.height:
+            raise RuntimeError(f"ingest_log has applied record {applied} but the queue only holds {self.wal.height}.")
+
+        # Applied but not chained: chain them first, unless a block already holds them
+        pending, found = [], []
+        for seq in unsealed:
+            row = self.wal.get(seq)["row"]
+            location = await self._loop.run_in_executor(None, self._sealed_location, chain_record(seq, row))
+            if location is None:
+                pending.append((seq, row))
+            else:
+                found.append((seq, location))
+        if found:
+            await self._loop.run_in_executor(None, self._store_locations, [seq for seq, _ in found], [location for _, location in found])
+        if pending:
+            self._chain(pending)
+
+        # Accepted but not applied: replay them ahead of any new record
+        for seq in range(applied + 1, self.wal.height + 1):
+            self._incoming.put_nowait((seq, self.wal.get(seq)["row"]))
+            self.replayed += 1
+        if pending or self.replayed:
+            print(f"Ingest recovery: {self.replayed} records replayed, {len(pending)} re-chained.")
+
+    def _applied_state(self):
+        with db_session() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT MAX(seq) FROM ingest_log;")
+            applied = cursor.fetchall()[0][0] or 0
+            cursor.execute("SELECT seq FROM ingest_log WHERE block_index IS NULL AND error IS NULL ORDER BY seq;")
+            unsealed = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+        return applied, unsealed
+
+    # Block and leaf of a record that was sealed before its ingest_log row was updated
+    def _sealed_location(self, record):
+        with db_session() as db:
+            cursor = db.cursor()
+            cursor.execute(
+                "SELECT block_index, leaf_index FROM block_records WHERE leaf_hash = %s;",
+                (leaf_hash(canonical_record(record)),),
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+        # Proof rows are written before their block, so only count rows whose block exists
+        return next((tuple(row) for row in rows if self.blockchain.get_block(row[0]) is not None), None)
+
+    def stats(self):
+        return {
+            "accepted": self.accepted,
+            "written": self.written,
+            "sealed": self.sealed,
+            "replayed": self.replayed,
+            "dead_lettered": self.dead_lettered,
+            "durable": self.wal.durable_height,
+            "batcher": self.batcher.stats(),
+        }
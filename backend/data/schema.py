@@ -0,0 +1,165 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import db_session
+from encryption.homomorphic import PACKED_FEATURES
+
+# Public keys referenced by the key_id of compact ciphertexts
+PAILLIER_KEYS_TABLE = """
+CREATE TABLE IF NOT EXISTS paillier_keys (
+    key_id BIGINT UNSIGNED PRIMARY KEY,
+    n TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Running per-disease sums, kept as one compact ciphertext in packed slot layout
+DISEASE_AGGREGATES_TABLE = """
+CREATE TABLE IF NOT EXISTS disease_aggregates (
+    Disease VARCHAR(255) PRIMARY KEY,
+    row_count BIGINT NOT NULL DEFAULT 0,
+    packed_count BIGINT NOT NULL DEFAULT 0,
+    slot_sums BLOB NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+"""
+
+# Records sealed into batch blocks, with the Merkle inclusion proof of each
+BLOCK_RECORDS_TABLE = """
+CREATE TABLE IF NOT EXISTS block_records (
+    block_index BIGINT NOT NULL,
+    leaf_index INT NOT NULL,
+    leaf_hash CHAR(64) NOT NULL,
+    record TEXT NOT NULL,
+    proof TEXT NOT NULL,
+    PRIMARY KEY (block_index, leaf_index),
+    INDEX idx_block_records_leaf_hash (leaf_hash)
+);
+"""
+
+# Queue positions of the patients applied by data.ingest_service, and the
+# batch block each was sealed into (NULL until it is)
+INGEST_LOG_TABLE = """
+CREATE TABLE IF NOT EXISTS ingest_log (
+    seq BIGINT PRIMARY KEY,
+    block_index BIGINT NULL,
+    leaf_index INT NULL,
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_ingest_log_block_index (block_index)
+);
+"""
+
+TABLES = [
+    PAILLIER_KEYS_TABLE,
+    DISEASE_AGGREGATES_TABLE,
+    BLOCK_RECORDS_TABLE,
+    INGEST_LOG_TABLE,
+]
+
+# Encrypted features of disease_data that get a search token column: all of them
+TOKEN_FEATURES = PACKED_FEATURES
+
+# (table, column, definition) of columns added to existing tables
+COLUMNS = [
+    # One ciphertext holding all eight features of a packed row; the
+    # per-feature columns are NULL for such rows
+    ("disease_data", "Packed_Features", "BLOB NULL"),
+    # Block creation time in epoch seconds, part of the block hash; NULL for
+    # blocks saved before it was persisted
+    ("blockchain", "timestamp", "BIGINT NULL"),
+    # Hex Ed25519 signature of the validator over the block hash
+    ("blockchain", "block_signature", "CHAR(128) NULL"),
+    # Hex Ed25519 public key of a validator (python blockchain/poa.py <user_id>)
+    ("users", "public_key", "CHAR(64) NULL"),
+    # Keyed equality token of each encrypted feature (encryption.search_index);
+    # NULL until an indexed insert or the rebuild writes it
+    *[("disease_data", f"{feature}_Token", "CHAR(32) NULL") for feature in TOKEN_FEATURES],
+    # Why data.ingest_service dead-lettered a queued record; NULL for applied records
+    ("ingest_log", "error", "TEXT NULL"),
+]
+
+# (table, column, source table, source column) of columns holding values copied from another table
+MATCHED_COLUMNS = [
+    # Keyed by the free-text Disease of disease_data, so it must be as wide
+    ("disease_aggregates", "Disease", "disease_data", "Disease"),
+]
+
+# (table, index name, column list) of indexes the on-demand lookups rely on
+INDEXES = [
+    # Chain tip (ORDER BY index_num DESC LIMIT 1) and get_block(index_num)
+    ("blockchain", "idx_blockchain_index_num", "index_num"),
+    # get_block_by_hash; a prefix covers the 64-character SHA-256 hex digest
+    ("blockchain", "idx_blockchain_hash", "hash(64)"),
+    # Equality and IN searches on the encrypted features
+    *[("disease_data", f"idx_disease_data_{feature.lower()}_token", f"{feature}_Token") for feature in TOKEN_FEATURES],
+]
+
+
+# Add a column unless the table already has it
+def ensure_column(cursor, table, column, definition):
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s;
+        """,
+        (table, column),
+    )
+    if cursor.fetchall()[0][0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition};")
+
+
+# Give a column the exact string type of another table's column, e.g. a key copied from it
+def match_column(cursor, table, column, source_table, source_column):
+    query = """
+        SELECT COLUMN_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s;
+    """
+    types = []
+    for name in ((source_table, source_column), (table, column)):
+        cursor.execute(query, name)
+        rows = cursor.fetchall()
+        column_type = rows[0][0] if rows else None
+        # Some connector versions return information_schema text as bytes
+        if isinstance(column_type, (bytes, bytearray)):
+            column_type = column_type.decode()
+        types.append(column_type)
+    source, current = types
+    # Only (VAR)CHAR types can be primary keys without a prefix length
+    if source and current and current != source and source.lower().startswith(("varchar", "char")):
+        cursor.execute(f"ALTER TABLE {table} MODIFY COLUMN {column} {source} NOT NULL;")
+
+
+# Add an index unless the table already has one led by the same column
+def ensure_index(cursor, table, name, columns):
+    leading = columns.split(",")[0].split("(")[0].strip()
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s AND SEQ_IN_INDEX = 1;
+        """,
+        (table, leading),
+    )
+    if cursor.fetchall()[0][0] == 0:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns});")
+
+
+# Create any tables, columns and indexes the backend needs that do not exist yet
+def ensure_schema(cursor):
+    for statement in TABLES:
+        cursor.execute(statement)
+    for table, column, definition in COLUMNS:
+        ensure_column(cursor, table, column, definition)
+    for table, column, source_table, source_column in MATCHED_COLUMNS:
+        match_column(cursor, table, column, source_table, source_column)
+    for table, name, columns in INDEXES:
+        ensure_index(cursor, table, name, columns)
+
+
+if __name__ == "__main__":
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        db.commit()
+        cursor.close()
+        print("Schema is up to date.")
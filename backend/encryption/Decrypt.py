@@ -1,10 +1,10 @@
 import sys
 import os
-import pickle  # Add pickle import to deserialize the encrypted values
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import mysql.connector
-from data.data_config import db_cred
-from encryption.homomorphic import generate_keys, decrypt_value, save_keys, load_keys  # Assuming these exist
+from data.data_config import db_session
+from encryption.homomorphic import generate_keys, decrypt_value, decrypt_packed, save_keys, load_keys  # Assuming these exist
+from encryption.codec import decode_ciphertext, register_key
 from phe import paillier
 
 # Check if keys exist, load or generate
@@ -17,36 +17,41 @@ def load_or_generate_keys():
         save_keys(public_key, private_key)  # Save the generated keys
     return public_key, private_key
 
-# Database connection
-db = db_cred()
-cursor = db.cursor()
-
 # Decrypt the data retrieved from MySQL
 def decrypt_data_from_db(public_key, private_key):
     print("Fetching and decrypting data from the database...")
 
     # Query to fetch the encrypted data from the database
     query = """
-    SELECT Disease, Gender, Fever, Cough, Fatigue, Difficulty_Breathing, Age, Blood_Pressure, Cholesterol_Level, Outcome_Variable
+    SELECT Disease, Gender, Fever, Cough, Fatigue, Difficulty_Breathing, Age, Blood_Pressure, Cholesterol_Level, Outcome_Variable, Packed_Features
     FROM disease_data LIMIT 5;
     """
-    cursor.execute(query)
-    rows = cursor.fetchall()
+    with db_session() as db:
+        cursor = db.cursor()
+        cursor.execute(query)
+        rows = cursor.fetchall()
+        cursor.close()
 
     decrypted_rows = []
 
     # Decrypt each row
     for row in rows:
+        if row[10] is not None:
+            # Packed row: decode and decrypt all eight features at once
+            decrypted_row = [row[0]] + decrypt_packed(private_key, decode_ciphertext(row[10])) + [row[9]]
+            decrypted_rows.append(decrypted_row)
+            continue
+
         decrypted_row = [
             row[0],  # Disease (no decryption)
-            decrypt_value(private_key, pickle.loads(row[1])),  # Deserialize and Decrypt Gender
-            decrypt_value(private_key, pickle.loads(row[2])),  # Deserialize and Decrypt Fever
-            decrypt_value(private_key, pickle.loads(row[3])),  # Deserialize and Decrypt Cough
-            decrypt_value(private_key, pickle.loads(row[4])),  # Deserialize and Decrypt Fatigue
-            decrypt_value(private_key, pickle.loads(row[5])),  # Deserialize and Decrypt Difficulty Breathing
-            int(decrypt_value(private_key, pickle.loads(row[6]))),  # Deserialize and Decrypt Age
-            decrypt_value(private_key, pickle.loads(row[7])),  # Deserialize and Decrypt Blood Pressure
-            decrypt_value(private_key, pickle.loads(row[8])),  # Deserialize and Decrypt Cholesterol Level
+            decrypt_value(private_key, decode_ciphertext(row[1])),  # Decode and Decrypt Gender
+            decrypt_value(private_key, decode_ciphertext(row[2])),  # Decode and Decrypt Fever
+            decrypt_value(private_key, decode_ciphertext(row[3])),  # Decode and Decrypt Cough
+            decrypt_value(private_key, decode_ciphertext(row[4])),  # Decode and Decrypt Fatigue
+            decrypt_value(private_key, decode_ciphertext(row[5])),  # Decode and Decrypt Difficulty Breathing
+            int(decrypt_value(private_key, decode_ciphertext(row[6]))),  # Decode and Decrypt Age
+            decrypt_value(private_key, decode_ciphertext(row[7])),  # Decode and Decrypt Blood Pressure
+            decrypt_value(private_key, decode_ciphertext(row[8])),  # Decode and Decrypt Cholesterol Level
             row[9]  # Outcome Variable (no decryption)
         ]
         decrypted_rows.append(decrypted_row)
@@ -59,6 +64,7 @@ def decrypt_data_from_db(public_key, private_key):
 def main():
     # Step 1: Load or generate keys
     public_key, private_key = load_or_generate_keys()
+    register_key(public_key)
 
     # Step 2: Decrypt data from the database
     decrypt_data_from_db(public_key, private_key)
@@ -66,7 +72,3 @@ def main():
 # Run the script
 if __name__ == '__main__':
     main()
-
-# Close the cursor and the database connection
-cursor.close()
-db.close()
@@ -0,0 +1,143 @@
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+from phe.util import powmod, mulmod
+from encryption.codec import raw_ciphertext
+from encryption.homomorphic import unpack_features, PACKED_FEATURES
+
+# Private key of the current worker process, set once by _init_worker
+_worker_private_key = None
+
+
+# Paillier decryption through the p/q CRT path of the private key
+def crt_decrypt(private_key, ciphertext):
+    """
+    Decrypts a raw ciphertext integer modulo p^2 and q^2 separately and
+    recombines the halves, which is what phe does inside decrypt() but
+    without building EncryptedNumber objects or re-checking the key.
+    Returns:
+        int: The raw (still encoded) plaintext.
+    """
+    decrypt_to_p = mulmod(
+        private_key.l_function(powmod(ciphertext, private_key.p - 1, private_key.psquare), private_key.p),
+        private_key.hp,
+        private_key.p,
+    )
+    decrypt_to_q = mulmod(
+        private_key.l_function(powmod(ciphertext, private_key.q - 1, private_key.qsquare), private_key.q),
+        private_key.hq,
+        private_key.q,
+    )
+    return private_key.crt(decrypt_to_p, decrypt_to_q)
+
+
+# Decrypt one stored cell (compact or legacy pickle) to a Python number
+def decrypt_cell(private_key, blob):
+    ciphertext, exponent = raw_ciphertext(blob)
+    encoding = crt_decrypt(private_key, ciphertext)
+    return paillier.EncodedNumber(private_key.public_key, encoding, exponent).decode()
+
+
+def _init_worker(private_key):
+    global _worker_private_key
+    _worker_private_key = private_key
+
+
+def _decrypt_chunk(blobs):
+    return [int(decrypt_cell(_worker_private_key, blob)) for blob in blobs]
+
+
+def _decrypt_packed_chunk(blobs):
+    return [unpack_features(decrypt_cell(_worker_private_key, blob)) for blob in blobs]
+
+
+def _chunks(values, chunk_size):
+    return [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+
+
+# Process pool that decrypts whole columns of stored ciphertexts
+class BulkDecryptor:
+    def __init__(self, private_key, workers=None, chunk_size=256):
+        """
+        Args:
+            private_key: The Paillier private key, sent once to every worker.
+            workers (int): Number of worker processes (defaults to the CPU count).
+            chunk_size (int): Number of cells handed to a worker at a time.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(private_key,)
+        )
+
+    def decrypt_column(self, blobs):
+        """Decrypt a column of single-value cells into an int64 array."""
+        blobs = list(blobs)
+        values = np.empty(len(blobs), dtype=np.int64)
+        position = 0
+        for chunk in self._executor.map(_decrypt_chunk, _chunks(blobs, self.chunk_size)):
+            values[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        return values
+
+    def decrypt_packed_column(self, blobs):
+        """Decrypt a column of packed cells into an (n, 8) int64 array in PACKED_FEATURES order."""
+        blobs = list(blobs)
+        values = np.empty((len(blobs), len(PACKED_FEATURES)), dtype=np.int64)
+        position = 0
+        for chunk in self._executor.map(_decrypt_packed_chunk, _chunks(blobs, self.chunk_size)):
+            values[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        return values
+
+    def decrypt_features(self, columns, packed_mask=None):
+        """
+        Decrypt the eight encrypted features of a batch of rows.
+        Args:
+            columns (dict): Feature name -> sequence of cells, plus a
+                "Packed_Features" sequence when packed_mask is given.
+            packed_mask: Boolean array marking the rows stored packed.
+        Returns:
+            dict: Feature name -> int64 array, one entry per row.
+        """
+        n_rows = len(columns[PACKED_FEATURES[0]])
+        if packed_mask is None:
+            packed_mask = np.zeros(n_rows, dtype=bool)
+        packed_mask = np.asarray(packed_mask, dtype=bool)
+        packed_cells = columns.get("Packed_Features")
+
+        result = {name: np.empty(n_rows, dtype=np.int64) for name in PACKED_FEATURES}
+        unpacked_rows = np.flatnonzero(~packed_mask)
+        if len(unpacked_rows):
+            # Decrypt all eight columns in one pass so the pool never drains between columns
+            cells = np.concatenate([np.asarray(columns[name], dtype=object)[unpacked_rows] for name in PACKED_FEATURES])
+            values = self.decrypt_column(cells).reshape(len(PACKED_FEATURES), len(unpacked_rows))
+            for j, name in enumerate(PACKED_FEATURES):
+                result[name][unpacked_rows] = values[j]
+
+        packed_rows = np.flatnonzero(packed_mask)
+        if len(packed_rows):
+            values = self.decrypt_packed_column(np.asarray(packed_cells, dtype=object)[packed_rows])
+            for j, name in enumerate(PACKED_FEATURES):
+                result[name][packed_rows] = values[:, j]
+        return result
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Decrypt the encrypted feature columns of a batch of rows in one call
+def decrypt_columns(private_key, columns, packed_mask=None, workers=None, chunk_size=256):
+    with BulkDecryptor(private_key, workers, chunk_size) as decryptor:
+        return decryptor.decrypt_features(columns, packed_mask)
@@ -0,0 +1,110 @@
+import sys
+import os
+import struct
+import pickle
+import hashlib
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from phe import paillier
+
+# Compact ciphertext layout:
+#   magic (2 bytes) | version (1) | flags (1) | key_id (8) | exponent (2, signed) | ciphertext
+# The ciphertext is stored big-endian at the fixed width of the key's n^2,
+# so every cell encrypted under the same key has the same size.
+MAGIC = b"PC"
+VERSION = 1
+HEADER = struct.Struct(">2sBBQh")
+
+# key_id -> PaillierPublicKey of every key seen by this process
+_keyring = {}
+# n -> key_id, so the id is hashed once per key
+_key_ids = {}
+
+
+# Stable 64-bit id derived from the modulus of a public key
+def key_id(public_key):
+    kid = _key_ids.get(public_key.n)
+    if kid is None:
+        digest = hashlib.sha256(str(public_key.n).encode()).digest()
+        kid = int.from_bytes(digest[:8], "big")
+        _key_ids[public_key.n] = kid
+        _keyring[kid] = public_key
+    return kid
+
+
+# Make a public key available to decode_ciphertext
+def register_key(public_key):
+    return key_id(public_key)
+
+
+# Persist a public key in the paillier_keys table so other processes can decode its cells
+def store_public_key(cursor, public_key):
+    cursor.execute(
+        "INSERT IGNORE INTO paillier_keys (key_id, n) VALUES (%s, %s);",
+        (key_id(public_key), str(public_key.n)),
+    )
+
+
+# Load every public key from the paillier_keys table into the keyring
+def load_keyring(cursor=None):
+    if cursor is None:
+        from data.data_config import db_session
+        with db_session() as db:
+            cursor = db.cursor()
+            load_keyring(cursor)
+            cursor.close()
+        return
+    cursor.execute("SELECT key_id, n FROM paillier_keys;")
+    for kid, n in cursor.fetchall():
+        public_key = paillier.PaillierPublicKey(int(n))
+        _key_ids[public_key.n] = int(kid)
+        _keyring[int(kid)] = public_key
+
+
+def is_compact(blob):
+    return bytes(blob[:2]) == MAGIC
+
+
+def _ciphertext_width(public_key):
+    return (public_key.nsquare.bit_length() + 7) // 8
+
+
+# Serialize an EncryptedNumber into the compact format
+def encode_ciphertext(encrypted_value, flags=0):
+    public_key = encrypted_value.public_key
+    header = HEADER.pack(MAGIC, VERSION, flags, key_id(public_key), encrypted_value.exponent)
+    ciphertext = encrypted_value.ciphertext(be_secure=False)
+    return header + ciphertext.to_bytes(_ciphertext_width(public_key), "big")
+
+
+# Split a compact cell into (key_id, ciphertext, exponent, flags) without building objects
+def unpack_ciphertext(blob):
+    magic, version, flags, kid, exponent = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a compact ciphertext.")
+    ciphertext = int.from_bytes(blob[HEADER.size:], "big")
+    return kid, ciphertext, exponent, flags
+
+
+# (ciphertext, exponent) of a cell in either format, without building an EncryptedNumber
+def raw_ciphertext(blob):
+    if is_compact(blob):
+        _, ciphertext, exponent, _ = unpack_ciphertext(blob)
+        return ciphertext, exponent
+    encrypted_value = pickle.loads(blob)
+    return encrypted_value.ciphertext(be_secure=False), encrypted_value.exponent
+
+
+# Deserialize a cell, accepting both the compact format and legacy pickles
+def decode_ciphertext(blob):
+    if not is_compact(blob):
+        return pickle.loads(blob)
+
+    kid, ciphertext, exponent, _ = unpack_ciphertext(blob)
+    public_key = _keyring.get(kid)
+    if public_key is None:
+        load_keyring()
+        public_key = _keyring.get(kid)
+        if public_key is None:
+            raise KeyError(f"Unknown Paillier key id {kid}.")
+    return paillier.EncryptedNumber(public_key, ciphertext, exponent)
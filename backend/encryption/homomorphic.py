@@ -1,5 +1,8 @@
 from phe import paillier
+from phe.util import powmod
 import pickle
+import threading
+from collections import deque
 
 # Generate public and private keys
 def generate_keys():
@@ -23,16 +26,178 @@ def load_keys(public_key_file="public_key.pkl", private_key_file="private_key.pk
     print("Keys loaded from disk.")
     return public_key, private_key
 
-# Encrypt a value
-def encrypt_value(public_key, value):
-    encrypted_value = public_key.encrypt(value)
+# Load keys from disk, generating and saving a new pair if none exist
+def load_or_generate_keys(public_key_file="public_key.pkl", private_key_file="private_key.pkl"):
+    try:
+        public_key, private_key = load_keys(public_key_file, private_key_file)
+    except FileNotFoundError:
+        print("Keys not found, generating new keys...")
+        public_key, private_key = generate_keys()
+        save_keys(public_key, private_key, public_key_file, private_key_file)
+    return public_key, private_key
+
+# Pool of precomputed r^n mod n^2 obfuscators, refilled by a background thread
+class ObfuscatorPool:
+    def __init__(self, public_key, size=64, low_water=16):
+        """
+        Start filling the pool for the given public key.
+        Args:
+            public_key: The Paillier public key the obfuscators belong to.
+            size (int): Maximum number of obfuscators kept ready.
+            low_water (int): Refilling starts when the pool drops to this many.
+        """
+        self.public_key = public_key
+        self.size = size
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self._pool = deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._refill, daemon=True)
+        self._thread.start()
+
+    def _new_obfuscator(self):
+        r = self.public_key.get_random_lt_n()
+        return powmod(r, self.public_key.n, self.public_key.nsquare)
+
+    def _refill(self):
+        while True:
+            with self._condition:
+                while not self._stopped and len(self._pool) > self.low_water:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                missing = self.size - len(self._pool)
+            # Compute outside the lock so take() is never blocked by powmod
+            for _ in range(missing):
+                obfuscator = self._new_obfuscator()
+                with self._condition:
+                    if self._stopped:
+                        return
+                    self._pool.append(obfuscator)
+
+    def take(self):
+        """Return a ready obfuscator, computing one inline if the pool is empty."""
+        with self._condition:
+            if self._pool:
+                self.hits += 1
+                obfuscator = self._pool.popleft()
+                if len(self._pool) <= self.low_water:
+                    self._condition.notify()
+                return obfuscator
+            self.misses += 1
+            self._condition.notify()
+        return self._new_obfuscator()
+
+    def stats(self):
+        with self._condition:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "ready": len(self._pool),
+            }
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+
+# phe keeps whether a ciphertext is obfuscated in this name-mangled attribute
+_OBFUSCATED_FLAG = "_EncryptedNumber__is_obfuscated"
+
+# Mark a ciphertext randomised with a pooled obfuscator so phe does not obfuscate it again
+def _mark_obfuscated(encrypted_value):
+    # A phe without the flag only re-obfuscates on a secure ciphertext() read: slower, still correct
+    if hasattr(encrypted_value, _OBFUSCATED_FLAG):
+        setattr(encrypted_value, _OBFUSCATED_FLAG, True)
     return encrypted_value
 
+# Encrypt a value
+def encrypt_value(public_key, value, pool=None):
+    if pool is None:
+        encrypted_value = public_key.encrypt(value)
+        return encrypted_value
+
+    # Encrypt with r = 1 (no powmod) and apply a precomputed obfuscator
+    encoding = paillier.EncodedNumber.encode(public_key, value)
+    nude_ciphertext = public_key.raw_encrypt(encoding.encoding, r_value=1)
+    ciphertext = nude_ciphertext * pool.take() % public_key.nsquare
+    # The ciphertext is already randomised; stop phe from obfuscating it again
+    return _mark_obfuscated(paillier.EncryptedNumber(public_key, ciphertext, encoding.exponent))
+
 # Decrypt a value
 def decrypt_value(private_key, encrypted_value):
     decrypted_value = private_key.decrypt(encrypted_value)
     return decrypted_value
 
+# Packed rows: all eight features of a patient in one plaintext.
+# Every slot is SLOT_BITS wide, so summing packed ciphertexts adds slot by slot
+# without carries until a slot total reaches 2**SLOT_BITS. Blood pressure,
+# cholesterol and age also get one-hot indicator slots, so per-level counts stay
+# additive under homomorphic sums.
+PACKED_FEATURES = [
+    "Gender", "Fever", "Cough", "Fatigue",
+    "Difficulty_Breathing", "Age", "Blood_Pressure", "Cholesterol_Level"
+]
+SLOT_BITS = 32
+MAX_AGE = 127
+AGE_BIN_WIDTH = 10
+LEVELS = [1, 2, 3]
+PACKED_SLOTS = (
+    PACKED_FEATURES
+    + [f"Blood_Pressure={level}" for level in LEVELS]
+    + [f"Cholesterol_Level={level}" for level in LEVELS]
+    + [f"Age_bin={age_bin}" for age_bin in range(MAX_AGE // AGE_BIN_WIDTH + 1)]
+)
+_SLOT_MASK = (1 << SLOT_BITS) - 1
+_SLOT_INDEX = {name: i for i, name in enumerate(PACKED_SLOTS)}
+
+# Pack the eight mapped features of a row (in PACKED_FEATURES order) into one integer
+def pack_features(values):
+    values = [int(value) for value in values]
+    if len(values) != len(PACKED_FEATURES):
+        raise ValueError(f"Expected {len(PACKED_FEATURES)} features, got {len(values)}.")
+    if min(values) < 0 or max(values) > MAX_AGE:
+        raise ValueError("Packed features must be between 0 and 127.")
+
+    features = dict(zip(PACKED_FEATURES, values))
+    plaintext = indicator_slots(features["Blood_Pressure"], features["Cholesterol_Level"], features["Age"])
+    for i, slot in enumerate(values):
+        plaintext |= slot << (i * SLOT_BITS)
+    return plaintext
+
+# Only the one-hot indicator slots of a row, in packed slot layout; an age past MAX_AGE sets no bin
+def indicator_slots(blood_pressure, cholesterol_level, age):
+    blood_pressure, cholesterol_level, age = int(blood_pressure), int(cholesterol_level), int(age)
+    slots = [int(blood_pressure == level) for level in LEVELS]
+    slots += [int(cholesterol_level == level) for level in LEVELS]
+    slots += [int(age // AGE_BIN_WIDTH == age_bin) for age_bin in range(MAX_AGE // AGE_BIN_WIDTH + 1)]
+
+    plaintext = 0
+    for i, slot in enumerate(slots, len(PACKED_FEATURES)):
+        plaintext |= slot << (i * SLOT_BITS)
+    return plaintext
+
+# Split a packed (or summed packed) plaintext into {slot name: value}
+def unpack_slots(plaintext):
+    return {name: (plaintext >> (i * SLOT_BITS)) & _SLOT_MASK for i, name in enumerate(PACKED_SLOTS)}
+
+# Recover the eight features of a single packed row, in PACKED_FEATURES order
+def unpack_features(plaintext):
+    return [(plaintext >> (i * SLOT_BITS)) & _SLOT_MASK for i in range(len(PACKED_FEATURES))]
+
+# Encrypt a row's features as a single packed ciphertext
+def encrypt_packed(public_key, values, pool=None):
+    return encrypt_value(public_key, pack_features(values), pool)
+
+# Decrypt a packed ciphertext back into the row's features
+def decrypt_packed(private_key, encrypted_value):
+    return unpack_features(decrypt_value(private_key, encrypted_value))
+
 #test purposes
 # Perform a homomorphic operation (e.g., addition) on encrypted data
 def homomorphic_addition(encrypted_value1, encrypted_value2, public_key):
@@ -0,0 +1,83 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from data.data_config import db_session
+from data.schema import ensure_schema
+from encryption.codec import decode_ciphertext, encode_ciphertext, is_compact, store_public_key
+from encryption.homomorphic import PACKED_FEATURES
+
+# The per-feature ciphertext columns of disease_data
+ENCRYPTED_COLUMNS = PACKED_FEATURES
+
+
+# Rewrite pickled ciphertexts in disease_data into the compact format
+def migrate_to_compact(batch_size=500):
+    """
+    Walks disease_data in id order and rewrites every row that still holds
+    pickled ciphertexts. Each batch is committed on its own, so the migration
+    can be interrupted and started again.
+    Args:
+        batch_size (int): Number of rows read, rewritten and committed at a time.
+    Returns:
+        int: Number of rows rewritten.
+    """
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        db.commit()
+
+        columns = ", ".join(ENCRYPTED_COLUMNS)
+        select_sql = f"SELECT id, {columns} FROM disease_data WHERE id > %s ORDER BY id LIMIT %s;"
+        update_sql = "UPDATE disease_data SET " + ", ".join(f"{col} = %s" for col in ENCRYPTED_COLUMNS) + " WHERE id = %s;"
+
+        last_id = 0
+        migrated = 0
+        stored_keys = set()
+        start = time.perf_counter()
+
+        while True:
+            cursor.execute(select_sql, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for row in rows:
+                cells = row[1:]
+                if all(cell is None or is_compact(cell) for cell in cells):
+                    continue
+                encoded = []
+                for cell in cells:
+                    if cell is None or is_compact(cell):
+                        encoded.append(cell)
+                        continue
+                    encrypted_value = decode_ciphertext(cell)
+                    if encrypted_value.public_key.n not in stored_keys:
+                        store_public_key(cursor, encrypted_value.public_key)
+                        stored_keys.add(encrypted_value.public_key.n)
+                    encoded.append(encode_ciphertext(encrypted_value))
+                updates.append(tuple(encoded) + (row[0],))
+
+            if updates:
+                cursor.executemany(update_sql, updates)
+                migrated += len(updates)
+            db.commit()
+            print(f"Migrated {migrated} rows (up to id {last_id}).")
+
+        elapsed = time.perf_counter() - start
+        cursor.close()
+        print(f"Migration finished: {migrated} rows in {elapsed:.2f}s.")
+        return migrated
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rewrite pickled ciphertexts in disease_data into the compact format.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    migrate_to_compact(args.batch_size)
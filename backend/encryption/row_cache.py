@@ -0,0 +1,167 @@
+import os
+import sys
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from encryption.homomorphic import PACKED_FEATURES, unpack_features
+from encryption.bulk import decrypt_cell
+from config import ROW_CACHE_BYTES, ROW_CACHE_ENCRYPT
+
+# The eight decrypted feature codes of a row, as stored in a cache entry
+FEATURES = struct.Struct(f">{len(PACKED_FEATURES)}q")
+# Estimated bytes of an entry beyond its payload and digest (dict slot, tuple, object headers)
+ENTRY_OVERHEAD = 200
+# AES-GCM nonce length of encrypted entries
+NONCE_BYTES = 12
+
+
+# Digest of a row's ciphertext cells; any rewrite of a cell changes it
+def row_digest(cells):
+    digest = hashlib.blake2b(digest_size=16)
+    for cell in cells:
+        if cell is None:
+            digest.update(b"\x00")
+        else:
+            digest.update(b"\x01" + len(cell).to_bytes(4, "big") + bytes(cell))
+    return digest.digest()
+
+
+class DecryptedRowCache:
+    def __init__(self, budget_bytes=ROW_CACHE_BYTES, encrypt_at_rest=ROW_CACHE_ENCRYPT):
+        """
+        Decrypted feature codes of disease_data rows, keyed by row id and the
+        digest of the row's ciphertexts, so a row whose cells were rewritten
+        is decrypted again instead of being served stale. Least recently
+        used rows are evicted once the estimated size passes budget_bytes.
+        With encrypt_at_rest, entries are sealed with AES-GCM under a key
+        that exists only in this process, bound to their row id and digest.
+        Args:
+            budget_bytes (int): Memory budget of the entries.
+            encrypt_at_rest (bool): Keep the decrypted values encrypted in memory.
+        """
+        self.budget = budget_bytes
+        self.encrypt_at_rest = encrypt_at_rest
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.decryptions = 0
+        self._entries = OrderedDict()  # row id -> (digest, payload)
+        self._aead = AESGCM(AESGCM.generate_key(bit_length=256)) if encrypt_at_rest else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_size(digest, payload):
+        return len(digest) + len(payload) + ENTRY_OVERHEAD
+
+    def _seal(self, row_id, digest, features):
+        plaintext = FEATURES.pack(*features)
+        if self._aead is None:
+            return plaintext
+        nonce = os.urandom(NONCE_BYTES)
+        return nonce + self._aead.encrypt(nonce, plaintext, row_id.to_bytes(8, "big") + digest)
+
+    def _open(self, row_id, digest, payload):
+        if self._aead is not None:
+            payload = self._aead.decrypt(payload[:NONCE_BYTES], payload[NONCE_BYTES:], row_id.to_bytes(8, "big") + digest)
+        return list(FEATURES.unpack(payload))
+
+    def get(self, row_id, digest):
+        """Cached feature codes of a row, or None if absent or cached for other ciphertexts."""
+        with self._lock:
+            entry = self._entries.get(row_id)
+            if entry is None or entry[0] != digest:
+                if entry is not None:
+                    self._drop(row_id)
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(row_id)
+            self.hits += 1
+        return self._open(row_id, digest, entry[1])
+
+    def put(self, row_id, digest, features):
+        payload = self._seal(row_id, digest, features)
+        size = self._entry_size(digest, payload)
+        if size > self.budget:
+            return
+        with self._lock:
+            if row_id in self._entries:
+                self._drop(row_id)
+            self._entries[row_id] = (digest, payload)
+            self.size += size
+            while self.size > self.budget:
+                _, (old_digest, old_payload) = self._entries.popitem(last=False)
+                self.size -= self._entry_size(old_digest, old_payload)
+                self.evictions += 1
+
+    # Remove one entry; called with the lock held
+    def _drop(self, row_id):
+        digest, payload = self._entries.pop(row_id)
+        self.size -= self._entry_size(digest, payload)
+
+    def invalidate(self, row_id=None):
+        """Forget one row (after updating it), or every row when row_id is None."""
+        with self._lock:
+            if row_id is None:
+                self._entries.clear()
+                self.size = 0
+            elif row_id in self._entries:
+                self._drop(row_id)
+                self.invalidations += 1
+
+    def features(self, private_key, row_id, cells, packed_cell=None):
+        """
+        Feature codes of one row, decrypting only on a cache miss.
+        Args:
+            private_key: The Paillier private key.
+            row_id (int): disease_data id of the row.
+            cells (sequence): The eight per-feature cells (None for packed rows).
+            packed_cell: The Packed_Features cell, or None.
+        Returns:
+            list: Eight feature codes in PACKED_FEATURES order.
+        """
+        digest = row_digest(list(cells) + [packed_cell])
+        features = self.get(row_id, digest)
+        if features is not None:
+            return features
+        if packed_cell is not None:
+            # Packed row: one decryption for all eight features
+            features = unpack_features(decrypt_cell(private_key, packed_cell))
+            decryptions = 1
+        else:
+            features = [int(decrypt_cell(private_key, cell)) for cell in cells]
+            decryptions = len(features)
+        with self._lock:
+            self.decryptions += decryptions
+        self.put(row_id, digest, features)
+        return features
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "decryptions": self.decryptions,
+                "encrypted": self.encrypt_at_rest,
+            }
+
+
+# The process-wide cache shared by every records view
+@lru_cache(maxsize=None)
+def get_row_cache():
+    return DecryptedRowCache()
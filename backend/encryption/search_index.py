@@ -0,0 +1,232 @@
+import sys
+import os
+import hmac
+import time
+import hashlib
+import secrets
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from encryption.homomorphic import PACKED_FEATURES, unpack_features
+from encryption.bulk import BulkDecryptor, decrypt_cell
+from feature_codec import encode_value, decode_frame
+
+# Secret key of the equality tokens, kept next to the Paillier key files
+INDEX_KEY_FILE = "search_index_key.bin"
+# Hex characters kept of each HMAC-SHA256 token (128 bits)
+TOKEN_LENGTH = 32
+# disease_data column holding the token of each encrypted feature
+TOKEN_COLUMNS = {feature: f"{feature}_Token" for feature in PACKED_FEATURES}
+# Plaintext columns a search may also filter on, compared as they are
+PLAIN_COLUMNS = ["Disease", "Outcome_Variable"]
+# Columns a search returns; the features are decrypted, Disease and Outcome_Variable are plaintext
+RESULT_COLUMNS = ["id", "Disease"] + PACKED_FEATURES + ["Outcome_Variable", "Packed_Features"]
+
+
+def load_or_generate_index_key(path=INDEX_KEY_FILE):
+    """
+    Load the token key, creating a random 256-bit key readable only by its
+    owner on first use. Whoever holds it can test a column for any value,
+    so it is guarded like the Paillier private key.
+    """
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        key = secrets.token_bytes(32)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(key)
+        return key
+
+
+# Deterministic token of one feature code; the feature name keeps equal codes of different columns apart
+def token(key, feature, code):
+    return hmac.new(key, f"{feature}:{int(code)}".encode(), hashlib.sha256).hexdigest()[:TOKEN_LENGTH]
+
+
+# Tokens of a row's eight feature codes, in PACKED_FEATURES order
+def row_tokens(key, codes):
+    return tuple(token(key, feature, code) for feature, code in zip(PACKED_FEATURES, codes))
+
+
+def condition_tokens(key, conditions):
+    """
+    Turn label conditions into token lists.
+    Args:
+        key (bytes): The token key.
+        conditions (dict): Feature name -> label, or list of labels for an IN.
+    Returns:
+        dict: Token column -> list of tokens.
+    Raises:
+        ValueError: If a feature is not encrypted or a label has no mapping.
+    """
+    tokens = {}
+    for feature, labels in conditions.items():
+        if feature not in TOKEN_COLUMNS:
+            raise ValueError(f"{feature} is not an encrypted feature.")
+        if not isinstance(labels, (list, tuple, set)):
+            labels = [labels]
+        codes = []
+        for label in labels:
+            code = encode_value(feature, label)
+            if code is None:
+                raise ValueError(f"{label!r} is not a value of {feature}.")
+            codes.append(code)
+        tokens[TOKEN_COLUMNS[feature]] = [token(key, feature, code) for code in codes]
+    return tokens
+
+
+# WHERE clause and parameters matching every condition; ANDed across columns, ORed within one
+def _where(key, conditions):
+    empty = [column for column, labels in conditions.items() if isinstance(labels, (list, tuple, set)) and not labels]
+    if empty:
+        raise ValueError(f"No values given for: {', '.join(empty)}")
+    plain = {column: labels for column, labels in conditions.items() if column in PLAIN_COLUMNS}
+    encrypted = {feature: labels for feature, labels in conditions.items() if feature not in PLAIN_COLUMNS}
+    columns = {
+        column: list(labels) if isinstance(labels, (list, tuple, set)) else [labels]
+        for column, labels in plain.items()
+    }
+    columns.update(condition_tokens(key, encrypted))
+    clauses, params = [], []
+    for column, values in columns.items():
+        clauses.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+        params.extend(values)
+    return " AND ".join(clauses), params
+
+
+# True when no row is missing a token, so an indexed search cannot miss rows
+def index_complete(cursor):
+    for column in TOKEN_COLUMNS.values():
+        cursor.execute(f"SELECT 1 FROM disease_data WHERE {column} IS NULL LIMIT 1;")
+        if cursor.fetchall():
+            return False
+    return True
+
+
+def find_patients(cursor, private_key, key, conditions, limit=None):
+    """
+    Equality search over the encrypted features (and optionally Disease or
+    Outcome_Variable), e.g. {"Fever": "Yes", "Blood_Pressure": ["High", "Normal"]}.
+    The token indexes select the matching rows in SQL and only those rows
+    are decrypted.
+    Args:
+        cursor: Database cursor.
+        private_key: The Paillier private key.
+        key (bytes): The token key.
+        conditions (dict): Feature name -> label or list of labels.
+        limit (int): Largest number of rows returned.
+    Returns:
+        DataFrame: The matching rows with their features decoded to labels.
+    Raises:
+        ValueError: If there are no conditions, or a condition has no labels.
+        RuntimeError: If some rows have no tokens yet (run the rebuild).
+    """
+    if not conditions:
+        raise ValueError("At least one condition is required.")
+    where, params = _where(key, conditions)
+    if not index_complete(cursor):
+        raise RuntimeError("The search index is incomplete; run python encryption/search_index.py --rebuild first.")
+    sql = f"SELECT {', '.join(RESULT_COLUMNS)} FROM disease_data WHERE {where} ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    cursor.execute(sql + ";", params)
+
+    decrypted_rows = []
+    for row in cursor.fetchall():
+        if row[-1] is not None:
+            features = unpack_features(decrypt_cell(private_key, row[-1]))
+        else:
+            features = [int(decrypt_cell(private_key, cell)) for cell in row[2:10]]
+        decrypted_rows.append([row[0], row[1]] + list(features) + [row[10]])
+    decoded, _ = decode_frame(pd.DataFrame(decrypted_rows, columns=RESULT_COLUMNS[:-1]))
+    return decoded
+
+
+def rebuild_index(cursor, db, private_key, key, batch_size=500, workers=None, missing_only=True):
+    """
+    Writes the tokens of existing rows by decrypting their features, one
+    committed batch at a time in id order. With missing_only, only rows
+    lacking a token are visited, so an interrupted rebuild picks up where
+    it stopped; pass missing_only=False after replacing the token key.
+    Returns:
+        int: Number of rows updated.
+    """
+    columns = ", ".join(PACKED_FEATURES)
+    missing = " OR ".join(f"{column} IS NULL" for column in TOKEN_COLUMNS.values())
+    select_sql = f"SELECT id, {columns}, Packed_Features FROM disease_data WHERE id > %s"
+    if missing_only:
+        select_sql += f" AND ({missing})"
+    select_sql += " ORDER BY id LIMIT %s;"
+    update_sql = "UPDATE disease_data SET " + ", ".join(f"{column} = %s" for column in TOKEN_COLUMNS.values()) + " WHERE id = %s;"
+
+    last_id = 0
+    updated = 0
+    start = time.perf_counter()
+    with BulkDecryptor(private_key, workers) as decryptor:
+        while True:
+            cursor.execute(select_sql, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            cells = {feature: [row[1 + j] for row in rows] for j, feature in enumerate(PACKED_FEATURES)}
+            cells["Packed_Features"] = [row[-1] for row in rows]
+            packed_mask = np.array([row[-1] is not None for row in rows])
+            values = decryptor.decrypt_features(cells, packed_mask)
+            codes = np.column_stack([values[feature] for feature in PACKED_FEATURES])
+
+            cursor.executemany(update_sql, [row_tokens(key, codes[i]) + (row[0],) for i, row in enumerate(rows)])
+            db.commit()
+            updated += len(rows)
+            elapsed = time.perf_counter() - start
+            print(f"Indexed {updated} rows up to id {last_id} ({updated / elapsed:.1f} rows/sec).")
+    return updated
+
+
+# Parse "Feature=Label" or "Feature=Label1,Label2" arguments into conditions
+def parse_conditions(arguments):
+    conditions = {}
+    for argument in arguments:
+        feature, _, labels = argument.partition("=")
+        feature = feature.strip()
+        # Encrypted features are entered capitalized, as in main.add_patient
+        values = [label.strip() if feature in PLAIN_COLUMNS else label.strip().capitalize() for label in labels.split(",")]
+        conditions[feature] = values if len(values) > 1 else values[0]
+    return conditions
+
+
+if __name__ == "__main__":
+    import argparse
+    from data.data_config import db_session
+    from data.schema import ensure_schema
+    from encryption.homomorphic import load_keys
+
+    parser = argparse.ArgumentParser(description="Rebuild or query the equality token index of disease_data.")
+    parser.add_argument("conditions", nargs="*", help="Feature=Label or Feature=Label1,Label2, e.g. Fever=Yes Blood_Pressure=High")
+    parser.add_argument("--rebuild", action="store_true", help="Write the tokens of rows that have none.")
+    parser.add_argument("--all", action="store_true", help="With --rebuild, recompute every row (after a key change).")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    public_key, private_key = load_keys()
+    key = load_or_generate_index_key()
+    with db_session() as db:
+        cursor = db.cursor()
+        ensure_schema(cursor)
+        db.commit()
+        if args.rebuild:
+            rebuild_index(cursor, db, private_key, key, args.batch_size, args.workers, missing_only=not args.all)
+        if args.conditions:
+            start = time.perf_counter()
+            matches = find_patients(cursor, private_key, key, parse_conditions(args.conditions), args.limit)
+            print(matches.rename(columns=lambda col: col.replace("_", " ")).to_string(index=False))
+            print(f"{len(matches)} rows in {(time.perf_counter() - start) * 1e3:.1f} ms.")
+        cursor.close()
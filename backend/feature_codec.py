@@ -0,0 +1,141 @@
+# feature_codec.py
+# Column-at-a-time encoding and decoding of the categorical features in mappings.py
+
+import numpy as np
+import pandas as pd
+
+from encryption.homomorphic import MAX_AGE
+from mappings import (
+    GENDER_MAP, FEVER_MAP, COUGH_MAP, FATIGUE_MAP,
+    DIFFICULTY_BREATHING_MAP, BLOOD_PRESSURE_MAP, CHOLESTEROL_LEVEL_MAP
+)
+
+# Label -> code mapping of every categorical feature
+CATEGORICAL_MAPS = {
+    "Gender": GENDER_MAP,
+    "Fever": FEVER_MAP,
+    "Cough": COUGH_MAP,
+    "Fatigue": FATIGUE_MAP,
+    "Difficulty_Breathing": DIFFICULTY_BREATHING_MAP,
+    "Blood_Pressure": BLOOD_PRESSURE_MAP,
+    "Cholesterol_Level": CHOLESTEROL_LEVEL_MAP,
+}
+
+# Features stored as plain integers, with their inclusive valid range;
+# packed rows cannot hold values outside it
+NUMERIC_FEATURES = {"Age": (0, MAX_AGE)}
+
+# Column layout of the dataset CSV
+CSV_COLUMNS = [
+    "Disease", "Gender", "Fever", "Cough", "Fatigue",
+    "Difficulty_Breathing", "Age", "Blood_Pressure", "Cholesterol_Level", "Outcome_Variable"
+]
+
+
+class _Lookup:
+    def __init__(self, mapping):
+        # Encoding: position of the label in `labels` -> its code
+        self.labels = pd.Index(list(mapping))
+        self.codes = np.array([mapping[label] for label in self.labels], dtype=np.int64)
+        # Decoding: code -> label, indexed directly by the code
+        self.decode_table = np.empty(int(self.codes.max()) + 1, dtype=object)
+        self.known_codes = np.zeros(len(self.decode_table), dtype=bool)
+        for label, code in mapping.items():
+            self.decode_table[code] = label
+            self.known_codes[code] = True
+
+
+_LOOKUPS = {name: _Lookup(mapping) for name, mapping in CATEGORICAL_MAPS.items()}
+
+
+# Parse a column as integers; returns (int64 array, bool array of unparseable values)
+def _to_int(values):
+    array = np.asarray(values)
+    if array.dtype.kind in "iub":
+        return array.astype(np.int64), np.zeros(len(array), dtype=bool)
+    if array.dtype.kind in "OUS":
+        try:
+            # Fast path: every value is an integer or an integer string
+            return array.astype(np.int64), np.zeros(len(array), dtype=bool)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    numbers = pd.to_numeric(pd.Series(array, copy=False), errors="coerce").to_numpy(dtype=np.float64)
+    invalid = np.isnan(numbers) | (numbers != np.round(numbers))
+    return np.where(invalid, 0, numbers).astype(np.int64), invalid
+
+
+def encode_column(name, values):
+    """
+    Encodes a whole column of labels.
+    Args:
+        name (str): A key of CATEGORICAL_MAPS, or a NUMERIC_FEATURES name.
+        values: Array-like of labels (or numbers for numeric features).
+    Returns:
+        tuple: (int64 array of codes, bool array marking values with no mapping).
+            Numbers outside their NUMERIC_FEATURES range are masked too.
+            Codes at masked positions are 0.
+    """
+    if name in NUMERIC_FEATURES:
+        numbers, invalid = _to_int(values)
+        low, high = NUMERIC_FEATURES[name]
+        invalid |= (numbers < low) | (numbers > high)
+        return np.where(invalid, 0, numbers), invalid
+
+    lookup = _LOOKUPS[name]
+    # Hash lookup of every value at once; -1 where the label is unknown
+    positions = lookup.labels.get_indexer(pd.Index(values, copy=False))
+    unknown = positions < 0
+    return np.where(unknown, 0, lookup.codes[positions]), unknown
+
+
+def decode_column(name, codes):
+    """
+    Decodes a whole column of codes back to labels.
+    Returns:
+        tuple: (object array of labels, bool array marking codes with no label).
+            Values with no label are passed through unchanged.
+    """
+    codes = np.asarray(codes)
+    if name in NUMERIC_FEATURES:
+        return codes, np.zeros(len(codes), dtype=bool)
+
+    lookup = _LOOKUPS[name]
+    as_int, invalid = _to_int(codes)
+    in_range = ~invalid & (as_int >= 0) & (as_int < len(lookup.decode_table))
+    index = np.where(in_range, as_int, 0)
+    known = in_range & lookup.known_codes[index]
+    labels = np.where(known, lookup.decode_table[index], codes.astype(object))
+    return labels, ~known
+
+
+def encode_frame(df, columns=None):
+    """
+    Encodes every feature column present in df.
+    Args:
+        df (DataFrame): Rows with label values.
+        columns (list): Columns to encode; defaults to every known feature in df.
+    Returns:
+        tuple: (encoded copy of df, DataFrame of per-column unknown masks).
+    """
+    columns = columns or [col for col in df.columns if col in _LOOKUPS or col in NUMERIC_FEATURES]
+    encoded = df.copy()
+    unknown = pd.DataFrame(index=df.index)
+    for col in columns:
+        encoded[col], unknown[col] = encode_column(col, df[col].array)
+    return encoded, unknown
+
+
+def decode_frame(df, columns=None):
+    """Inverse of encode_frame; returns (decoded copy of df, per-column unknown masks)."""
+    columns = columns or [col for col in df.columns if col in _LOOKUPS]
+    decoded = df.copy()
+    unknown = pd.DataFrame(index=df.index)
+    for col in columns:
+        decoded[col], unknown[col] = decode_column(col, df[col].array)
+    return decoded, unknown
+
+
+# Encodes a single value, returning None when it has no mapping
+def encode_value(name, value):
+    codes, unknown = encode_column(name, [value])
+    return None if unknown[0] else int(codes[0])
@@ -1,8 +1,12 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash
 from flask_mysqldb import MySQL
 from werkzeug.security import check_password_hash
+import sys
 import os
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from predictionPageQ.predict import prediction_bp
+
 app = Flask(__name__)
 
 # Secret key for session management
@@ -17,6 +21,9 @@ app.config['MYSQL_DB'] = 'patient_record'
 # Initialize MySQL
 mysql = MySQL(app)
 
+# Prediction endpoints, served through the micro-batcher
+app.register_blueprint(prediction_bp)
+
 @app.route('/login', methods=['GET'])
 def login_page():
     return render_template('login.html')
@@ -2,43 +2,39 @@ import hashlib
 from getpass import getpass
 import sys
 import os
-import pickle
-import joblib
+from functools import lru_cache
 import pandas as pd
-from sklearn.exceptions import NotFittedError
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from data.data_config import db_cred
-from encryption.homomorphic import encrypt_value, generate_keys, decrypt_value, save_keys, load_keys
-from ml_model.ml_pipeline import fetch_encrypted_data, decrypt_dataframe_for_prediction, store_predictions_in_db
+from data.data_config import db_session
+from data.schema import ensure_schema
+from encryption.homomorphic import encrypt_value, generate_keys, save_keys, load_keys, ObfuscatorPool, encrypt_packed, PACKED_FEATURES
+from encryption.codec import encode_ciphertext, register_key, store_public_key
+from analytics.materialized import update_aggregates
+from ml_model.ml_pipeline import run_streaming_predictions, has_artifacts
 from blockchain.chain import Blockchain
-from mappings import GENDER_MAP, FEVER_MAP, COUGH_MAP, FATIGUE_MAP, DIFFICULTY_BREATHING_MAP, BLOOD_PRESSURE_MAP, CHOLESTEROL_LEVEL_MAP
-
-# Paths for model and preprocessor
-preprocessor_path = "/home/tsoien/github/newML/backend/ml_model/preprocessor.joblib"
-model_path = "/home/tsoien/github/newML/backend/ml_model/model.joblib"
-
-# Load Preprocessor and Model
-try:
-    preprocessor = joblib.load(preprocessor_path)
-    print("Preprocessor loaded successfully.")
-except Exception as e:
-    print(f"Error loading preprocessor: {e}")
-    preprocessor = None
-
-try:
-    model = joblib.load(model_path)
-    print("Model loaded successfully.")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
-
-if preprocessor is None or model is None:
-    print("Error: Preprocessor or model not loaded. Exiting...")
-    sys.exit(1)
-
-# Initialize Blockchain
-blockchain = Blockchain()
+from blockchain.batcher import BlockBatcher
+from data.ingest import insert_sql
+from data.ingest_service import IngestService
+from encryption.search_index import load_or_generate_index_key, row_tokens
+from encryption.row_cache import get_row_cache
+from config import PACKED_ROWS, BLOCKCHAIN_BATCHED, INGEST_ASYNC, SEARCH_INDEX
+from feature_codec import encode_frame, decode_frame
+
+# Initialize Blockchain on first use, not at import
+@lru_cache(maxsize=None)
+def get_blockchain():
+    return Blockchain()
+
+# One batcher per validator; records are sealed into Merkle-root blocks
+@lru_cache(maxsize=None)
+def get_block_batcher(validator_name, signature):
+    return BlockBatcher(get_blockchain(), validator_name, signature)
+
+# One ingestion service per validator; started (and recovered) on first use
+@lru_cache(maxsize=None)
+def get_ingest_service(validator_name, signature):
+    return IngestService(get_blockchain(), validator_name, signature).start()
 
 # User login function
 def user_login(cursor):
@@ -58,62 +54,27 @@ def user_login(cursor):
         else:
             print("Invalid credentials. Please try again.")
 
-# Reverse mapping for decryption
-def reverse_mapping(row):
-    GENDER_MAP = {1: "Male", 2: "Female"}
-    FEVER_MAP = {1: "Yes", 0: "No"}
-    COUGH_MAP = {1: "Yes", 0: "No"}
-    FATIGUE_MAP = {1: "Yes", 0: "No"}
-    DIFFICULTY_BREATHING_MAP = {1: "Yes", 0: "No"}
-    BLOOD_PRESSURE_MAP = {1: "Low", 2: "Normal", 3: "High"}
-    CHOLESTEROL_LEVEL_MAP = {1: "Low", 2: "Normal", 3: "High"}
-
-    decrypted_row = [
-        row[0],  # Disease
-        GENDER_MAP.get(row[1], row[1]),
-        FEVER_MAP.get(row[2], row[2]),
-        COUGH_MAP.get(row[3], row[3]),
-        FATIGUE_MAP.get(row[4], row[4]),
-        DIFFICULTY_BREATHING_MAP.get(row[5], row[5]),
-        row[6],  # Age
-        BLOOD_PRESSURE_MAP.get(row[7], row[7]),
-        CHOLESTEROL_LEVEL_MAP.get(row[8], row[8])
-    ]
-
-    return decrypted_row
-
 # Decrypt data from the database
-def decrypt_data_from_db(public_key, private_key, cursor):
+def decrypt_data_from_db(public_key, private_key, cursor, row_cache=None):
     print("\nFetching and decrypting data from the database...")
 
     query = """
-    SELECT Disease, Gender, Fever, Cough, Fatigue, Difficulty_Breathing, Age, Blood_Pressure, Cholesterol_Level, Prediction_Variable
-    FROM disease_data LIMIT 5;
+    SELECT id, Disease, Gender, Fever, Cough, Fatigue, Difficulty_Breathing, Age, Blood_Pressure, Cholesterol_Level, Prediction_Variable, Packed_Features
+    FROM disease_data ORDER BY id LIMIT 5;
     """
     cursor.execute(query)
     rows = cursor.fetchall()
 
-    decrypted_rows = []
-
-    for row in rows:
-        decrypted_row = [
-            row[0],
-            decrypt_value(private_key, pickle.loads(row[1])),
-            decrypt_value(private_key, pickle.loads(row[2])),
-            decrypt_value(private_key, pickle.loads(row[3])),
-            decrypt_value(private_key, pickle.loads(row[4])),
-            decrypt_value(private_key, pickle.loads(row[5])),
-            int(decrypt_value(private_key, pickle.loads(row[6]))),
-            decrypt_value(private_key, pickle.loads(row[7])),
-            decrypt_value(private_key, pickle.loads(row[8]))
-        ]
-
-        mapped_row = reverse_mapping(decrypted_row)
-        decrypted_rows.append(mapped_row)
+    # Rows seen before are served from the cache without any Paillier decryption
+    row_cache = row_cache or get_row_cache()
+    decrypted_rows = [
+        [row[1]] + row_cache.features(private_key, row[0], row[2:10], row[11])
+        for row in rows
+    ]
 
-    print(pd.DataFrame(decrypted_rows, columns=[
-        "Disease", "Gender", "Fever", "Cough", "Fatigue", "Difficulty Breathing", "Age", "Blood Pressure", "Cholesterol Level"
-    ]))
+    # Map the codes back to their labels one column at a time
+    decoded, _ = decode_frame(pd.DataFrame(decrypted_rows, columns=["Disease"] + PACKED_FEATURES))
+    print(decoded.rename(columns=lambda col: col.replace("_", " ")))
 
 # Load or generate encryption keys
 def load_or_generate_keys():
@@ -126,7 +87,7 @@ def load_or_generate_keys():
     return public_key, private_key
 
 # Add patient function
-def add_patient(cursor, connection, public_key, validator_name, signature):
+def add_patient(cursor, connection, public_key, validator_name, signature, obfuscator_pool=None, packed=PACKED_ROWS, index_key=None):
     print("\nAdding a new patient...")
 
     # Get user inputs
@@ -142,43 +103,82 @@ def add_patient(cursor, connection, public_key, validator_name, signature):
     outcome_variable = input("Outcome Variable (Positive/Negative): ").capitalize()
 
     # Map inputs to numerical values
-    gender = GENDER_MAP.get(gender)
-    fever = FEVER_MAP.get(fever)
-    cough = COUGH_MAP.get(cough)
-    fatigue = FATIGUE_MAP.get(fatigue)
-    difficulty_breathing = DIFFICULTY_BREATHING_MAP.get(difficulty_breathing)
-    blood_pressure = BLOOD_PRESSURE_MAP.get(blood_pressure)
-    cholesterol_level = CHOLESTEROL_LEVEL_MAP.get(cholesterol_level)
-
-    # Encrypt the mapped inputs
-    encrypted_gender = pickle.dumps(encrypt_value(public_key, gender))
-    encrypted_fever = pickle.dumps(encrypt_value(public_key, fever))
-    encrypted_cough = pickle.dumps(encrypt_value(public_key, cough))
-    encrypted_fatigue = pickle.dumps(encrypt_value(public_key, fatigue))
-    encrypted_difficulty_breathing = pickle.dumps(encrypt_value(public_key, difficulty_breathing))
-    encrypted_age = pickle.dumps(encrypt_value(public_key, age))
-    encrypted_blood_pressure = pickle.dumps(encrypt_value(public_key, blood_pressure))
-    encrypted_cholesterol_level = pickle.dumps(encrypt_value(public_key, cholesterol_level))
-
-    # Insert the encrypted data into the database
-    cursor.execute(
-        """
-        INSERT INTO disease_data (Disease, Gender, Fever, Cough, Fatigue, Difficulty_Breathing, Age, Blood_Pressure, Cholesterol_Level, Outcome_Variable)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """,
-        (
-            disease,
-            encrypted_gender,
-            encrypted_fever,
-            encrypted_cough,
-            encrypted_fatigue,
-            encrypted_difficulty_breathing,
-            encrypted_age,
-            encrypted_blood_pressure,
-            encrypted_cholesterol_level,
-            outcome_variable,
-        ),
+    encoded, unknown = encode_frame(pd.DataFrame([[
+        gender, fever, cough, fatigue, difficulty_breathing, age, blood_pressure, cholesterol_level
+    ]], columns=PACKED_FEATURES))
+    invalid = [col for col in PACKED_FEATURES if unknown[col].iloc[0]]
+    if invalid:
+        print(f"Invalid value for: {', '.join(invalid)}. Patient not added.")
+        return
+
+    if INGEST_ASYNC:
+        # Durably queued here; encryption, the insert and the block follow in the background
+        seq = get_ingest_service(validator_name, signature).submit({
+            "Disease": disease,
+            "Gender": gender,
+            "Fever": fever,
+            "Cough": cough,
+            "Fatigue": fatigue,
+            "Difficulty_Breathing": difficulty_breathing,
+            "Age": age,
+            "Blood_Pressure": blood_pressure,
+            "Cholesterol_Level": cholesterol_level,
+            "Outcome_Variable": outcome_variable,
+        })
+        print(f"Patient queued as record {seq}; it is written and chained in the background.")
+        return
+
+    gender, fever, cough, fatigue, difficulty_breathing, age, blood_pressure, cholesterol_level = (
+        int(value) for value in encoded.iloc[0]
     )
+    # Search tokens of the features, stored next to their ciphertexts
+    tokens = row_tokens(index_key, [
+        gender, fever, cough, fatigue, difficulty_breathing, age, blood_pressure, cholesterol_level
+    ]) if index_key is not None else ()
+
+    if packed:
+        # Encrypt all eight features as one packed ciphertext
+        encrypted_features = encode_ciphertext(encrypt_packed(
+            public_key,
+            [gender, fever, cough, fatigue, difficulty_breathing, age, blood_pressure, cholesterol_level],
+            obfuscator_pool,
+        ))
+        cursor.execute(
+            insert_sql(packed=True, indexed=index_key is not None),
+            (disease, outcome_variable, encrypted_features) + tokens,
+        )
+        update_aggregates(cursor, public_key, disease, packed_cell=encrypted_features)
+    else:
+        # Encrypt the mapped inputs
+        encrypted_gender = encode_ciphertext(encrypt_value(public_key, gender, obfuscator_pool))
+        encrypted_fever = encode_ciphertext(encrypt_value(public_key, fever, obfuscator_pool))
+        encrypted_cough = encode_ciphertext(encrypt_value(public_key, cough, obfuscator_pool))
+        encrypted_fatigue = encode_ciphertext(encrypt_value(public_key, fatigue, obfuscator_pool))
+        encrypted_difficulty_breathing = encode_ciphertext(encrypt_value(public_key, difficulty_breathing, obfuscator_pool))
+        encrypted_age = encode_ciphertext(encrypt_value(public_key, age, obfuscator_pool))
+        encrypted_blood_pressure = encode_ciphertext(encrypt_value(public_key, blood_pressure, obfuscator_pool))
+        encrypted_cholesterol_level = encode_ciphertext(encrypt_value(public_key, cholesterol_level, obfuscator_pool))
+
+        # Insert the encrypted data into the database
+        cursor.execute(
+            insert_sql(indexed=index_key is not None),
+            (
+                disease,
+                encrypted_gender,
+                encrypted_fever,
+                encrypted_cough,
+                encrypted_fatigue,
+                encrypted_difficulty_breathing,
+                encrypted_age,
+                encrypted_blood_pressure,
+                encrypted_cholesterol_level,
+                outcome_variable,
+            ) + tokens,
+        )
+        update_aggregates(cursor, public_key, disease, feature_cells=[
+            encrypted_gender, encrypted_fever, encrypted_cough, encrypted_fatigue,
+            encrypted_difficulty_breathing, encrypted_age, encrypted_blood_pressure, encrypted_cholesterol_level,
+        ], features=[gender, fever, cough, fatigue, difficulty_breathing, age, blood_pressure, cholesterol_level])
     connection.commit()
 
     # Add data to blockchain
@@ -194,81 +194,73 @@ def add_patient(cursor, connection, public_key, validator_name, signature):
         "Cholesterol_Level": cholesterol_level,
         "Outcome_Variable": outcome_variable
     }
-    blockchain.add_block(patient_data, validator_name, signature)
-    print("Patient data added successfully and recorded on the blockchain!")
+    if BLOCKCHAIN_BATCHED:
+        get_block_batcher(validator_name, signature).add(patient_data)
+        print("Patient data added successfully and queued for the next blockchain batch!")
+    else:
+        get_blockchain().add_block(patient_data, validator_name, signature)
+        print("Patient data added successfully and recorded on the blockchain!")
 
 # Main CLI Menu
 def main():
-    connection = db_cred()
-    cursor = connection.cursor()
+    # The model and preprocessor are loaded by ml_pipeline on first use; only check they exist
+    if not has_artifacts():
+        print("Error: Preprocessor or model not found. Exiting...")
+        sys.exit(1)
 
-    user = user_login(cursor)
-    validator_name = "MD001"
-    signature = "4fa8c1cdf83eb36e391f810620bfe090be6d41177e9d5dafcdde9de957fd3460"  # Using email as part of the signature
+    with db_session() as connection:
+        cursor = connection.cursor()
 
-    public_key, private_key = load_or_generate_keys()
+        user = user_login(cursor)
+        validator_name = "MD001"
+        signature = "4fa8c1cdf83eb36e391f810620bfe090be6d41177e9d5dafcdde9de957fd3460"  # Using email as part of the signature
 
-    while True:
-        print("\n[Decrypted Disease Data]")
-        decrypt_data_from_db(public_key, private_key, cursor)
-
-        print("\nOptions:")
-        print("[1] Add patient")
-        print("[2] Run ML pipeline for predictions")
-        print("[0] Log out")
-
-        choice = input("Select an option: ")
-
-        if choice == '1':
-            # Add a new patient and record on the blockchain
-            add_patient(cursor, connection, public_key, validator_name, signature)
-
-        elif choice == '2':
-            # Run ML pipeline for predictions
-            query = "SELECT * FROM disease_data WHERE Prediction_Variable IS NULL;"
-            encrypted_data = fetch_encrypted_data(query)
-
-            if encrypted_data is not None and not encrypted_data.empty:
-                print("Encrypted data fetched successfully.")
-                decrypted_data = decrypt_dataframe_for_prediction(encrypted_data)
-
-                if decrypted_data is not None:
-                    print("Decryption completed successfully.")
-
-                    try:
-                        X_to_predict = decrypted_data.drop(
-                            columns=["Outcome_Variable", "Prediction_Variable", "id"], 
-                            errors="ignore"
-                        )
-
-                        X_preprocessed = preprocessor.transform(X_to_predict)
-                        predictions = model.predict(X_preprocessed)
-
-                        print("Predictions completed:", predictions)
-
-                        store_predictions_in_db(
-                            ids=encrypted_data["id"], 
-                            predictions=predictions
-                        )
-                    except NotFittedError:
-                        print("Error: The model or preprocessor is not fitted. Please check your ML pipeline setup.")
-                    except Exception as e:
-                        print(f"Error during prediction or preprocessing: {e}")
-                else:
-                    print("Failed to decrypt data.")
-            else:
-                print("No data available for prediction.")
+        public_key, private_key = load_or_generate_keys()
+        register_key(public_key)
+        ensure_schema(cursor)
+        store_public_key(cursor, public_key)
+        connection.commit()
 
-        elif choice == '0':
-            print("Logging out...")
-            break
+        # Precompute encryption randomness in the background for add_patient
+        obfuscator_pool = ObfuscatorPool(public_key)
+        index_key = load_or_generate_index_key() if SEARCH_INDEX else None
 
-        else:
-            print("Invalid option. Try again.")
+        try:
+            while True:
+                print("\n[Decrypted Disease Data]")
+                decrypt_data_from_db(public_key, private_key, cursor)
+
+                print("\nOptions:")
+                print("[1] Add patient")
+                print("[2] Run ML pipeline for predictions")
+                print("[0] Log out")
+
+                choice = input("Select an option: ")
 
+                if choice == '1':
+                    # Add a new patient and record on the blockchain
+                    add_patient(cursor, connection, public_key, validator_name, signature, obfuscator_pool, index_key=index_key)
 
-    cursor.close()
-    connection.close()
+                elif choice == '2':
+                    # Run ML pipeline for predictions, streaming pending rows in chunks
+                    run_streaming_predictions()
+
+                elif choice == '0':
+                    print("Logging out...")
+                    break
+
+                else:
+                    print("Invalid option. Try again.")
+        finally:
+            # Also on an error or Ctrl-C: queued records are only safe once written and sealed
+            obfuscator_pool.stop()
+            if INGEST_ASYNC and get_ingest_service.cache_info().currsize:
+                # Write and chain everything still queued
+                get_ingest_service(validator_name, signature).stop()
+            if BLOCKCHAIN_BATCHED and get_block_batcher.cache_info().currsize:
+                # Seal whatever is still waiting for a batch block
+                get_block_batcher(validator_name, signature).stop()
+            cursor.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
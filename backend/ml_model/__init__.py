@@ -1 +1 @@
-from .ml_pipeline import fetch_encrypted_data, decrypt_dataframe_for_prediction, store_predictions_in_db
\ No newline at end of file
+from .ml_pipeline import fetch_encrypted_data, decrypt_dataframe_for_prediction, store_predictions_in_db, run_streaming_predictions, get_model, get_preprocessor, get_artifacts, get_predictor, get_prediction_cache, precompute_predictions, has_artifacts, get_keys
\ No newline at end of file
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+
+# Unpack the notebook's ColumnTransformer: ('num', imputer + scaler), ('cat', imputer + one-hot)
+def _preprocessor_parts(preprocessor):
+    if not isinstance(preprocessor, ColumnTransformer):
+        raise ValueError("Only a fitted ColumnTransformer can be compiled.")
+    transformers = {name: (transformer, columns) for name, transformer, columns in preprocessor.transformers_ if name != "remainder"}
+    if set(transformers) != {"num", "cat"} or preprocessor.remainder != "drop":
+        raise ValueError("Expected exactly a 'num' and a 'cat' transformer.")
+
+    numeric, numeric_columns = transformers["num"]
+    categorical, categorical_columns = transformers["cat"]
+    numeric_steps = dict(numeric.steps)
+    categorical_steps = dict(categorical.steps)
+    imputer = numeric_steps.get("imputer")
+    scaler = numeric_steps.get("scaler")
+    encoder = categorical_steps.get("encoder")
+    if set(numeric_steps) - {"imputer", "scaler"} or set(categorical_steps) - {"imputer", "encoder"}:
+        raise ValueError("Unsupported preprocessing step.")
+    if imputer is not None and not isinstance(imputer, SimpleImputer):
+        raise ValueError("Unsupported numeric imputer.")
+    if scaler is not None and not isinstance(scaler, StandardScaler):
+        raise ValueError("Unsupported numeric scaler.")
+    if not isinstance(encoder, OneHotEncoder) or len(categorical_columns) != 1:
+        raise ValueError("Expected one one-hot encoded column.")
+    if encoder.drop_idx_ is not None or encoder.handle_unknown != "ignore":
+        raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop is supported.")
+
+    n_numeric = len(numeric_columns)
+    mean = np.zeros(n_numeric)
+    scale = np.ones(n_numeric)
+    if scaler is not None:
+        if scaler.with_mean:
+            mean = scaler.mean_
+        if scaler.with_std:
+            scale = scaler.scale_
+    fill = imputer.statistics_ if imputer is not None else None
+    categorical_imputer = categorical_steps.get("imputer")
+    categorical_fill = categorical_imputer.statistics_[0] if categorical_imputer is not None else None
+    return list(numeric_columns), mean, scale, fill, categorical_columns[0], encoder.categories_[0], categorical_fill
+
+
+class CompiledForest:
+    def __init__(self, preprocessor, model):
+        """
+        A fitted preprocessor + RandomForestClassifier flattened into NumPy arrays.
+        Every node of every tree is one entry of the feature/threshold/child
+        arrays, with node indices stored as int32. The preprocessing is fused
+        into one input matrix: numeric columns are imputed and scaled in place,
+        and the one-hot columns come from a precomputed lookup table indexed by
+        category, so no ColumnTransformer or sparse matrix is involved.
+        Raises:
+            ValueError: If the preprocessor or model cannot be compiled.
+        """
+        if not isinstance(model, RandomForestClassifier) or model.n_outputs_ != 1:
+            raise ValueError("Only a single-output RandomForestClassifier can be compiled.")
+        (self.numeric_columns, self.mean, self.scale, self.numeric_fill,
+         self.category_column, categories, self.category_fill) = _preprocessor_parts(preprocessor)
+        self.categories = pd.Index(categories)
+        self.classes_ = model.classes_
+
+        # One-hot rows by category index; the last row (all zeros) is for unknown categories
+        self.one_hot = np.vstack([np.eye(len(categories), dtype=np.float32), np.zeros((1, len(categories)), dtype=np.float32)])
+        self.n_inputs = len(self.numeric_columns) + len(categories)
+
+        features, thresholds, lefts, rights, leaves, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, 0, tree.children_left + offset))
+            rights.append(np.where(is_leaf, 0, tree.children_right + offset))
+            leaves.append(is_leaf)
+            value = tree.value[:, 0, :]
+            values.append(value / value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+            offset += tree.node_count
+
+        self.feature = np.concatenate(features).astype(np.int32)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        self.left = np.concatenate(lefts).astype(np.int32)
+        self.right = np.concatenate(rights).astype(np.int32)
+        self.is_leaf = np.concatenate(leaves)
+        self.leaf_value = np.concatenate(values).astype(np.float64)
+        self.roots = np.array(roots, dtype=np.int32)
+
+    # The fused preprocessing: the dense matrix the trees were trained on
+    def _inputs(self, X):
+        if not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X, columns=[self.category_column] + self.numeric_columns)
+        numeric = X[self.numeric_columns].to_numpy(dtype=np.float64)
+        if self.numeric_fill is not None:
+            missing = np.isnan(numeric)
+            if missing.any():
+                numeric = np.where(missing, self.numeric_fill, numeric)
+
+        category = X[self.category_column]
+        if self.category_fill is not None:
+            category = category.fillna(self.category_fill)
+        index = self.categories.get_indexer(category)
+
+        inputs = np.empty((len(X), self.n_inputs), dtype=np.float32)
+        # Scaled in float64 and stored as float32, exactly as the trees see it in scikit-learn
+        inputs[:, :len(self.numeric_columns)] = (numeric - self.mean) / self.scale
+        inputs[:, len(self.numeric_columns):] = self.one_hot[index]  # -1 picks the all-zero row
+        return inputs
+
+    def predict_proba(self, X):
+        inputs = self._inputs(X)
+        n_samples, n_trees = len(inputs), len(self.roots)
+        flat_inputs = inputs.ravel()
+
+        # One (sample, tree) pair per entry; pairs drop out once they reach a leaf
+        nodes = np.tile(self.roots, n_samples)
+        row_offsets = np.repeat(np.arange(n_samples, dtype=np.int64) * self.n_inputs, n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            go_left = flat_inputs[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = following
+            active = active[~self.is_leaf[following]]
+
+        return self.leaf_value[nodes].reshape(n_samples, n_trees, -1).mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+# Rows where the compiled forest and scikit-learn disagree (empty when they match)
+def parity_mismatches(preprocessor, model, compiled, X):
+    expected = model.predict(preprocessor.transform(X))
+    return np.flatnonzero(compiled.predict(X) != expected)
@@ -1,112 +1,339 @@
 import os
 import sys
+import time
+import queue
+import threading
+from functools import lru_cache
 import pandas as pd
 import joblib
-import pickle
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from encryption.homomorphic import load_keys, decrypt_value, encrypt_value
-from data.data_config import db_cred
+from encryption.homomorphic import load_keys, decrypt_value, encrypt_value, PACKED_FEATURES
+from encryption.bulk import decrypt_columns, BulkDecryptor
+from encryption.codec import register_key
+from data.data_config import db_session
+from ml_model.model_store import current_version, load_version
+from ml_model.compiled import CompiledForest
+from ml_model.prediction_cache import PredictionCache, known_diseases
+from config import INFERENCE_BACKEND, COMPILED_MAX_BATCH, PREDICTION_CACHE_SIZE
 
 
-# Load the preprocessor and model
-preprocessor_path = "/home/tsoien/github/newML/backend/ml_model/preprocessor.joblib"
-model_path = "/home/tsoien/github/newML/backend/ml_model/model.joblib"
+# Paths of the preprocessor, model and keys, relative to this file
+ml_model_dir = os.path.dirname(os.path.abspath(__file__))
+preprocessor_path = os.path.join(ml_model_dir, "preprocessor.joblib")
+model_path = os.path.join(ml_model_dir, "model.joblib")
+public_key_path = os.path.abspath(os.path.join(ml_model_dir, "..", "..", "public_key.pkl"))
+private_key_path = os.path.abspath(os.path.join(ml_model_dir, "..", "..", "private_key.pkl"))
 
-preprocessor = joblib.load(preprocessor_path)
-model = joblib.load(model_path)
 
-# Load keys
-public_key_path = "/home/tsoien/github/newML/public_key.pkl"
-private_key_path = "/home/tsoien/github/newML/private_key.pkl"
-public_key, private_key = load_keys(public_key_path, private_key_path)
+# Loaded artifacts by version; a couple are kept so a swap does not reload the old one
+@lru_cache(maxsize=2)
+def _load_artifacts(version):
+    if version is None:
+        # Nothing trained into the store yet: the bundled artifacts
+        return joblib.load(preprocessor_path), joblib.load(model_path)
+    return load_version(version)
+
+
+def get_artifacts():
+    """
+    The served (version, preprocessor, model), loaded on first use.
+    The store's CURRENT pointer is read on every call, so promoting a new
+    version is picked up by the next call without restarting the process.
+    """
+    version = current_version()
+    preprocessor, model = _load_artifacts(version)
+    return version or "bundled", preprocessor, model
+
+
+def get_preprocessor():
+    return get_artifacts()[1]
+
+
+def get_model():
+    return get_artifacts()[2]
+
+
+# Compiled form of a version, or None when its preprocessor/model cannot be compiled
+@lru_cache(maxsize=2)
+def _compile_artifacts(version):
+    preprocessor, model = _load_artifacts(None if version == "bundled" else version)
+    try:
+        return CompiledForest(preprocessor, model)
+    except ValueError as e:
+        print(f"Model version {version} cannot be compiled, using scikit-learn: {e}")
+        return None
+
+
+# Process-wide prediction cache shared by every predictor
+@lru_cache(maxsize=None)
+def get_prediction_cache():
+    return PredictionCache(PREDICTION_CACHE_SIZE)
+
+
+def get_predictor(backend=INFERENCE_BACKEND, cache=PREDICTION_CACHE_SIZE > 0):
+    """
+    The served version and a function mapping a feature DataFrame to predictions.
+    With backend="compiled", batches of up to COMPILED_MAX_BATCH rows are
+    evaluated by the compiled forest, where it is faster than scikit-learn;
+    larger batches and models that cannot be compiled use scikit-learn.
+    With cache, rows already predicted by this version are answered from the
+    prediction cache, which is cleared when the served version changes.
+    """
+    version, preprocessor, model = get_artifacts()
+    compiled = _compile_artifacts(version) if backend == "compiled" else None
+
+    def predict(X):
+        if compiled is not None and len(X) <= COMPILED_MAX_BATCH:
+            return compiled.predict(X)
+        return model.predict(preprocessor.transform(X))
+
+    if not cache:
+        return version, predict
+    prediction_cache = get_prediction_cache()
+    return version, lambda X: prediction_cache.predict(X, version, predict)
+
+
+# Fill the prediction cache with every known disease x coded feature combination
+def precompute_predictions(backend=INFERENCE_BACKEND):
+    start = time.perf_counter()
+    version, preprocessor, _ = get_artifacts()
+    _, predict = get_predictor(backend, cache=False)
+    size = get_prediction_cache().precompute(version, predict, known_diseases(preprocessor))
+    print(f"Precomputed {size} predictions for model version {version} in {time.perf_counter() - start:.1f}s.")
+    return size
+
+
+# Whether there is a model to serve
+def has_artifacts():
+    return current_version() is not None or (os.path.exists(preprocessor_path) and os.path.exists(model_path))
+
+
+@lru_cache(maxsize=None)
+def get_keys():
+    public_key, private_key = load_keys(public_key_path, private_key_path)
+    register_key(public_key)
+    return public_key, private_key
+
 
 # Function to fetch encrypted data from the database
-def fetch_encrypted_data(query):
+def fetch_encrypted_data(query, params=None):
     try:
-        db = db_cred()
-        cursor = db.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
-        cursor.close()
-        db.close()
+        with db_session() as db:
+            cursor = db.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+            cursor.close()
         return pd.DataFrame(rows, columns=column_names)
     except Exception as e:
         print(f"Error fetching data: {e}")
         return None
 
 # Function to decrypt encrypted data
-def decrypt_dataframe_for_prediction(df):
+def decrypt_dataframe_for_prediction(df, workers=None, decryptor=None):
     try:
-        encrypted_columns = [
-            "Gender", "Fever", "Cough", "Fatigue",
-            "Difficulty_Breathing", "Age", "Blood_Pressure", "Cholesterol_Level"
-        ]
-        for col in encrypted_columns:
-            df[col] = df[col].apply(lambda x: decrypt_value(private_key, pickle.loads(x)))
-        return df
+        if "Packed_Features" in df.columns:
+            packed_mask = df["Packed_Features"].notna().to_numpy()
+        else:
+            packed_mask = None
+
+        # Whole columns are decrypted in a process pool via the CRT path
+        columns = {col: df[col].to_numpy(dtype=object) for col in PACKED_FEATURES}
+        if packed_mask is not None:
+            columns["Packed_Features"] = df["Packed_Features"].to_numpy(dtype=object)
+        if decryptor is not None:
+            decrypted = decryptor.decrypt_features(columns, packed_mask)
+        else:
+            decrypted = decrypt_columns(get_keys()[1], columns, packed_mask, workers=workers)
+
+        for col in PACKED_FEATURES:
+            df[col] = decrypted[col]
+        return df.drop(columns=["Packed_Features"], errors="ignore")
     except Exception as e:
         print(f"Error during decryption: {e}")
         return None
 
 # Function to store predictions in the database
-def store_predictions_in_db(ids, predictions):
+def store_predictions_in_db(ids, predictions, bulk=True, chunk_size=1000):
+    """
+    Writes predictions back to disease_data.
+    Args:
+        ids: Row ids, aligned with predictions.
+        predictions: Predicted values.
+        bulk (bool): Stage each chunk in a temporary table and apply it with one
+            joined UPDATE instead of one UPDATE per row.
+        chunk_size (int): Rows per chunk; every chunk is committed on its own.
+    Returns:
+        int: Number of rows committed; less than len(ids) if a chunk failed.
+    """
+    written = 0
     try:
-        db = db_cred()
-        cursor = db.cursor()
-        for idx, pred in zip(ids, predictions):
-            sql = """
-                UPDATE disease_data 
-                SET Prediction_Variable = %s
-                WHERE id = %s
-            """
-            cursor.execute(sql, (pred, idx))  # Update the column with prediction value
-        db.commit()
-        cursor.close()
-        db.close()
-        print("Predictions stored successfully.")
+        start = time.perf_counter()
+        rows = [
+            (pred.item() if hasattr(pred, "item") else pred, int(idx))
+            for idx, pred in zip(ids, predictions)
+        ]
+        with db_session() as db:
+            cursor = db.cursor()
+            if bulk:
+                # Typed from disease_data itself, so a staged prediction is never truncated or converted;
+                # dropped first in case a failed call left one on this pooled connection
+                cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_predictions;")
+                cursor.execute("""
+                    CREATE TEMPORARY TABLE tmp_predictions (PRIMARY KEY (id))
+                    SELECT id, Prediction_Variable FROM disease_data LIMIT 0;
+                """)
+            try:
+                for i in range(0, len(rows), chunk_size):
+                    chunk = rows[i:i + chunk_size]
+                    if bulk:
+                        cursor.execute("DELETE FROM tmp_predictions;")
+                        cursor.executemany(
+                            "INSERT INTO tmp_predictions (Prediction_Variable, id) VALUES (%s, %s);", chunk
+                        )
+                        cursor.execute("""
+                            UPDATE disease_data d
+                            JOIN tmp_predictions t ON d.id = t.id
+                            SET d.Prediction_Variable = t.Prediction_Variable;
+                        """)
+                    else:
+                        for pred, idx in chunk:
+                            sql = """
+                                UPDATE disease_data 
+                                SET Prediction_Variable = %s
+                                WHERE id = %s
+                            """
+                            cursor.execute(sql, (pred, idx))  # Update the column with prediction value
+                    db.commit()
+                    written += len(chunk)
+            finally:
+                # The pool keeps the connection open, and a temporary table lives as long as it does
+                if bulk:
+                    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_predictions;")
+                cursor.close()
+        elapsed = time.perf_counter() - start
+        print(f"Predictions stored successfully ({len(rows)} rows, {len(rows) / elapsed if elapsed else 0:.1f} rows/sec).")
     except Exception as e:
         print(f"Error storing predictions: {e}")
+    return written
+
+
+# Stream pending rows through decrypt -> predict -> write-back in fixed-size chunks
+def run_streaming_predictions(chunk_size=1000, queue_depth=2, workers=None):
+    """
+    Predicts every row with a NULL Prediction_Variable without loading them all.
+    Rows are paged with keyset pagination on id. Fetch/decrypt, transform/predict
+    and write-back run in their own threads, connected by queues holding at
+    most queue_depth chunks, so peak memory depends on chunk_size only.
+    Each chunk is committed as it is written; after a crash, running again
+    picks up exactly the rows that still have no prediction.
+    Returns:
+        int: Number of rows predicted and stored.
+    """
+    # Load once on the calling thread so the whole run uses one model version
+    version, predict_chunk = get_predictor()
+    print(f"Predicting with model version {version}.")
+    select_sql = "SELECT * FROM disease_data WHERE Prediction_Variable IS NULL AND id > %s ORDER BY id LIMIT %s;"
+    decrypted_chunks = queue.Queue(maxsize=queue_depth)
+    predicted_chunks = queue.Queue(maxsize=queue_depth)
+    failed = threading.Event()
+    errors = []
+    stats = {"rows": 0, "correct": 0, "labelled": 0}
+    start = time.perf_counter()
+
+    # Blocking put that gives up when another stage has failed
+    def put(target, item):
+        while not failed.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(source):
+        while not failed.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
 
+    def fetch_and_decrypt():
+        try:
+            last_id = 0
+            with BulkDecryptor(get_keys()[1], workers) as decryptor:
+                while not failed.is_set():
+                    chunk = fetch_encrypted_data(select_sql, (last_id, chunk_size))
+                    if chunk is None:
+                        raise RuntimeError("Could not fetch pending rows.")
+                    if chunk.empty:
+                        break
+                    last_id = int(chunk["id"].iloc[-1])
+                    decrypted = decrypt_dataframe_for_prediction(chunk, decryptor=decryptor)
+                    if decrypted is None:
+                        raise RuntimeError(f"Could not decrypt rows up to id {last_id}.")
+                    if not put(decrypted_chunks, decrypted):
+                        return
+        except Exception as e:
+            errors.append(e)
+            failed.set()
+        put(decrypted_chunks, None)
 
-# Query to fetch data for prediction (ensure that the `Outcome_Variable` is NULL for prediction)
-query = "SELECT * FROM disease_data WHERE Prediction_Variable IS NULL;"
-encrypted_data = fetch_encrypted_data(query)
-
-if encrypted_data is not None and not encrypted_data.empty:
-    print("Encrypted data fetched successfully.")
-    
-    # Decrypt the data for preprocessing
-    decrypted_data = decrypt_dataframe_for_prediction(encrypted_data)
-    if decrypted_data is not None:
-        print("Decryption completed successfully.")
-        
-        # Extract features for prediction
-        X_to_predict = decrypted_data.drop(columns=["Outcome_Variable", "Prediction_Variable", "id"], errors="ignore")
-        
-        # Preprocess the data
+    def predict():
         try:
-            X_preprocessed = preprocessor.transform(X_to_predict)
-            print("Data preprocessed successfully.")
-            
-            # Make predictions
-            predictions = model.predict(X_preprocessed)
-            print("Predictions:", predictions)
-            
-            # Optionally, you can compare with the actual values (if available for testing)
-            # Assuming you have a dataset with known `Outcome_Variable` values
-            y_actual = decrypted_data["Outcome_Variable"]  # Actual values if available for evaluation
-            accuracy = accuracy_score(y_actual, predictions)
-            print(f"Prediction Accuracy: {accuracy * 100:.2f}%")
-            
-            # Store the predictions directly in the database
-            store_predictions_in_db(ids=encrypted_data["id"], predictions=predictions)
+            while True:
+                chunk = get(decrypted_chunks)
+                if chunk is None:
+                    break
+                X_to_predict = chunk.drop(columns=["Outcome_Variable", "Prediction_Variable", "id"], errors="ignore")
+                predictions = predict_chunk(X_to_predict)
+                if "Outcome_Variable" in chunk.columns:
+                    labelled = chunk["Outcome_Variable"].notna().to_numpy()
+                    stats["labelled"] += int(labelled.sum())
+                    stats["correct"] += int((chunk["Outcome_Variable"].to_numpy()[labelled] == predictions[labelled]).sum())
+                if not put(predicted_chunks, (chunk["id"].to_numpy(), predictions)):
+                    return
         except Exception as e:
-            print(f"Error during prediction or preprocessing: {e}")
-    else:
-        print("Failed to decrypt data.")
-else:
-    print("No data available for prediction.")
+            errors.append(e)
+            failed.set()
+        put(predicted_chunks, None)
+
+    stages = [threading.Thread(target=fetch_and_decrypt), threading.Thread(target=predict)]
+    for stage in stages:
+        stage.start()
+
+    # Write-back runs on the calling thread
+    try:
+        while True:
+            item = get(predicted_chunks)
+            if item is None:
+                break
+            ids, predictions = item
+            written = store_predictions_in_db(ids, predictions, chunk_size=chunk_size)
+            stats["rows"] += written
+            if written < len(ids):
+                raise RuntimeError(f"Stored {written} of {len(ids)} predictions for ids {ids[0]}-{ids[-1]}.")
+            elapsed = time.perf_counter() - start
+            print(f"Predicted {stats['rows']} rows ({stats['rows'] / elapsed:.1f} rows/sec).")
+    except Exception as e:
+        errors.append(e)
+        failed.set()
+
+    for stage in stages:
+        stage.join()
+
+    if errors:
+        print(f"Error during streaming predictions: {errors[0]}")
+    elif stats["rows"] == 0:
+        print("No data available for prediction.")
+    if PREDICTION_CACHE_SIZE > 0:
+        print(f"Prediction cache: {get_prediction_cache().stats()}")
+    if stats["labelled"]:
+        print(f"Prediction Accuracy: {stats['correct'] / stats['labelled'] * 100:.2f}%")
+    return stats["rows"]
+
 
+# Predict every row that does not have a prediction yet
+if __name__ == "__main__":
+    run_streaming_predictions()
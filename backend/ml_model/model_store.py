@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import joblib
+
+# Versioned artifacts live in store/<version>/, where version is a hash of their contents
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "store")
+# File naming the version that is currently served
+CURRENT_FILE = "CURRENT"
+ARTIFACTS = ("preprocessor.joblib", "model.joblib")
+
+
+# sha256 over the artifact files, in a fixed order
+def _content_hash(directory):
+    digest = hashlib.sha256()
+    for name in ARTIFACTS:
+        with open(os.path.join(directory, name), "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def save_artifacts(preprocessor, model, metadata=None, store_dir=STORE_DIR, promote=True):
+    """
+    Writes a preprocessor and model to the store as a new version.
+    The artifacts are dumped to a temporary directory first and renamed into
+    place, so a version directory is never seen half written. Saving the same
+    artifacts twice yields the same version.
+    Args:
+        preprocessor: Fitted preprocessor.
+        model: Fitted model.
+        metadata (dict): Extra information recorded in metadata.json.
+        store_dir (str): Root of the store.
+        promote (bool): Make the new version the one that is served.
+    Returns:
+        str: The version id.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=store_dir)
+    try:
+        joblib.dump(preprocessor, os.path.join(staging, ARTIFACTS[0]))
+        joblib.dump(model, os.path.join(staging, ARTIFACTS[1]))
+        version = _content_hash(staging)
+
+        metadata = dict(metadata or {}, version=version, created_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        with open(os.path.join(staging, "metadata.json"), "w") as file:
+            json.dump(metadata, file, indent=2, default=str)
+
+        target = os.path.join(store_dir, version)
+        if os.path.exists(target):
+            shutil.rmtree(staging)
+        else:
+            os.rename(staging, target)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if promote:
+        promote_version(version, store_dir)
+    return version
+
+
+# Point CURRENT at a version; the pointer is replaced atomically
+def promote_version(version, store_dir=STORE_DIR):
+    if not os.path.isdir(os.path.join(store_dir, version)):
+        raise ValueError(f"Unknown model version: {version}")
+    fd, path = tempfile.mkstemp(prefix=".current-", dir=store_dir)
+    with os.fdopen(fd, "w") as file:
+        file.write(version + "\n")
+    os.replace(path, os.path.join(store_dir, CURRENT_FILE))
+
+
+# The served version, or None if nothing has been promoted
+def current_version(store_dir=STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_version(version, store_dir=STORE_DIR):
+    """
+    Returns:
+        tuple: (preprocessor, model) of the version.
+    """
+    directory = os.path.join(store_dir, version)
+    return tuple(joblib.load(os.path.join(directory, name)) for name in ARTIFACTS)
+
+
+def read_metadata(version, store_dir=STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, version, "metadata.json")) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"version": version}
+
+
+# Metadata of every stored version, oldest first
+def list_versions(store_dir=STORE_DIR):
+    if not os.path.isdir(store_dir):
+        return []
+    versions = [
+        read_metadata(name, store_dir) for name in os.listdir(store_dir)
+        if not name.startswith(".") and os.path.isdir(os.path.join(store_dir, name))
+    ]
+    return sorted(versions, key=lambda metadata: metadata.get("created_at", ""))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the model store or change the served version.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list")
+    promote_parser = subparsers.add_parser("promote")
+    promote_parser.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "promote":
+        promote_version(args.version)
+        print(f"Serving model version {args.version}.")
+    else:
+        served = current_version()
+        for metadata in list_versions():
+            marker = "*" if metadata["version"] == served else " "
+            print(f"{marker} {metadata['version']}  {metadata.get('created_at', '?')}  "
+                  f"cv {metadata.get('cv_score', float('nan')):.3f}  holdout {metadata.get('holdout_accuracy', float('nan')):.3f}")
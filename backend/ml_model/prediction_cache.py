@@ -0,0 +1,178 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from encryption.homomorphic import PACKED_FEATURES, MAX_AGE
+from feature_codec import CATEGORICAL_MAPS
+
+# Features of a cache key after Disease, in model input order
+KEY_FEATURES = PACKED_FEATURES
+# Allowed codes of each feature, in the order used by the precomputed table
+FEATURE_DOMAINS = {
+    name: sorted(CATEGORICAL_MAPS[name].values()) if name in CATEGORICAL_MAPS else list(range(MAX_AGE + 1))
+    for name in KEY_FEATURES
+}
+# Rows predicted per model call while precomputing
+PRECOMPUTE_BATCH = 50000
+
+
+# Disease labels the fitted preprocessor one-hot encodes
+def known_diseases(preprocessor):
+    try:
+        return list(preprocessor.named_transformers_["cat"].steps[-1][1].categories_[0])
+    except (AttributeError, KeyError, IndexError):
+        raise ValueError("Cannot read the Disease categories of this preprocessor.")
+
+
+class PredictionCache:
+    def __init__(self, capacity=100000):
+        """
+        Predictions keyed by (model version, Disease, coded features).
+        Two layers sit in front of the model:
+        - a dense table covering every coded input of one version, filled by
+          precompute() and read with one vectorized lookup per batch;
+        - an LRU dict of at most `capacity` keys for everything else.
+        Both are dropped as soon as a different model version is used.
+        Args:
+            capacity (int): Maximum number of keys in the LRU layer.
+        """
+        self.capacity = capacity
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._table = None  # (diseases Index, class labels, int8 table of label indices)
+        self._lock = threading.Lock()
+
+    # Drop everything cached for another model version
+    def _use_version(self, version):
+        if version != self.version:
+            if self.version is not None:
+                self.invalidations += 1
+            self.version = version
+            self._entries.clear()
+            self._table = None
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._table = None
+
+    # Position of every row in the dense table, or -1 outside its domain
+    @staticmethod
+    def _table_positions(diseases, columns):
+        position = diseases.get_indexer(columns["Disease"])
+        inside = position >= 0
+        for name in KEY_FEATURES:
+            domain = FEATURE_DOMAINS[name]
+            try:
+                values = np.asarray(columns[name], dtype=np.float64)
+            except (TypeError, ValueError):
+                values = pd.to_numeric(pd.Series(columns[name]), errors="coerce").to_numpy(dtype=np.float64)
+            index = np.searchsorted(domain, values)
+            found = (index < len(domain)) & (np.take(domain, np.minimum(index, len(domain) - 1)) == values)
+            inside &= found
+            position = position * len(domain) + np.where(found, index, 0)
+        return np.where(inside, position, -1)
+
+    def predict(self, X, version, predict_fn):
+        """
+        Predictions for the rows of X, calling predict_fn only for rows not cached.
+        Args:
+            X (DataFrame): Model input rows.
+            version (str): Version of the model behind predict_fn.
+            predict_fn: Callable mapping a DataFrame to predictions.
+        Returns:
+            ndarray: One prediction per row of X.
+        """
+        results = np.empty(len(X), dtype=object)
+        pending = np.ones(len(X), dtype=bool)
+        columns = {name: X[name].to_numpy() for name in ["Disease"] + KEY_FEATURES}
+        with self._lock:
+            self._use_version(version)
+            table = self._table
+        if table is not None:
+            diseases, labels, codes = table
+            positions = self._table_positions(diseases, columns)
+            covered = positions >= 0
+            results[covered] = labels[codes[positions[covered]]]
+            pending &= ~covered
+
+        # Remaining rows go through the LRU layer
+        rest = np.flatnonzero(pending)
+        keys = list(zip(*(columns[name][rest].tolist() for name in ["Disease"] + KEY_FEATURES))) if len(rest) else []
+        missing = {}
+        with self._lock:
+            for i, key in zip(rest, keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    results[i] = self._entries[key]
+                else:
+                    missing.setdefault(key, []).append(i)
+            self.hits += len(X) - sum(len(rows) for rows in missing.values())
+            self.misses += sum(len(rows) for rows in missing.values())
+
+        if missing:
+            # Each distinct missing key is predicted once, in one call
+            first_rows = [rows[0] for rows in missing.values()]
+            predictions = predict_fn(X.iloc[first_rows])
+            with self._lock:
+                for (key, rows), prediction in zip(missing.items(), predictions):
+                    prediction = prediction.item() if hasattr(prediction, "item") else prediction
+                    results[rows] = prediction
+                    if version == self.version:
+                        self._entries[key] = prediction
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return results
+
+    def precompute(self, version, predict_fn, diseases):
+        """
+        Predicts every combination of the given diseases and coded feature
+        values for one model version and keeps them in the dense table.
+        Returns:
+            int: Number of precomputed inputs.
+        """
+        diseases = pd.Index(diseases)
+        shape = [len(diseases)] + [len(FEATURE_DOMAINS[name]) for name in KEY_FEATURES]
+        size = int(np.prod(shape))
+        label_index = {}
+        codes = np.empty(size, dtype=np.int8)
+
+        for start in range(0, size, PRECOMPUTE_BATCH):
+            flat = np.arange(start, min(start + PRECOMPUTE_BATCH, size))
+            digits = np.unravel_index(flat, shape)
+            X = pd.DataFrame({"Disease": diseases[digits[0]]})
+            for name, digit in zip(KEY_FEATURES, digits[1:]):
+                X[name] = np.asarray(FEATURE_DOMAINS[name])[digit]
+            for i, prediction in enumerate(predict_fn(X)):
+                prediction = prediction.item() if hasattr(prediction, "item") else prediction
+                codes[start + i] = label_index.setdefault(prediction, len(label_index))
+
+        labels = np.empty(len(label_index), dtype=object)
+        for label, index in label_index.items():
+            labels[index] = label
+        with self._lock:
+            self._use_version(version)
+            self._table = (diseases, labels, codes)
+        return size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "precomputed": len(self._table[2]) if self._table is not None else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_model.ml_pipeline import get_predictor
+from encryption.homomorphic import PACKED_FEATURES
+from feature_codec import CATEGORICAL_MAPS, encode_value
+from config import INFERENCE_BACKEND
+
+# Columns the preprocessor was fitted on, in disease_data order
+MODEL_INPUT_COLUMNS = ["Disease"] + PACKED_FEATURES
+
+# Defaults for the micro-batcher
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS = 5
+# Number of recent requests the latency percentiles are computed over
+LATENCY_WINDOW = 10000
+
+
+# Turn one request payload into a row of model inputs
+def encode_patient(payload):
+    """
+    Args:
+        payload (dict): Disease plus the eight features, either as labels
+            ("Male", "Yes", "High") or as their coded values.
+    Returns:
+        list: Values in MODEL_INPUT_COLUMNS order.
+    """
+    missing = [col for col in MODEL_INPUT_COLUMNS if payload.get(col) is None]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    row = [str(payload["Disease"])]
+    for col in PACKED_FEATURES:
+        value = payload[col]
+        if col in CATEGORICAL_MAPS:
+            code = encode_value(col, str(value).capitalize())
+            value = value if code is None else code
+        try:
+            row.append(int(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for {col}: {payload[col]!r}")
+    return row
+
+
+# One predict call for a whole batch of rows, with the configured inference backend
+def predict_rows(rows, backend=INFERENCE_BACKEND):
+    # Preprocessor and model come from the same served version, even if a swap happens meanwhile
+    _, predict = get_predictor(backend)
+    X = pd.DataFrame(rows, columns=MODEL_INPUT_COLUMNS)
+    return [pred.item() if hasattr(pred, "item") else pred for pred in predict(X)]
+
+
+class LatencyStats:
+    def __init__(self, window=LATENCY_WINDOW):
+        """
+        Request latencies and batch sizes of a running server.
+        Args:
+            window (int): Number of most recent requests kept for the percentiles.
+        """
+        self.started = time.monotonic()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_batch(self, latencies, failed=False):
+        with self._lock:
+            self.batches += 1
+            self.requests += len(latencies)
+            if failed:
+                self.errors += len(latencies)
+            self._latencies.extend(latencies)
+
+    # Nearest-rank percentile of the recent latencies, in milliseconds
+    def percentile(self, p):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return 0.0
+        rank = max(0, min(len(latencies) - 1, int(round(p / 100 * len(latencies))) - 1))
+        return latencies[rank] * 1000
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "throughput_rps": self.requests / elapsed if elapsed else 0.0,
+        }
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn=predict_rows, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        """
+        Coalesces concurrent single-row requests into batched predict calls.
+        A batch is dispatched when it holds max_batch_size rows or when its
+        oldest row has waited max_wait_ms, whichever comes first.
+        Args:
+            predict_fn: Callable mapping a list of rows to a list of predictions.
+            max_batch_size (int): Largest number of rows per predict call.
+            max_wait_ms (float): Longest time a request waits for others to join its batch.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = LatencyStats()
+        self._requests = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue one row; the returned Future resolves to its prediction."""
+        if self._stopped.is_set():
+            raise RuntimeError("The batcher has been stopped.")
+        future = Future()
+        self._requests.put((row, future, time.monotonic()))
+        return future
+
+    def predict(self, row, timeout=None):
+        return self.submit(row).result(timeout)
+
+    def _next_batch(self):
+        try:
+            first = self._requests.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._requests.get(timeout=remaining))
+                else:
+                    batch.append(self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopped.is_set() and self._requests.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            rows = [row for row, _, _ in batch]
+            try:
+                predictions = self.predict_fn(rows)
+                failed = None
+            except Exception as e:
+                failed = e
+
+            finished = time.monotonic()
+            for i, (_, future, enqueued) in enumerate(batch):
+                if failed is None:
+                    future.set_result(predictions[i])
+                else:
+                    future.set_exception(failed)
+            self.stats.record_batch([finished - enqueued for _, _, enqueued in batch], failed is not None)
+
+    def stop(self):
+        """Finish the queued requests and stop the batching thread."""
+        self._stopped.set()
+        self._thread.join()
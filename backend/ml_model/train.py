@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import pandas as pd
+import sklearn
+from sklearn.model_selection import train_test_split, GridSearchCV, StratifiedKFold
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.impute import SimpleImputer
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feature_codec import encode_frame
+from ml_model.ml_pipeline import fetch_encrypted_data, decrypt_dataframe_for_prediction
+from ml_model.model_store import save_artifacts
+from ml_model.serving import MODEL_INPUT_COLUMNS
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'Disease_symptom_and_patient_profile_dataset.csv')
+
+# Random forest settings searched by default
+PARAM_GRID = {
+    "model__n_estimators": [100, 200, 400],
+    "model__max_depth": [None, 8, 16],
+    "model__min_samples_leaf": [1, 2, 4],
+    "model__max_features": ["sqrt", None],
+}
+
+
+# Labelled training rows from the bundled CSV, mapped like ingestion does
+def load_csv_data(file_path=DATASET_PATH):
+    df = pd.read_csv(file_path, dtype=str)
+    encoded, unknown = encode_frame(df)
+    encoded = encoded[~unknown.any(axis=1).to_numpy()]
+    return encoded[MODEL_INPUT_COLUMNS], encoded["Outcome_Variable"]
+
+
+# Labelled training rows decrypted from disease_data
+def load_db_data():
+    df = fetch_encrypted_data("SELECT * FROM disease_data WHERE Outcome_Variable IS NOT NULL;")
+    if df is None or df.empty:
+        raise RuntimeError("No labelled rows in disease_data.")
+    df = decrypt_dataframe_for_prediction(df)
+    if df is None:
+        raise RuntimeError("Could not decrypt disease_data.")
+    return df[MODEL_INPUT_COLUMNS], df["Outcome_Variable"]
+
+
+# The same preprocessing as the notebook: scaled numeric features, one-hot Disease
+def build_preprocessor():
+    categorical_columns = ['Disease']
+    numeric_columns = [col for col in MODEL_INPUT_COLUMNS if col not in categorical_columns]
+
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='mean')),
+        ('scaler', StandardScaler())
+    ])
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('encoder', OneHotEncoder(handle_unknown='ignore'))
+    ])
+    return ColumnTransformer(transformers=[
+        ('num', numeric_transformer, numeric_columns),
+        ('cat', categorical_transformer, categorical_columns)
+    ])
+
+
+def train(X, y, param_grid=PARAM_GRID, cv=5, n_jobs=-1, test_size=0.2, random_state=42):
+    """
+    Cross-validated grid search over preprocessor + random forest.
+    The search is parallel across candidates and folds (n_jobs); each forest
+    is fitted single-threaded so the two levels do not oversubscribe the cores.
+    Returns:
+        tuple: (fitted preprocessor, fitted model, metadata dict).
+    """
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=y
+    )
+    pipeline = Pipeline(steps=[
+        ('preprocessor', build_preprocessor()),
+        ('model', RandomForestClassifier(random_state=random_state, n_jobs=1)),
+    ])
+    search = GridSearchCV(
+        pipeline,
+        param_grid,
+        cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state),
+        scoring="accuracy",
+        n_jobs=n_jobs,
+    )
+
+    start = time.perf_counter()
+    search.fit(X_train, y_train)
+    elapsed = time.perf_counter() - start
+
+    best = search.best_estimator_
+    holdout_accuracy = accuracy_score(y_test, best.predict(X_test))
+    metadata = {
+        "best_params": {name.replace("model__", ""): value for name, value in search.best_params_.items()},
+        "cv_score": search.best_score_,
+        "holdout_accuracy": holdout_accuracy,
+        "candidates": len(search.cv_results_["params"]),
+        "folds": cv,
+        "search_seconds": elapsed,
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "features": MODEL_INPUT_COLUMNS,
+        "sklearn_version": sklearn.__version__,
+    }
+    return best.named_steps['preprocessor'], best.named_steps['model'], metadata
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the preprocessor and model and add them to the model store.")
+    parser.add_argument("--source", choices=["csv", "db"], default="csv")
+    parser.add_argument("--csv", default=DATASET_PATH, help="CSV file used with --source csv")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--no-promote", action="store_true", help="Store the new version without serving it")
+    args = parser.parse_args()
+
+    X, y = load_csv_data(args.csv) if args.source == "csv" else load_db_data()
+    print(f"Training on {len(X)} rows from {args.source}...")
+    preprocessor, model, metadata = train(X, y, cv=args.cv, n_jobs=args.n_jobs)
+    metadata["source"] = args.source
+
+    version = save_artifacts(preprocessor, model, metadata, promote=not args.no_promote)
+    print(f"Searched {metadata['candidates']} candidates x {args.cv} folds in {metadata['search_seconds']:.1f}s.")
+    print(f"Best params: {metadata['best_params']}")
+    print(f"CV accuracy {metadata['cv_score']:.3f}, holdout accuracy {metadata['holdout_accuracy']:.3f}")
+    print(f"Stored model version {version}{'' if args.no_promote else ' (now served)'}.")
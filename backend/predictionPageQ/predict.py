@@ -0,0 +1,55 @@
+import sys
+import os
+from functools import lru_cache
+from flask import Blueprint, jsonify, request, session
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ml_model.ml_pipeline import get_artifacts, get_prediction_cache, precompute_predictions
+from ml_model.serving import MicroBatcher, encode_patient, MAX_BATCH_SIZE, MAX_WAIT_MS
+
+prediction_bp = Blueprint('prediction', __name__)
+
+# Micro-batching limits, overridable from the environment
+BATCH_SIZE = int(os.environ.get('PREDICT_MAX_BATCH_SIZE', MAX_BATCH_SIZE))
+WAIT_MS = float(os.environ.get('PREDICT_MAX_WAIT_MS', MAX_WAIT_MS))
+# Fill the prediction cache with the whole input domain when the batcher starts
+PRECOMPUTE = os.environ.get('PREDICT_PRECOMPUTE', '0') == '1'
+# Seconds a request waits for its prediction before giving up
+REQUEST_TIMEOUT = 10
+
+# One batcher per process; the model and preprocessor are loaded once when it is created
+@lru_cache(maxsize=None)
+def get_batcher():
+    get_artifacts()
+    if PRECOMPUTE:
+        precompute_predictions()
+    return MicroBatcher(max_batch_size=BATCH_SIZE, max_wait_ms=WAIT_MS)
+
+# Same gate as /dashboard, answered with 401 since these are JSON endpoints
+@prediction_bp.before_request
+def require_login():
+    if 'logged_in' not in session:
+        return jsonify({"error": "Please log in to use the prediction endpoints."}), 401
+
+@prediction_bp.route('/predict', methods=['POST'])
+def predict():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Expected a JSON object with the patient's features."}), 400
+
+    try:
+        row = encode_patient(payload)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        prediction = get_batcher().predict(row, timeout=REQUEST_TIMEOUT)
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+    return jsonify({"prediction": prediction})
+
+@prediction_bp.route('/predict/stats', methods=['GET'])
+def predict_stats():
+    stats = get_batcher().stats.snapshot()
+    stats.update(max_batch_size=BATCH_SIZE, max_wait_ms=WAIT_MS, model_version=get_artifacts()[0], cache=get_prediction_cache().stats())
+    return jsonify(stats)
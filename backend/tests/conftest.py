@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other from the backend directory; the stand-in database lives with the benchmarks
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path[:0] = [BACKEND, os.path.join(BACKEND, "benchmarks")]
+
+from phe import paillier
+from data import data_config
+from blockchain import poa
+import _fakes
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """A fresh stand-in database behind every db_session(); the real pool and key directory are restored after."""
+    monkeypatch.setattr(data_config, "_pool", data_config._pool)
+    monkeypatch.setattr(poa, "KEY_DIR", poa.KEY_DIR)
+    return _fakes.use_database(_fakes.make_database())
+
+
+# Small keys: the tests check behaviour, not strength
+@pytest.fixture(scope="session")
+def keys():
+    return paillier.generate_paillier_keypair(n_length=512)
@@ -0,0 +1,45 @@
+from blockchain import chain, batcher, validators
+from _fakes import VALIDATOR, SIGNATURE, RECORD
+
+
+def _seal(records):
+    blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+    block_batcher = batcher.BlockBatcher(blockchain, VALIDATOR, SIGNATURE, max_records=4, max_wait_seconds=1.0)
+    futures = [block_batcher.add(dict(RECORD, Age=age)) for age in range(records)]
+    block_batcher.stop()
+    return blockchain, [future.result() for future in futures]
+
+
+def test_every_record_verifies_against_its_block(database):
+    blockchain, locations = _seal(10)
+    assert sorted({block_index for block_index, _ in locations}) == [2, 3, 4]
+    for block_index, leaf_index in locations:
+        assert batcher.verify_record(blockchain, block_index, leaf_index) == (True, "ok")
+
+
+def test_tampered_record_is_rejected(database):
+    blockchain, locations = _seal(4)
+    block_index, leaf_index = locations[1]
+    database.db.execute(
+        "UPDATE block_records SET record = REPLACE(record, 'Influenza', 'Asthma') WHERE block_index = ? AND leaf_index = ?;",
+        (block_index, leaf_index),
+    )
+    assert batcher.verify_record(blockchain, block_index, leaf_index) == (False, "record does not match its leaf hash")
+    assert batcher.verify_record(blockchain, *locations[0]) == (True, "ok")
+
+
+def test_proof_must_lead_to_the_block_root(database):
+    blockchain, locations = _seal(4)
+    # A record and leaf hash moved from another leaf: the leaf checks out, its proof does not
+    database.db.execute("""
+        UPDATE block_records SET
+            record = (SELECT record FROM block_records WHERE leaf_index = 2),
+            leaf_hash = (SELECT leaf_hash FROM block_records WHERE leaf_index = 2)
+        WHERE leaf_index = 0;
+    """)
+    assert batcher.verify_record(blockchain, *locations[0]) == (False, "proof does not lead to the block's Merkle root")
+
+
+def test_missing_record(database):
+    blockchain, _ = _seal(1)
+    assert batcher.verify_record(blockchain, 2, 5) == (False, "record not found")
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from blockchain import chain, validators
+from blockchain.block_log import BlockLog
+from data import ingest, ingest_service
+from feature_codec import CSV_COLUMNS
+from _fakes import VALIDATOR, SIGNATURE, RECORD
+
+
+def _row(**changes):
+    return [dict(RECORD, **changes)[column] for column in CSV_COLUMNS]
+
+
+def _count(database, sql):
+    return database.db.execute(sql).fetchone()[0]
+
+
+def _chained_seqs(database):
+    rows = database.db.execute("SELECT record FROM block_records ORDER BY block_index, leaf_index;").fetchall()
+    return [json.loads(record)["seq"] for record, in rows]
+
+
+@pytest.fixture
+def service_factory(database, keys, monkeypatch, tmp_path):
+    # The MySQL-only schema setup of start() has no stand-in equivalent
+    monkeypatch.setattr(ingest_service, "ensure_schema", lambda cursor: None)
+    monkeypatch.setattr(ingest_service, "load_or_generate_keys", lambda: keys)
+    monkeypatch.setattr(ingest_service, "COMMIT_RETRY_SECONDS", 0.01)
+    wal_dir = str(tmp_path / "wal")
+
+    def start():
+        blockchain = chain.Blockchain(tip_only=True, validators=validators.ValidatorRegistry())
+        return ingest_service.IngestService(blockchain, VALIDATOR, SIGNATURE, workers=1, wal_dir=wal_dir).start()
+
+    start.wal_dir = wal_dir
+    return start
+
+
+def test_encrypt_rows_returns_one_result_per_row(keys):
+    ingest.init_encrypt_worker(keys[0])
+    results = ingest.encrypt_rows([_row(Age=30), _row(Fever="Maybe"), _row(Age=40)])
+    assert len(results) == 3
+    assert isinstance(results[1], ValueError)
+    # Unpacked rows: Disease, eight feature ciphertexts, Outcome_Variable
+    assert all(len(results[i][0]) == len(CSV_COLUMNS) for i in (0, 2))
+
+
+def test_recovery_replays_unapplied_and_rechains_applied(database, service_factory):
+    journaled, applied = 12, 5
+    wal = BlockLog(service_factory.wal_dir)
+    for seq in range(1, journaled + 1):
+        wal.append({"index_num": seq, "row": _row(Age=seq)})
+    wal.close()
+    # Crashed after applying the first records and before chaining them
+    database.db.executemany("INSERT INTO ingest_log (seq) VALUES (?);", [(seq,) for seq in range(1, applied + 1)])
+    database.db.commit()
+
+    service = service_factory()
+    seq = service.submit(dict(RECORD, Age=50))
+    service.stop()
+
+    assert seq == journaled + 1
+    assert service.replayed == journaled - applied
+    assert _count(database, "SELECT COUNT(*) FROM disease_data;") == journaled + 1 - applied
+    assert _count(database, "SELECT COUNT(*) FROM ingest_log WHERE block_index IS NULL;") == 0
+    assert _chained_seqs(database) == list(range(1, journaled + 2))
+
+
+def test_failing_records_are_dead_lettered(database, service_factory):
+    # Stands in for a deterministic insert failure, e.g. a Disease wider than its column
+    database.db.execute("""
+        CREATE TRIGGER poison BEFORE INSERT ON disease_data WHEN NEW.Disease = 'Poison'
+        BEGIN SELECT RAISE(ABORT, 'Data too long for column Disease'); END;
+    """)
+    database.db.commit()
+    # Queued before validation covered it: a value without a mapping
+    wal = BlockLog(service_factory.wal_dir)
+    wal.append({"index_num": 1, "row": _row(Fever="Maybe")})
+    wal.close()
+
+    service = service_factory()
+    with pytest.raises(ValueError):
+        service.submit(dict(RECORD, Age=200))
+    seqs = [service.submit(dict(RECORD, Disease="Poison") if age == 4 else dict(RECORD, Age=age)) for age in range(2, 8)]
+    service.stop()
+
+    assert seqs == list(range(2, 8))
+    dead = {1, 4}
+    assert service.stats()["dead_lettered"] == len(dead)
+    assert _count(database, "SELECT COUNT(*) FROM disease_data;") == 7 - len(dead)
+    errors = dict(database.db.execute("SELECT seq, error FROM ingest_log WHERE error IS NOT NULL;").fetchall())
+    assert set(errors) == dead
+    assert errors[1].startswith("ValueError")
+    assert _chained_seqs(database) == [seq for seq in range(1, 8) if seq not in dead]
@@ -0,0 +1,39 @@
+import pytest
+
+from encryption.homomorphic import encrypt_value
+from encryption.codec import encode_ciphertext
+from encryption.row_cache import DecryptedRowCache
+
+
+def _cells(public_key, codes):
+    return [encode_ciphertext(encrypt_value(public_key, code)) for code in codes]
+
+
+@pytest.mark.parametrize("encrypt_at_rest", [False, True])
+def test_rewritten_row_is_decrypted_again(keys, encrypt_at_rest):
+    public_key, private_key = keys
+    cache = DecryptedRowCache(encrypt_at_rest=encrypt_at_rest)
+    codes = [1, 0, 1, 0, 1, 30, 2, 1]
+    cells = _cells(public_key, codes)
+    assert cache.features(private_key, 7, cells) == codes
+    assert cache.features(private_key, 7, cells) == codes
+    assert cache.stats()["decryptions"] == 8
+
+    # The row is updated: same id, new ciphertexts
+    updated = codes[:5] + [31] + codes[6:]
+    assert cache.features(private_key, 7, _cells(public_key, updated)) == updated
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"], stats["decryptions"]) == (1, 2, 1, 16)
+
+
+def test_invalidate_forgets_a_row(keys):
+    public_key, private_key = keys
+    cache = DecryptedRowCache()
+    cells = _cells(public_key, [0] * 8)
+    cache.features(private_key, 1, cells)
+    cache.features(private_key, 2, cells)
+    cache.invalidate(1)
+    assert cache.invalidations == 1
+    assert cache.get(1, b"") is None
+    cache.features(private_key, 2, cells)
+    assert cache.stats()["entries"] == 1 and cache.decryptions == 16
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from data import ingest
+from encryption import search_index
+from feature_codec import CSV_COLUMNS
+from _fakes import RECORD
+
+INDEX_KEY = os.urandom(32)
+
+
+@pytest.fixture
+def patients(database, keys):
+    rows = [[dict(RECORD, Fever=fever, Age=age)[column] for column in CSV_COLUMNS] for fever, age in
+            [("Yes", 30), ("No", 30), ("Yes", 45), ("No", 60)]]
+    ingest.init_encrypt_worker(keys[0], index_key=INDEX_KEY)
+    encrypted_rows = [encrypted_row for encrypted_row, _ in ingest.encrypt_rows(rows)]
+    database.db.executemany(ingest.insert_sql(indexed=True).replace("%s", "?"), encrypted_rows)
+    database.db.commit()
+    return database.cursor()
+
+
+def test_empty_conditions_are_rejected(patients, keys):
+    # Without a condition the search would decrypt the whole table
+    with pytest.raises(ValueError, match="At least one condition"):
+        search_index.find_patients(patients, keys[1], INDEX_KEY, {})
+
+
+def test_condition_without_labels_is_rejected(patients, keys):
+    with pytest.raises(ValueError, match="No values given for: Fever"):
+        search_index.find_patients(patients, keys[1], INDEX_KEY, {"Fever": [], "Age": 30})
+
+
+def test_conditions_select_matching_rows(patients, keys):
+    matches = search_index.find_patients(patients, keys[1], INDEX_KEY, {"Fever": "Yes", "Age": [30, 60]})
+    assert matches["id"].tolist() == [1]
+    assert matches["Fever"].tolist() == ["Yes"]